@@ -0,0 +1,294 @@
+import atexit
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .capture_storage import procesar_captura
+from .dashboard import sumar_accesos
+from .models import RegistroAcceso, Residente, Visitante
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def bloquear(archivo):
+    """
+    Toma el bloqueo exclusivo del diario abierto `archivo` sin esperar. Devuelve False si
+    lo tiene otro proceso. El sistema operativo lo libera al cerrar el archivo o al morir el proceso.
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            archivo.seek(0)
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class EscritorAccesos(threading.Thread):
+    """
+    Escribe los registros de acceso en segundo plano para que la respuesta de la
+    puerta no espere a la base de datos ni al guardado de la foto.
+    Los eventos se acumulan en memoria y se insertan con bulk_create cuando hay
+    `tamano_lote` pendientes o cada `intervalo` segundos. Antes de aceptar un evento
+    se anota (con su foto) en un diario local en `directorio`: si el proceso muere,
+    el siguiente proceso que arranque reinserta los eventos de diarios abandonados.
+    Cada diario queda abierto y bloqueado hasta escribir su lote: sólo se recupera
+    un diario cuyo bloqueo se puede tomar (su proceso murió), y quien lo recupera
+    lo mantiene bloqueado, así un mismo diario no se reinserta dos veces aunque la
+    base de datos falle por más de `antiguedad_recuperacion` segundos.
+    El id de cada registro se asigna al encolarlo, así reinsertar un evento ya
+    escrito no lo duplica.
+    """
+
+    def __init__(self, tamano_lote=50, intervalo=1.0, directorio=None, antiguedad_recuperacion=60):
+        super().__init__(name='escritor-accesos', daemon=True)
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.directorio = str(directorio) if directorio else None
+        self.antiguedad_recuperacion = antiguedad_recuperacion
+        self._condicion = threading.Condition()
+        self._pendientes = []
+        self._diario = None
+        self._lotes = []
+        self._detenido = False
+        self.registrados = 0
+        self.escritos = 0
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+
+    def registrar(self, tipo='ENTRADA', residente=None, visitante=None, foto=None, nombre_foto=None,
+                  descripcion=None, momento=None, recorte=None, punto_acceso=''):
+        """
+        Encola un registro de acceso y devuelve su id. `foto` son los bytes de la imagen
+        ya codificada (JPEG/PNG); `momento` es la fecha del evento (por defecto, ahora);
+        `recorte` es el rectángulo (x, y, w, h) de la cara o placa reconocida en la foto;
+        `punto_acceso` es la cámara o puerta del evento.
+        """
+        evento = {
+            "id": str(uuid.uuid4()),
+            "tipo": tipo,
+            "punto_acceso": (punto_acceso or '')[:50],
+            "residente_id": str(residente.pk) if residente else None,
+            "visitante_id": str(visitante.pk) if visitante else None,
+            "timestamp": (momento or timezone.now()).isoformat(),
+            "descripcion": descripcion,
+            "nombre_foto": nombre_foto,
+            "foto": base64.b64encode(foto).decode('ascii') if foto else None,
+            "recorte": [int(valor) for valor in recorte] if recorte else None,
+        }
+        with self._condicion:
+            self._anotar(evento)
+            self._pendientes.append(evento)
+            self.registrados += 1
+            if len(self._pendientes) >= self.tamano_lote:
+                self._condicion.notify_all()
+        return evento["id"]
+
+    def run(self):
+        self._recuperar()
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(
+                    lambda: self._detenido or len(self._pendientes) >= self.tamano_lote, timeout=self.intervalo)
+                lote, self._pendientes = self._pendientes, []
+                diario, self._diario = self._diario, None
+                detenido = self._detenido
+            if lote:
+                self._lotes.append((lote, diario))
+
+            self._escribir_lotes()
+            with self._condicion:
+                self._condicion.notify_all()
+            if detenido:
+                break
+        connections.close_all()
+
+    def vaciar(self, timeout=10):
+        """
+        Fuerza la escritura de lo pendiente y espera a que termine. Devuelve True si se escribió todo.
+        """
+        with self._condicion:
+            objetivo = self.registrados
+            self._condicion.notify_all()
+            return self._condicion.wait_for(lambda: self.escritos >= objetivo, timeout=timeout)
+
+    def detener(self):
+        """
+        Termina después de intentar escribir todos los eventos pendientes; lo que no se
+        pudo escribir queda en el diario para el próximo arranque.
+        """
+        with self._condicion:
+            self._detenido = True
+            self._condicion.notify_all()
+        if self.is_alive():
+            self.join()
+
+    def _anotar(self, evento):
+        if not self.directorio:
+            return
+        if self._diario is None:
+            nombre = f'accesos-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl'
+            self._diario = open(os.path.join(self.directorio, nombre), 'a', encoding='utf-8')
+            bloquear(self._diario)
+        self._diario.write(json.dumps(evento) + '\n')
+        self._diario.flush()
+
+    def _escribir_lotes(self):
+        # Los lotes se escriben en orden; si la base de datos falla se reintentan en la próxima vuelta
+        while self._lotes:
+            lote, diario = self._lotes[0]
+            try:
+                self._insertar(lote)
+            except Exception as e:
+                print(f"Error guardando {len(lote)} registros de acceso, se reintentará: {e}")
+                connections.close_all()
+                return
+            self._lotes.pop(0)
+            if diario:
+                # Se cierra antes de borrarlo (Windows no borra archivos abiertos). Si
+                # otro proceso lo toma en ese momento, sus eventos ya están escritos
+                diario.close()
+                try:
+                    os.remove(diario.name)
+                except (FileNotFoundError, PermissionError):
+                    # Otro proceso lo tiene abierto: al recuperarlo no encontrará nada nuevo
+                    pass
+            with self._condicion:
+                self.escritos += len(lote)
+
+    def _insertar(self, lote):
+        # Los eventos que ya existen (diario recuperado dos veces) no se vuelven a escribir
+        existentes = {str(pk) for pk in RegistroAcceso.objects.filter(
+            pk__in=[evento["id"] for evento in lote]).values_list('pk', flat=True)}
+        # Un residente o visitante borrado antes de escribir el lote haría fallar el
+        # lote entero en cada reintento: se guarda el registro sin la persona, igual
+        # que si se hubiera borrado después (on_delete=SET_NULL)
+        residentes = self._vigentes(Residente, [evento["residente_id"] for evento in lote])
+        visitantes = self._vigentes(Visitante, [evento["visitante_id"] for evento in lote])
+
+        registros = []
+        for evento in lote:
+            if evento["id"] in existentes:
+                continue
+            registro = RegistroAcceso(
+                id=uuid.UUID(evento["id"]),
+                tipo=evento["tipo"],
+                punto_acceso=evento.get("punto_acceso", ''),
+                residente_id=evento["residente_id"] if evento["residente_id"] in residentes else None,
+                visitante_id=evento["visitante_id"] if evento["visitante_id"] in visitantes else None,
+                timestamp=datetime.fromisoformat(evento["timestamp"]),
+                descripcion=evento["descripcion"],
+            )
+            if evento.get("archivos"):
+                # Las imágenes ya se guardaron en un intento anterior
+                for campo, nombre in evento["archivos"].items():
+                    getattr(registro, campo).name = nombre
+            elif evento["foto"]:
+                self._guardar_imagenes(registro, evento)
+            registros.append(registro)
+        # Los registros y su suma en el resumen del dashboard se guardan juntos: un lote
+        # que se reintenta no se cuenta dos veces
+        with transaction.atomic():
+            RegistroAcceso.objects.bulk_create(registros, batch_size=self.tamano_lote, ignore_conflicts=True)
+            sumar_accesos(registros)
+
+    @staticmethod
+    def _vigentes(modelo, ids):
+        """
+        Ids (como texto) de los `ids` que todavía existen en `modelo`.
+        """
+        ids = {pk for pk in ids if pk}
+        if not ids:
+            return set()
+        return {str(pk) for pk in modelo.objects.filter(pk__in=ids).values_list('pk', flat=True)}
+
+    def _guardar_imagenes(self, registro, evento):
+        """
+        Re-codifica la foto, genera el recorte y la miniatura (ver capture_storage.py)
+        y los guarda en el almacenamiento, en la carpeta de la fecha del evento.
+        """
+        archivos = procesar_captura(
+            base64.b64decode(evento["foto"]), evento["nombre_foto"] or f'{evento["id"]}.jpg', evento.get("recorte"))
+        evento["archivos"] = {}
+        for campo, (nombre, contenido) in archivos.items():
+            getattr(registro, campo).save(nombre, ContentFile(contenido), save=False)
+            evento["archivos"][campo] = getattr(registro, campo).name
+
+    def _recuperar(self):
+        """
+        Encola los eventos de los diarios abandonados por procesos que terminaron sin
+        escribirlos. Cada diario recuperado queda abierto y bloqueado hasta escribirlo.
+        """
+        if not self.directorio:
+            return
+        limite = time.time() - self.antiguedad_recuperacion
+        for nombre in sorted(os.listdir(self.directorio)):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                if not nombre.endswith('.jsonl') or os.path.getmtime(ruta) > limite:
+                    continue
+                archivo = open(ruta, 'a+', encoding='utf-8')
+            except FileNotFoundError:
+                # Su proceso lo escribió y lo borró mientras tanto
+                continue
+            if not bloquear(archivo):
+                # Lo tiene su proceso (vivo, esperando a la base de datos) u otro que lo está recuperando
+                archivo.close()
+                continue
+            archivo.seek(0)
+            # Una línea cortada por la caída del proceso se ignora
+            lote = []
+            for linea in archivo:
+                try:
+                    lote.append(json.loads(linea))
+                except ValueError:
+                    pass
+            if lote:
+                print(f"Recuperando {len(lote)} registros de acceso de {nombre}")
+                self._lotes.append((lote, archivo))
+                with self._condicion:
+                    self.registrados += len(lote)
+            else:
+                archivo.close()
+                try:
+                    os.remove(ruta)
+                except (FileNotFoundError, PermissionError):
+                    pass
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def obtener_escritor_accesos():
+    """
+    Devuelve el escritor de accesos del proceso, creándolo (y arrancando su hilo) la primera vez.
+    """
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                escritor = EscritorAccesos(
+                    tamano_lote=getattr(settings, 'ACCESS_LOG_BATCH_SIZE', 50),
+                    intervalo=getattr(settings, 'ACCESS_LOG_FLUSH_SECONDS', 1.0),
+                    directorio=getattr(settings, 'ACCESS_LOG_SPILL_DIR', None),
+                )
+                escritor.start()
+                # Al salir del proceso se escriben los eventos que quedan en memoria
+                atexit.register(escritor.detener)
+                _escritor = escritor
+    return _escritor
@@ -0,0 +1,207 @@
+import datetime
+import gzip
+import json
+import os
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import RegistroAcceso
+
+# Tabla de RegistroAcceso; en PostgreSQL es una tabla particionada por mes sobre "timestamp"
+TABLA = RegistroAcceso._meta.db_table
+PARTICION_DEFECTO = f'{TABLA}_defecto'
+
+
+def es_postgresql(conexion=connection):
+    return conexion.vendor == 'postgresql'
+
+
+def inicio_mes(anio, mes):
+    return datetime.datetime(anio, mes, 1, tzinfo=datetime.timezone.utc)
+
+
+def mes_siguiente(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def nombre_particion(anio, mes):
+    return f'{TABLA}_p{anio:04d}_{mes:02d}'
+
+
+def particionar_tabla(schema_editor):
+    """
+    Convierte la tabla de registros de acceso en una tabla particionada por mes
+    (PostgreSQL). La clave primaria pasa a ser (id, timestamp), como exige el
+    particionado; se crea una partición por cada mes con datos, los próximos meses
+    y una partición por defecto para lo que no tenga partición propia.
+    """
+    q = schema_editor.quote_name
+    tabla, antigua = q(TABLA), q(f'{TABLA}_antigua')
+    schema_editor.execute(f'ALTER TABLE {tabla} RENAME TO {antigua}')
+    schema_editor.execute(
+        f'CREATE TABLE {tabla} (LIKE {antigua} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE ("timestamp")')
+    schema_editor.execute(f'CREATE TABLE {q(PARTICION_DEFECTO)} PARTITION OF {tabla} DEFAULT')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT min("timestamp"), max("timestamp") FROM {antigua}')
+        minimo, maximo = cursor.fetchone()
+    hoy = timezone.now()
+    for anio, mes in meses_entre(minimo or hoy, max(maximo or hoy, hoy), adelante=3):
+        _crear_particion_vacia(schema_editor.execute, anio, mes)
+
+    schema_editor.execute(f'INSERT INTO {tabla} SELECT * FROM {antigua}')
+    schema_editor.execute(f'DROP TABLE {antigua}')
+    schema_editor.execute(f'ALTER TABLE {tabla} ADD PRIMARY KEY (id, "timestamp")')
+    _crear_relaciones(schema_editor)
+
+
+def despartir_tabla(schema_editor):
+    """
+    Operación inversa de particionar_tabla: vuelve a una tabla normal con clave primaria (id).
+    """
+    q = schema_editor.quote_name
+    tabla, particionada = q(TABLA), q(f'{TABLA}_particionada')
+    schema_editor.execute(f'ALTER TABLE {tabla} RENAME TO {particionada}')
+    schema_editor.execute(f'CREATE TABLE {tabla} (LIKE {particionada} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    schema_editor.execute(f'INSERT INTO {tabla} SELECT * FROM {particionada}')
+    schema_editor.execute(f'DROP TABLE {particionada} CASCADE')
+    schema_editor.execute(f'ALTER TABLE {tabla} ADD PRIMARY KEY (id)')
+    _crear_relaciones(schema_editor)
+
+
+def _crear_relaciones(schema_editor):
+    """
+    Claves foráneas (e índices) hacia residente y visitante, que LIKE no copia.
+    """
+    q = schema_editor.quote_name
+    for campo, referencia in (('residente_id', 'api_residente'), ('visitante_id', 'api_visitante')):
+        schema_editor.execute(
+            f'ALTER TABLE {q(TABLA)} ADD CONSTRAINT {q(f"{TABLA}_{campo}_fk")} FOREIGN KEY ({q(campo)}) '
+            f'REFERENCES {q(referencia)} (id) DEFERRABLE INITIALLY DEFERRED')
+        schema_editor.execute(f'CREATE INDEX {q(f"{TABLA}_{campo}_idx")} ON {q(TABLA)} ({q(campo)})')
+
+
+def meses_entre(desde, hasta, adelante=0):
+    """
+    (anio, mes) desde el mes de `desde` hasta el de `hasta` más `adelante` meses.
+    """
+    anio, mes = desde.year, desde.month
+    for _ in range(adelante):
+        hasta_anio, hasta_mes = mes_siguiente(hasta.year, hasta.month)
+        hasta = inicio_mes(hasta_anio, hasta_mes)
+    while (anio, mes) <= (hasta.year, hasta.month):
+        yield anio, mes
+        anio, mes = mes_siguiente(anio, mes)
+
+
+def _crear_particion_vacia(ejecutar, anio, mes):
+    siguiente = inicio_mes(*mes_siguiente(anio, mes))
+    ejecutar(
+        f'CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(nombre_particion(anio, mes))} '
+        f'PARTITION OF {connection.ops.quote_name(TABLA)} '
+        f"FOR VALUES FROM ('{inicio_mes(anio, mes).isoformat()}') TO ('{siguiente.isoformat()}')")
+
+
+def particiones_existentes():
+    """
+    Nombres de las particiones mensuales que existen (sólo PostgreSQL).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s", [TABLA])
+        return {fila[0] for fila in cursor.fetchall()} - {PARTICION_DEFECTO}
+
+
+def crear_particion(anio, mes):
+    """
+    Crea la partición de un mes. Si la partición por defecto ya tiene filas de ese mes,
+    se mueven a la nueva partición antes de adjuntarla. Devuelve False si ya existía.
+    """
+    nombre = nombre_particion(anio, mes)
+    if nombre in particiones_existentes():
+        return False
+
+    q = connection.ops.quote_name
+    desde, hasta = inicio_mes(anio, mes), inicio_mes(*mes_siguiente(anio, mes))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {q(nombre)} (LIKE {q(TABLA)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH movidas AS (DELETE FROM {q(PARTICION_DEFECTO)} '
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+            f'INSERT INTO {q(nombre)} SELECT * FROM movidas', [desde, hasta])
+        cursor.execute(
+            f'ALTER TABLE {q(TABLA)} ATTACH PARTITION {q(nombre)} FOR VALUES FROM (%s) TO (%s)', [desde, hasta])
+    return True
+
+
+def archivar_mes(anio, mes, directorio):
+    """
+    Copia los registros de acceso de un mes a un archivo JSON Lines comprimido con gzip
+    y los quita de la base de datos: en PostgreSQL se separa la partición del mes, se
+    exporta y se descarta completa; lo que quede fuera de ella (partición por defecto,
+    o SQLite en desarrollo y pruebas) se exporta y se borra por tandas de ids.
+    Nunca se borra un registro que no se haya exportado: los que llegan mientras se
+    archiva entran en una tanda posterior o quedan para el próximo archivado.
+    Las fotos no se tocan: ya están en carpetas por fecha (capturas_acceso/AAAA/MM/).
+    Devuelve (ruta_del_archivo, cantidad_de_registros); la ruta es None si el mes estaba vacío.
+    """
+    desde, hasta = inicio_mes(anio, mes), inicio_mes(*mes_siguiente(anio, mes))
+    os.makedirs(directorio, exist_ok=True)
+    base = os.path.join(str(directorio), f'registros_acceso_{anio:04d}_{mes:02d}')
+    ruta, copia = f'{base}.jsonl.gz', 1
+    while os.path.exists(ruta):
+        # Nunca se pisa un archivo anterior del mismo mes (registros que llegaron tarde)
+        copia += 1
+        ruta = f'{base}_{copia}.jsonl.gz'
+
+    q = connection.ops.quote_name
+    nombre = nombre_particion(anio, mes)
+    # También una partición que quedó separada por un archivado interrumpido
+    separada = es_postgresql() and nombre in connection.introspection.table_names()
+    if separada and nombre in particiones_existentes():
+        # Una vez separada, los accesos nuevos de ese mes van a la partición por
+        # defecto: la tabla del mes ya no cambia mientras se exporta
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {q(TABLA)} DETACH PARTITION {q(nombre)}')
+
+    cantidad = 0
+    # Los borrados se confirman después de renombrar el archivo: si algo falla, los
+    # registros siguen en la base de datos (a lo sumo quedan archivados dos veces)
+    with transaction.atomic():
+        # Se escribe a un archivo temporal y se renombra: un archivo a medias nunca parece completo
+        with gzip.open(ruta + '.tmp', 'wt', encoding='utf-8') as archivo:
+            if separada:
+                with connection.chunked_cursor() as cursor:
+                    cursor.execute(f'SELECT * FROM {q(nombre)} ORDER BY "timestamp"')
+                    columnas = [columna[0] for columna in cursor.description]
+                    filas = cursor.fetchmany(2000)
+                    while filas:
+                        for fila in filas:
+                            archivo.write(json.dumps(dict(zip(columnas, fila)), cls=DjangoJSONEncoder) + '\n')
+                        cantidad += len(filas)
+                        filas = cursor.fetchmany(2000)
+
+            registros = (RegistroAcceso.objects.filter(timestamp__gte=desde, timestamp__lt=hasta)
+                         .order_by('timestamp', 'pk'))
+            while True:
+                tanda = list(registros.values()[:2000])
+                if not tanda:
+                    break
+                for fila in tanda:
+                    archivo.write(json.dumps(fila, cls=DjangoJSONEncoder) + '\n')
+                cantidad += len(tanda)
+                RegistroAcceso.objects.filter(pk__in=[fila['id'] for fila in tanda]).delete()
+
+        if cantidad:
+            os.replace(ruta + '.tmp', ruta)
+        else:
+            os.remove(ruta + '.tmp')
+            ruta = None
+        if separada:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {q(nombre)}')
+    return ruta, cantidad
@@ -0,0 +1,157 @@
+from decimal import Decimal
+from django.db import connection
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Gasto, UnidadHabitacional
+
+# El saldo deudor de una unidad es la suma de sus gastos no pagados. Lo mantienen
+# triggers de la base de datos sobre la tabla de gastos (creados por la migración
+# 0009): cubren altas, bajas, pagos, cambios de monto y de unidad, también los de
+# bulk_create y update(), y cada cambio es un UPDATE atómico del saldo (sin leer
+# y reescribir el valor desde Python).
+GASTOS = Gasto._meta.db_table
+UNIDADES = UnidadHabitacional._meta.db_table
+TRIGGERS = ('gasto_saldo_insert', 'gasto_saldo_update', 'gasto_saldo_delete')
+FUNCION = 'gasto_actualizar_saldo'
+
+# PostgreSQL: triggers por sentencia con tablas de transición, así un bulk_create
+# de miles de gastos actualiza cada unidad una sola vez
+FUNCION_POSTGRESQL = f'''
+CREATE OR REPLACE FUNCTION {FUNCION}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE {UNIDADES} u SET saldo_deudor = u.saldo_deudor + c.total
+        FROM (SELECT unidad_id, SUM(monto) AS total FROM gastos_nuevos
+              WHERE NOT pagado GROUP BY unidad_id) c
+        WHERE u.id = c.unidad_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE {UNIDADES} u SET saldo_deudor = u.saldo_deudor - c.total
+        FROM (SELECT unidad_id, SUM(monto) AS total FROM gastos_anteriores
+              WHERE NOT pagado GROUP BY unidad_id) c
+        WHERE u.id = c.unidad_id;
+    ELSE
+        UPDATE {UNIDADES} u SET saldo_deudor = u.saldo_deudor + c.total
+        FROM (SELECT unidad_id, SUM(cambio) AS total FROM (
+                  SELECT unidad_id, monto AS cambio FROM gastos_nuevos WHERE NOT pagado
+                  UNION ALL
+                  SELECT unidad_id, -monto FROM gastos_anteriores WHERE NOT pagado
+              ) cambios GROUP BY unidad_id) c
+        WHERE u.id = c.unidad_id AND c.total <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+'''
+TRIGGERS_POSTGRESQL = [
+    f'CREATE TRIGGER gasto_saldo_insert AFTER INSERT ON {GASTOS} '
+    f'REFERENCING NEW TABLE AS gastos_nuevos FOR EACH STATEMENT EXECUTE FUNCTION {FUNCION}()',
+    f'CREATE TRIGGER gasto_saldo_update AFTER UPDATE ON {GASTOS} '
+    f'REFERENCING OLD TABLE AS gastos_anteriores NEW TABLE AS gastos_nuevos '
+    f'FOR EACH STATEMENT EXECUTE FUNCTION {FUNCION}()',
+    f'CREATE TRIGGER gasto_saldo_delete AFTER DELETE ON {GASTOS} '
+    f'REFERENCING OLD TABLE AS gastos_anteriores FOR EACH STATEMENT EXECUTE FUNCTION {FUNCION}()',
+]
+
+# SQLite (desarrollo y pruebas): no tiene triggers por sentencia, se usan por fila.
+# Guarda los decimales como REAL: se redondea para no acumular error (+ 0 evita un -0.0)
+TRIGGERS_SQLITE = [
+    f'''CREATE TRIGGER gasto_saldo_insert AFTER INSERT ON {GASTOS} WHEN NOT NEW.pagado
+    BEGIN
+        UPDATE {UNIDADES} SET saldo_deudor = ROUND(saldo_deudor + NEW.monto, 2) + 0 WHERE id = NEW.unidad_id;
+    END''',
+    f'''CREATE TRIGGER gasto_saldo_update AFTER UPDATE OF monto, pagado, unidad_id ON {GASTOS}
+    BEGIN
+        UPDATE {UNIDADES} SET saldo_deudor = ROUND(saldo_deudor - OLD.monto, 2) + 0 WHERE id = OLD.unidad_id AND NOT OLD.pagado;
+        UPDATE {UNIDADES} SET saldo_deudor = ROUND(saldo_deudor + NEW.monto, 2) + 0 WHERE id = NEW.unidad_id AND NOT NEW.pagado;
+    END''',
+    f'''CREATE TRIGGER gasto_saldo_delete AFTER DELETE ON {GASTOS} WHEN NOT OLD.pagado
+    BEGIN
+        UPDATE {UNIDADES} SET saldo_deudor = ROUND(saldo_deudor - OLD.monto, 2) + 0 WHERE id = OLD.unidad_id;
+    END''',
+]
+
+
+def crear_triggers(schema_editor):
+    """
+    Crea los triggers que mantienen el saldo deudor. En bases de datos que no sean
+    PostgreSQL ni SQLite no se crea nada y los saldos deben recalcularse con
+    `python manage.py recalcular_saldos`.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(FUNCION_POSTGRESQL)
+        for sql in TRIGGERS_POSTGRESQL:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in TRIGGERS_SQLITE:
+            schema_editor.execute(sql)
+
+
+def eliminar_triggers(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for trigger in TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {trigger} ON {GASTOS}')
+        schema_editor.execute(f'DROP FUNCTION IF EXISTS {FUNCION}()')
+    elif vendor == 'sqlite':
+        for trigger in TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+
+def reinstalar_triggers(schema_editor):
+    """
+    Vuelve a crear los triggers. En SQLite, las migraciones que reconstruyen la tabla
+    de gastos (agregar una columna, por ejemplo) la borran junto con sus triggers:
+    esas migraciones deben terminar con esta operación.
+    """
+    eliminar_triggers(schema_editor)
+    crear_triggers(schema_editor)
+
+
+def tiene_triggers(conexion=connection):
+    return conexion.vendor in ('postgresql', 'sqlite')
+
+
+def triggers_faltantes(conexion=connection):
+    """
+    Nombres de los triggers de saldo que no existen en la base de datos.
+    """
+    if not tiene_triggers(conexion):
+        return []
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            cursor.execute('SELECT tgname FROM pg_trigger WHERE tgrelid = %s::regclass', [GASTOS])
+        else:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [GASTOS])
+        existentes = {fila[0] for fila in cursor.fetchall()}
+    return [trigger for trigger in TRIGGERS if trigger not in existentes]
+
+
+def _saldo_calculado():
+    """
+    Subconsulta con la suma de los gastos no pagados de cada unidad (0 si no tiene).
+    """
+    pendientes = (Gasto.objects.filter(unidad=OuterRef('pk'), pagado=False)
+                  .order_by().values('unidad').annotate(total=Sum('monto')).values('total'))
+    campo = UnidadHabitacional._meta.get_field('saldo_deudor')
+    return Coalesce(
+        Subquery(pendientes, output_field=campo), Value(Decimal('0')),
+        output_field=DecimalField(max_digits=campo.max_digits, decimal_places=campo.decimal_places))
+
+
+def saldos_descuadrados():
+    """
+    Unidades cuyo saldo deudor no coincide con la suma de sus gastos no pagados,
+    anotadas con `saldo_calculado`.
+    """
+    return (UnidadHabitacional.objects.annotate(saldo_calculado=_saldo_calculado())
+            .filter(~Q(saldo_deudor=F('saldo_calculado'))).order_by('numero'))
+
+
+def recalcular_saldos():
+    """
+    Recalcula el saldo deudor de todas las unidades con un único UPDATE. Devuelve
+    la cantidad de unidades actualizadas.
+    """
+    return UnidadHabitacional.objects.update(saldo_deudor=_saldo_calculado())
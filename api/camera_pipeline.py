@@ -0,0 +1,424 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+
+from .ocr_logic import buscar_vehiculo
+from .plate_tracking import SeguidorPlacas
+
+# Backends de captura de OpenCV seleccionables en CAMERA_CAPTURE['BACKEND']
+BACKENDS_CAPTURA = {
+    'auto': cv2.CAP_ANY,
+    'ffmpeg': cv2.CAP_FFMPEG,
+    'gstreamer': cv2.CAP_GSTREAMER,
+}
+
+
+def abrir_fuente(fuente, captura=None):
+    """
+    Abre una fuente de video: índice de cámara ('0'), archivo o URL (rtsp://, http://).
+    `captura` (ver CAMERA_CAPTURE en settings) elige el backend de OpenCV, la
+    decodificación por hardware y las opciones de buffer de las cámaras RTSP.
+    """
+    captura = captura or {}
+    if isinstance(fuente, str) and fuente.isdigit():
+        fuente = int(fuente)
+    backend = captura.get('BACKEND', 'auto')
+    es_rtsp = isinstance(fuente, str) and fuente.startswith('rtsp://')
+
+    if backend == 'gstreamer' and es_rtsp:
+        fuente = pipeline_gstreamer(fuente, captura)
+    elif es_rtsp:
+        # FFmpeg lee sus opciones de esta variable al abrir cada captura
+        os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = opciones_ffmpeg(captura)
+
+    parametros = []
+    if captura.get('ACELERACION'):
+        parametros += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    if captura.get('TIMEOUT_MS'):
+        parametros += [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(captura['TIMEOUT_MS'])]
+
+    cap = cv2.VideoCapture(fuente, BACKENDS_CAPTURA[backend], parametros)
+    if captura.get('BUFFER'):
+        # Pocos fotogramas en el buffer del decodificador = menos latencia
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, captura['BUFFER'])
+    return cap
+
+
+def opciones_ffmpeg(captura):
+    """
+    Opciones de FFmpeg para RTSP, en el formato de OPENCV_FFMPEG_CAPTURE_OPTIONS.
+    """
+    opciones = {
+        'rtsp_transport': captura.get('RTSP_TRANSPORT', 'tcp'),
+        'fflags': 'nobuffer',
+        'flags': 'low_delay',
+        'max_delay': str(int(captura.get('LATENCIA_MS', 100)) * 1000),
+    }
+    return '|'.join(f'{clave};{valor}' for clave, valor in opciones.items())
+
+
+def pipeline_gstreamer(url, captura):
+    """
+    Pipeline de GStreamer para una cámara RTSP que entrega fotogramas BGR a OpenCV
+    descartando los viejos. Con DECODIFICADOR (ej. 'nvh264dec', 'vaapih264dec') se usa
+    ese decodificador H.264 en lugar de decodebin.
+    """
+    protocolo = 'tcp' if captura.get('RTSP_TRANSPORT', 'tcp') == 'tcp' else 'udp'
+    origen = f"rtspsrc location={url} latency={int(captura.get('LATENCIA_MS', 100))} protocols={protocolo}"
+    decodificador = captura.get('DECODIFICADOR')
+    if decodificador:
+        decodificacion = f"rtph264depay ! h264parse ! {decodificador}"
+    else:
+        decodificacion = "decodebin"
+    return (f"{origen} ! {decodificacion} ! videoconvert ! video/x-raw,format=BGR ! "
+            f"appsink drop=true max-buffers=1 sync=false")
+
+
+def es_archivo(fuente):
+    return isinstance(fuente, str) and not fuente.isdigit() and '://' not in fuente
+
+
+def anotar(frame, lectura):
+    """
+    Copia del fotograma con el rectángulo y el texto de la última placa leída.
+    """
+    if not lectura or not lectura[1]:
+        return frame
+    placa_detectada, (x, y, w, h) = lectura
+    frame = frame.copy()
+    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+    cv2.putText(frame, placa_detectada, (x, y - 10),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    return frame
+
+
+class FiltroFotogramas:
+    """
+    Decide qué fotogramas pasan al OCR para no analizar una puerta vacía.
+    Primero limita la frecuencia (fps) y luego exige movimiento dentro de una región
+    de interés, detectado con sustracción de fondo ('mog2') o diferencia entre
+    fotogramas ('diferencia'). Tras detectar movimiento sigue aceptando fotogramas
+    durante `mantener` segundos, para leer la placa de un vehículo que se detuvo.
+    `roi` es (x0, y0, x1, y1) en fracciones del fotograma; None usa el fotograma completo.
+    """
+
+    def __init__(self, fps=5, movimiento='mog2', roi=None, area_minima=0.01, mantener=2.0, ancho_analisis=320):
+        self.fps = fps
+        self.movimiento = movimiento
+        self.roi = roi
+        self.area_minima = area_minima
+        self.mantener = mantener
+        self.ancho_analisis = ancho_analisis
+        self._ultimo_aceptado = 0.0
+        self._ultimo_movimiento = float('-inf')
+        self._anterior = None
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._fondo = None
+        if movimiento == 'mog2':
+            self._fondo = cv2.createBackgroundSubtractorMOG2(history=300, varThreshold=25, detectShadows=False)
+
+    def aceptar(self, frame):
+        ahora = time.monotonic()
+        # 1. Muestreo: como máximo `fps` fotogramas por segundo llegan al análisis
+        if self.fps and ahora - self._ultimo_aceptado < 1.0 / self.fps:
+            return False
+        self._ultimo_aceptado = ahora
+
+        # 2. Movimiento en la región de interés
+        if not self.movimiento:
+            return True
+        if self._hay_movimiento(frame):
+            self._ultimo_movimiento = ahora
+            return True
+        return ahora - self._ultimo_movimiento <= self.mantener
+
+    def _hay_movimiento(self, frame):
+        alto, ancho = frame.shape[:2]
+        if self.roi:
+            x0, y0, x1, y1 = self.roi
+            frame = frame[int(y0 * alto):int(y1 * alto), int(x0 * ancho):int(x1 * ancho)]
+            alto, ancho = frame.shape[:2]
+
+        # El análisis se hace sobre una versión pequeña y en grises: cuesta muy poco
+        escala = min(1.0, self.ancho_analisis / float(ancho))
+        pequena = cv2.resize(frame, (max(1, int(ancho * escala)), max(1, int(alto * escala))),
+                             interpolation=cv2.INTER_AREA)
+        gris = cv2.GaussianBlur(cv2.cvtColor(pequena, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self._fondo is not None:
+            mascara = self._fondo.apply(gris)
+        else:
+            anterior, self._anterior = self._anterior, gris
+            if anterior is None:
+                return True
+            _, mascara = cv2.threshold(cv2.absdiff(anterior, gris), 25, 255, cv2.THRESH_BINARY)
+
+        mascara = cv2.morphologyEx(mascara, cv2.MORPH_OPEN, self._kernel)
+        return cv2.countNonZero(mascara) / float(mascara.size) >= self.area_minima
+
+
+class CapturaCamara(threading.Thread):
+    """
+    Hilo que lee continuamente una cámara y conserva sólo el último fotograma.
+    Si el procesamiento va más lento que la cámara, los fotogramas intermedios se
+    descartan (y se cuentan) en lugar de acumularse y aumentar la latencia.
+    Con un `filtro` (FiltroFotogramas), sólo los fotogramas que lo pasan quedan
+    disponibles para el OCR; el resto se cuenta como filtrado.
+    """
+
+    def __init__(self, nombre, fuente, reconectar_cada=5, filtro=None, captura=None):
+        super().__init__(name=f'captura-{nombre}', daemon=True)
+        self.nombre = nombre
+        self.fuente = fuente
+        self.captura = captura
+        self.reconectar_cada = reconectar_cada
+        self.filtro = filtro
+        self.activa = True
+        self.terminada = False
+        self.leidos = 0
+        self.filtrados = 0
+        self.descartados = 0
+        self._lock = threading.Lock()
+        self._fotograma = None
+        self._secuencia = 0
+        self._secuencia_entregada = 0
+
+    def run(self):
+        cap = abrir_fuente(self.fuente, self.captura)
+        # Los archivos se leen a su FPS nominal para simular una cámara en vivo
+        intervalo = 0
+        if es_archivo(self.fuente):
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            intervalo = 1.0 / fps if fps and fps > 0 else 0
+
+        while self.activa:
+            inicio = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                cap.release()
+                # Un archivo terminó; una cámara se intenta reconectar
+                if es_archivo(self.fuente):
+                    break
+                time.sleep(self.reconectar_cada)
+                cap = abrir_fuente(self.fuente, self.captura)
+                continue
+
+            if self.filtro is not None and not self.filtro.aceptar(frame):
+                self.leidos += 1
+                self.filtrados += 1
+            else:
+                self._publicar(frame)
+
+            if intervalo:
+                time.sleep(max(0, intervalo - (time.perf_counter() - inicio)))
+
+        cap.release()
+        self.terminada = True
+
+    def _publicar(self, frame):
+        with self._lock:
+            if self._secuencia > self._secuencia_entregada:
+                self.descartados += 1
+            self._fotograma = frame
+            self._secuencia += 1
+            self.leidos += 1
+
+    def ultimo_fotograma(self):
+        """
+        Devuelve (secuencia, fotograma) del último fotograma aún no entregado, o None.
+        """
+        with self._lock:
+            if self._secuencia == self._secuencia_entregada:
+                return None
+            self._secuencia_entregada = self._secuencia
+            return self._secuencia, self._fotograma
+
+    def detener(self):
+        self.activa = False
+
+
+class SalidaDepuracion:
+    """
+    Salida de fotogramas anotados para el modo sin ventanas, a una frecuencia reducida
+    (`fps`) para que no compita con el OCR: se graba un video por cámara en `directorio`
+    y/o se sirve como MJPEG en http://host:puerto/<camara>.
+    """
+
+    def __init__(self, fps=2, directorio=None, puerto=None, host='127.0.0.1'):
+        self.fps = fps
+        self.directorio = directorio
+        self._ultimo = {}
+        self._videos = {}
+        self._jpegs = {}
+        self._condicion = threading.Condition()
+        self._servidor = None
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        if puerto:
+            self._servidor = ThreadingHTTPServer((host, puerto), self._manejador())
+            self._servidor.daemon_threads = True
+            threading.Thread(target=self._servidor.serve_forever, name='mjpeg', daemon=True).start()
+
+    def publicar(self, camara, frame, lectura):
+        ahora = time.monotonic()
+        if ahora - self._ultimo.get(camara, 0) < 1.0 / self.fps:
+            return
+        self._ultimo[camara] = ahora
+        frame = anotar(frame, lectura)
+
+        if self.directorio:
+            video = self._videos.get(camara)
+            if video is None:
+                alto, ancho = frame.shape[:2]
+                video = cv2.VideoWriter(os.path.join(self.directorio, f'{camara}.avi'),
+                                        cv2.VideoWriter_fourcc(*'MJPG'), self.fps, (ancho, alto))
+                self._videos[camara] = video
+            video.write(frame)
+
+        if self._servidor is not None:
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+            with self._condicion:
+                self._jpegs[camara] = buffer.tobytes()
+                self._condicion.notify_all()
+
+    def cerrar(self):
+        for video in self._videos.values():
+            video.release()
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+    def _siguiente_jpeg(self, camara, anterior):
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._jpegs.get(camara) is not anterior, timeout=5)
+            return self._jpegs.get(camara)
+
+    def _manejador(self):
+        salida = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                camara = self.path.strip('/')
+                if camara not in salida._jpegs:
+                    self.send_response(404)
+                    self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                    self.end_headers()
+                    self.wfile.write(f"Cámaras: {', '.join(sorted(salida._jpegs))}\n".encode())
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=fotograma')
+                self.end_headers()
+                jpeg = None
+                try:
+                    while True:
+                        jpeg = salida._siguiente_jpeg(camara, jpeg)
+                        self.wfile.write(b'--fotograma\r\nContent-Type: image/jpeg\r\n'
+                                         + f'Content-Length: {len(jpeg)}\r\n\r\n'.encode() + jpeg + b'\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Manejador
+
+
+class ProcesadorPlacas:
+    """
+    Reparte los fotogramas de todas las cámaras entre un pool compartido de hilos
+    de OCR (OpenCV y Tesseract liberan el GIL), con a lo sumo un fotograma en
+    proceso por cámara, y manda los accesos al EscritorAccesos (ver access_log.py).
+    Cada cámara tiene un SeguidorPlacas: una placa que sigue a la vista no se vuelve
+    a leer con OCR una vez confirmada, y genera un único acceso por pista.
+    """
+
+    def __init__(self, escritor, hilos=4, cooldown=30, seguimiento=None):
+        from concurrent.futures import ThreadPoolExecutor
+        self.escritor = escritor
+        self.cooldown = cooldown
+        self.seguimiento = seguimiento or {}
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='ocr')
+        self._en_proceso = {}
+        self._seguidores = {}
+        self._ultimas_placas = {}
+        self._lock = threading.Lock()
+        self.procesados = {}
+        self.ultima_lectura = {}
+
+    def ocupado(self, camara):
+        futuro = self._en_proceso.get(camara)
+        return futuro is not None and not futuro.done()
+
+    def enviar(self, camara, frame):
+        if camara not in self._seguidores:
+            self._seguidores[camara] = SeguidorPlacas(**self.seguimiento)
+        self._en_proceso[camara] = self._pool.submit(self._procesar, camara, frame)
+
+    def seguidor(self, camara):
+        return self._seguidores.get(camara)
+
+    def expirar(self, camara):
+        """
+        Genera los eventos de las pistas perdidas de una cámara que no está entregando
+        fotogramas (por ejemplo, filtrados por falta de movimiento).
+        """
+        seguidor = self._seguidores.get(camara)
+        if seguidor is None or self.ocupado(camara) or not seguidor.hay_perdidas(time.time()):
+            return
+        self._en_proceso[camara] = self._pool.submit(self._expirar, camara)
+
+    def _procesar(self, camara, frame):
+        # Sólo un fotograma por cámara a la vez: el seguidor de la cámara no se comparte entre hilos
+        seguidor = self._seguidores[camara]
+        try:
+            eventos = seguidor.procesar(frame, time.time())
+            self.ultima_lectura[camara] = seguidor.ultima_lectura()
+            self.procesados[camara] = self.procesados.get(camara, 0) + 1
+            self._registrar(camara, eventos)
+        except Exception as e:
+            print(f"[{camara}] Error procesando el fotograma: {e}")
+
+    def _expirar(self, camara):
+        seguidor = self._seguidores[camara]
+        try:
+            self._registrar(camara, seguidor.expirar(time.time()))
+            self.ultima_lectura[camara] = seguidor.ultima_lectura()
+        except Exception as e:
+            print(f"[{camara}] Error registrando las placas perdidas: {e}")
+
+    def _registrar(self, camara, eventos):
+        for pista in eventos:
+            placa, apoyo = pista.consenso()
+            vehiculo = buscar_vehiculo(placa)
+            if not vehiculo:
+                continue
+
+            # El acceso es de cuando se vio la placa por última vez, aunque la pista se emita más tarde
+            momento = pista.ultimo_visto
+            clave = (camara, vehiculo.placa)
+            with self._lock:
+                # Comprobamos si la placa está en cooldown en esta cámara
+                if clave in self._ultimas_placas and abs(momento - self._ultimas_placas[clave]) <= self.cooldown:
+                    continue
+                self._ultimas_placas[clave] = momento
+
+            print(f"[{camara}] ¡Acceso concedido! Vehículo con placa {vehiculo.placa} reconocido "
+                  f"({len(pista.lecturas)} lecturas, apoyo {apoyo:.0%}).")
+            # Se codifica sin pérdida visible: el escritor la reduce y re-codifica al guardarla
+            _, buffer = cv2.imencode('.jpg', pista.fotograma, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            self.escritor.registrar(
+                residente=vehiculo.residente_asociado,
+                tipo='ENTRADA',
+                foto=buffer.tobytes(),
+                nombre_foto=f'{vehiculo.placa}_{int(momento)}.jpg',
+                descripcion=f"Placa {vehiculo.placa} - cámara {camara}",
+                momento=datetime.fromtimestamp(momento, tz=timezone.utc),
+                recorte=pista.rect_fotograma,
+                punto_acceso=camara,
+            )
+
+    def detener(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,60 @@
+import os
+import cv2
+import numpy as np
+from django.conf import settings
+
+# Lado mayor (px) de la foto guardada, calidad JPEG y lado mayor de la miniatura
+LADO_MAXIMO_CAPTURA = getattr(settings, 'CAPTURE_MAX_SIDE', 1280)
+CALIDAD_CAPTURA = getattr(settings, 'CAPTURE_JPEG_QUALITY', 80)
+LADO_MINIATURA = getattr(settings, 'CAPTURE_THUMBNAIL_SIDE', 160)
+# Margen alrededor de la cara o placa en el recorte, como fracción de su tamaño
+MARGEN_RECORTE = 0.2
+
+
+def _codificar(image, calidad=CALIDAD_CAPTURA):
+    _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, calidad])
+    return buffer.tobytes()
+
+
+def _reducir(image, lado_maximo):
+    alto, ancho = image.shape[:2]
+    escala = lado_maximo / float(max(alto, ancho))
+    if escala >= 1:
+        return image
+    return cv2.resize(image, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+
+
+def recortar(image, rect, margen=MARGEN_RECORTE):
+    """
+    Recorta el rectángulo (x, y, w, h) con un margen, sin salirse de la imagen.
+    """
+    alto, ancho = image.shape[:2]
+    x, y, w, h = rect
+    dx, dy = int(w * margen), int(h * margen)
+    x0, y0 = max(0, x - dx), max(0, y - dy)
+    x1, y1 = min(ancho, x + w + dx), min(alto, y + h + dy)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return image[y0:y1, x0:x1]
+
+
+def procesar_captura(contenido, nombre, recorte=None):
+    """
+    Prepara las imágenes de un registro de acceso a partir de la foto original:
+    la foto re-codificada en JPEG (reducida a LADO_MAXIMO_CAPTURA), el recorte de la
+    cara o placa en `recorte` (x, y, w, h, en píxeles de la original) y una miniatura.
+    Devuelve {'foto_capturada': (nombre, bytes), 'foto_recorte': ..., 'foto_miniatura': ...};
+    si la foto no se puede decodificar se guarda tal cual, sin recorte ni miniatura.
+    """
+    image = cv2.imdecode(np.frombuffer(contenido, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return {'foto_capturada': (nombre, contenido)}
+
+    base = os.path.splitext(os.path.basename(nombre))[0]
+    archivos = {'foto_capturada': (f'{base}.jpg', _codificar(_reducir(image, LADO_MAXIMO_CAPTURA)))}
+    if recorte:
+        parte = recortar(image, recorte)
+        if parte is not None:
+            archivos['foto_recorte'] = (f'{base}_recorte.jpg', _codificar(parte))
+    archivos['foto_miniatura'] = (f'{base}_miniatura.jpg', _codificar(_reducir(image, LADO_MINIATURA), 70))
+    return archivos
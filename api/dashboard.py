@@ -0,0 +1,87 @@
+import datetime
+from collections import Counter
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour, TruncMonth
+from django.utils import timezone
+
+from .models import Gasto, RegistroAcceso, ReservaAreaComun, ResumenAccesos, ResumenGastos, ResumenReservas
+
+# Tablas de resumen del dashboard: se consultan en lugar de recorrer todos los gastos
+# y registros de acceso, así el costo depende de la cantidad de horas/meses mostrados
+# y no de la cantidad de filas.
+# - ResumenAccesos se incrementa al escribir cada lote de registros (escritor de accesos).
+# - ResumenGastos y ResumenReservas los recalcula periódicamente `actualizar_resumenes`
+#   (lo vencido depende del día en que se calcula).
+CERO = Value(Decimal('0'))
+
+
+def inicio_hora(momento):
+    return momento.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def sumar_accesos(registros):
+    """
+    Suma los registros de acceso recién guardados a ResumenAccesos: una consulta por
+    cada combinación de hora, punto de acceso y tipo del lote, no por registro.
+    """
+    conteo = Counter((inicio_hora(registro.timestamp), registro.punto_acceso, registro.tipo) for registro in registros)
+    for (hora, punto_acceso, tipo), cantidad in conteo.items():
+        resumen, creado = ResumenAccesos.objects.get_or_create(
+            hora=hora, punto_acceso=punto_acceso, tipo=tipo, defaults={'cantidad': cantidad})
+        if not creado:
+            ResumenAccesos.objects.filter(pk=resumen.pk).update(cantidad=F('cantidad') + cantidad)
+
+
+def recalcular_accesos(desde=None):
+    """
+    Reconstruye ResumenAccesos a partir de los registros desde `desde` (por defecto,
+    desde el registro más antiguo que queda en la base de datos: los meses ya
+    archivados conservan su resumen). Devuelve la cantidad de filas de resumen.
+    """
+    if desde is None:
+        primero = RegistroAcceso.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if primero is None:
+            return 0
+        desde = primero
+    desde = inicio_hora(desde)
+
+    filas = (RegistroAcceso.objects.filter(timestamp__gte=desde)
+             .annotate(hora=TruncHour('timestamp', tzinfo=datetime.timezone.utc))
+             .values('hora', 'punto_acceso', 'tipo').annotate(cantidad=Count('id')).order_by())
+    with transaction.atomic():
+        ResumenAccesos.objects.filter(hora__gte=desde).delete()
+        return len(ResumenAccesos.objects.bulk_create([ResumenAccesos(**fila) for fila in filas], batch_size=1000))
+
+
+def recalcular_gastos():
+    """
+    Reconstruye ResumenGastos: por mes de vencimiento, el total no pagado y lo que ya venció.
+    """
+    hoy = timezone.localdate()
+    vencidos = Q(fecha_vencimiento__lt=hoy)
+    filas = (Gasto.objects.filter(pagado=False)
+             .annotate(mes=TruncMonth('fecha_vencimiento')).values('mes')
+             .annotate(pendiente=Sum('monto'), vencido=Coalesce(Sum('monto', filter=vencidos), CERO),
+                       cantidad_vencidos=Count('id', filter=vencidos))
+             .order_by())
+    with transaction.atomic():
+        ResumenGastos.objects.all().delete()
+        return len(ResumenGastos.objects.bulk_create([ResumenGastos(**fila) for fila in filas]))
+
+
+def recalcular_reservas():
+    """
+    Reconstruye ResumenReservas: por mes y área común, lo cobrado y lo pendiente de cobro.
+    """
+    filas = (ReservaAreaComun.objects
+             .annotate(mes=TruncMonth('fecha_reserva')).values('mes', 'area_comun')
+             .annotate(ingresos=Coalesce(Sum('costo_total', filter=Q(pagado=True)), CERO),
+                       por_cobrar=Coalesce(Sum('costo_total', filter=Q(pagado=False)), CERO),
+                       cantidad=Count('id'))
+             .order_by())
+    with transaction.atomic():
+        ResumenReservas.objects.all().delete()
+        return len(ResumenReservas.objects.bulk_create(
+            [ResumenReservas(area_comun_id=fila.pop('area_comun'), **fila) for fila in filas]))
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+import uuid
+import numpy as np
+from django.conf import settings
+from .models import Residente, Visitante
+from .face_index import crear_indice
+
+MODELOS = (('residente', Residente), ('visitante', Visitante))
+
+
+class GaleriaRostros:
+    """
+    Galería en memoria con los encodings de residentes y visitantes.
+    Las búsquedas se delegan en un índice intercambiable (exacto o aproximado,
+    ver face_index.py) y la galería se mantiene al día con las señales de los
+    modelos. Las señales sólo llegan al proceso que hizo el cambio: cada `recarga`
+    segundos se comparan los hashes con la base de datos para ver los cambios
+    hechos desde otros workers. Puede guardarse en disco para que los workers
+    arranquen rápido.
+    """
+
+    def __init__(self, backend='exacto', snapshot=None, recarga=60, **opciones):
+        self._lock = threading.RLock()
+        self._backend = backend
+        self._opciones = opciones
+        self._indice = crear_indice(backend, **opciones)
+        self._hashes = {}
+        self.snapshot = snapshot
+        self.recarga = recarga
+        self._sincronizada_en = 0.0
+        self.cargada = False
+
+    def __len__(self):
+        return len(self._indice)
+
+    def cargar(self):
+        """
+        Carga la galería. Si hay un snapshot en disco lo usa como punto de partida y
+        sólo trae de la base de datos los encodings que cambiaron desde entonces.
+        """
+        with self._lock:
+            self._indice = crear_indice(self._backend, **self._opciones)
+            self._hashes = {}
+            if self.snapshot and os.path.exists(self.snapshot):
+                self._cargar_snapshot(self.snapshot)
+            cambios = self._sincronizar()
+            self._sincronizada_en = time.monotonic()
+            self.cargada = True
+            if self.snapshot and cambios:
+                self.guardar_snapshot(self.snapshot)
+
+    def sincronizar_si_vencida(self):
+        """
+        Trae las altas, bajas y fotos nuevas hechas desde otros procesos si pasaron
+        más de `recarga` segundos desde la última sincronización.
+        """
+        if not self.recarga or time.monotonic() - self._sincronizada_en <= self.recarga:
+            return
+        with self._lock:
+            if time.monotonic() - self._sincronizada_en <= self.recarga:
+                return
+            # Se marca antes de consultar: si la base de datos falla no se reintenta en cada búsqueda
+            self._sincronizada_en = time.monotonic()
+            self._sincronizar()
+
+    def actualizar(self, tipo, persona_id, encoding, foto_hash=''):
+        """
+        Agrega o reemplaza el encoding de una persona. Si el encoding es None, la elimina.
+        """
+        clave = (tipo, persona_id)
+        with self._lock:
+            if encoding is None:
+                self._indice.eliminar(clave)
+                self._hashes.pop(clave, None)
+                return
+            self._indice.agregar(clave, np.frombuffer(encoding, dtype=np.float64))
+            self._hashes[clave] = foto_hash
+
+    def eliminar(self, tipo, persona_id):
+        with self._lock:
+            self._indice.eliminar((tipo, persona_id))
+            self._hashes.pop((tipo, persona_id), None)
+
+    def buscar(self, encoding, k=1):
+        """
+        Devuelve hasta k tuplas (tipo, id, distancia) de las personas más cercanas
+        al encoding dado, de menor a mayor distancia.
+        """
+        with self._lock:
+            return [(tipo, persona_id, distancia)
+                    for (tipo, persona_id), distancia in self._indice.buscar(encoding, k)]
+
+    def buscar_lote(self, encodings, k=1):
+        """
+        Igual que buscar() pero para varios encodings a la vez (una lista de resultados por encoding).
+        """
+        with self._lock:
+            return [[(tipo, persona_id, distancia) for (tipo, persona_id), distancia in resultados]
+                    for resultados in self._indice.buscar_lote(np.asarray(encodings, dtype=np.float64), k)]
+
+    def guardar_snapshot(self, ruta):
+        """
+        Guarda claves, hashes, vectores y el estado del índice en un archivo .npz.
+        Se escribe en un archivo temporal y se reemplaza para no dejar snapshots a medias.
+        """
+        with self._lock:
+            claves = self._indice.claves
+            datos = {
+                'backend': np.array(self._indice.nombre),
+                'tipos': np.array([tipo for tipo, _ in claves], dtype='U10'),
+                'ids': np.array([str(persona_id) for _, persona_id in claves], dtype='U36'),
+                'hashes': np.array([self._hashes.get(clave, '') for clave in claves], dtype='U64'),
+                'vectores': self._indice.vectores,
+            }
+            datos.update(self._indice.estado())
+
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        temporal = f"{ruta}.tmp.npz"
+        np.savez(temporal, **datos)
+        os.replace(temporal, ruta)
+
+    def _cargar_snapshot(self, ruta):
+        try:
+            with np.load(ruta) as datos:
+                datos = dict(datos)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer el snapshot de la galería {ruta}: {e}")
+            return
+        if str(datos.pop('backend')) != self._indice.nombre:
+            return # El snapshot es de otro backend, se reconstruye desde la base de datos
+
+        claves = [(str(tipo), uuid.UUID(str(persona_id))) for tipo, persona_id in zip(datos.pop('tipos'), datos.pop('ids'))]
+        hashes = datos.pop('hashes')
+        self._indice.restaurar(claves, datos.pop('vectores'), datos)
+        self._hashes = {clave: str(foto_hash) for clave, foto_hash in zip(claves, hashes)}
+
+    def _sincronizar(self):
+        """
+        Compara los hashes de foto de la base de datos con los de la galería y sólo
+        trae los encodings nuevos o modificados. Devuelve True si hubo cambios.
+        """
+        cambios = False
+        for tipo, modelo in MODELOS:
+            actuales = dict(
+                ((tipo, persona_id), foto_hash)
+                for persona_id, foto_hash in modelo.objects.exclude(encoding_facial__isnull=True).values_list('id', 'foto_hash')
+            )
+            conocidas = [clave for clave in self._hashes if clave[0] == tipo]
+            for clave in conocidas:
+                if clave not in actuales:
+                    self._indice.eliminar(clave)
+                    del self._hashes[clave]
+                    cambios = True
+
+            filas = modelo.objects.exclude(encoding_facial__isnull=True)
+            if conocidas:
+                pendientes = [clave[1] for clave, foto_hash in actuales.items() if self._hashes.get(clave) != foto_hash]
+                if not pendientes:
+                    continue
+                filas = filas.filter(id__in=pendientes)
+            for persona_id, encoding, foto_hash in filas.values_list('id', 'encoding_facial', 'foto_hash').iterator():
+                self.actualizar(tipo, persona_id, encoding, foto_hash)
+                cambios = True
+        return cambios
+
+
+# Galería compartida por todo el proceso
+galeria = GaleriaRostros(
+    backend=getattr(settings, 'FACE_INDEX_BACKEND', 'exacto'),
+    snapshot=getattr(settings, 'FACE_INDEX_SNAPSHOT', None),
+    recarga=getattr(settings, 'FACE_GALLERY_REFRESH', 60),
+    **getattr(settings, 'FACE_INDEX_OPTIONS', {})
+)
+
+
+def obtener_galeria():
+    """
+    Devuelve la galería del proceso, cargándola la primera vez y sincronizándola
+    con la base de datos cada FACE_GALLERY_REFRESH segundos.
+    """
+    if not galeria.cargada:
+        with galeria._lock:
+            if not galeria.cargada:
+                galeria.cargar()
+    else:
+        galeria.sincronizar_si_vencida()
+    return galeria
@@ -0,0 +1,276 @@
+import numpy as np
+
+# Dimensión de los encodings faciales de face_recognition (dlib)
+DIMENSION_ENCODING = 128
+CAPACIDAD_INICIAL = 256
+
+
+class IndiceExacto:
+    """
+    Índice de búsqueda lineal: todos los vectores en una matriz contigua de NumPy
+    y sus claves en una lista paralela. Cada búsqueda es un único cálculo
+    vectorizado de distancias contra toda la matriz (resultado exacto).
+    """
+    nombre = 'exacto'
+
+    def __init__(self, capacidad=CAPACIDAD_INICIAL):
+        self._matriz = np.empty((capacidad, DIMENSION_ENCODING), dtype=np.float64)
+        self._claves = []
+        self._posiciones = {}
+
+    def __len__(self):
+        return len(self._claves)
+
+    def __contains__(self, clave):
+        return clave in self._posiciones
+
+    @property
+    def claves(self):
+        return list(self._claves)
+
+    @property
+    def vectores(self):
+        return self._matriz[:len(self._claves)]
+
+    def agregar(self, clave, vector):
+        """
+        Agrega o reemplaza el vector asociado a una clave.
+        """
+        posicion = self._posiciones.get(clave)
+        if posicion is not None:
+            self._matriz[posicion] = vector
+            return
+        n = len(self._claves)
+        if n == len(self._matriz):
+            # Duplicamos la capacidad para que agregar sea O(1) amortizado
+            nueva = np.empty((2 * n, DIMENSION_ENCODING), dtype=np.float64)
+            nueva[:n] = self._matriz
+            self._matriz = nueva
+        self._matriz[n] = vector
+        self._claves.append(clave)
+        self._posiciones[clave] = n
+
+    def eliminar(self, clave):
+        posicion = self._posiciones.pop(clave, None)
+        if posicion is None:
+            return
+        # Movemos la última fila al hueco para mantener la matriz contigua
+        ultima = len(self._claves) - 1
+        clave_ultima = self._claves.pop()
+        if posicion != ultima:
+            self._matriz[posicion] = self._matriz[ultima]
+            self._claves[posicion] = clave_ultima
+            self._posiciones[clave_ultima] = posicion
+
+    def buscar(self, vector, k=1):
+        """
+        Devuelve hasta k pares (clave, distancia) ordenados de menor a mayor distancia.
+        """
+        n = len(self._claves)
+        if not n:
+            return []
+        distancias = np.linalg.norm(self._matriz[:n] - vector, axis=1)
+        k = min(k, n)
+        if k < n:
+            indices = np.argpartition(distancias, k - 1)[:k]
+            indices = indices[np.argsort(distancias[indices])]
+        else:
+            indices = np.argsort(distancias)
+        return [(self._claves[i], float(distancias[i])) for i in indices]
+
+    def buscar_lote(self, vectores, k=1):
+        """
+        Busca varios vectores a la vez con un único producto matricial
+        (||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2). Devuelve una lista de resultados por vector.
+        """
+        n = len(self._claves)
+        if not n or not len(vectores):
+            return [[] for _ in vectores]
+        matriz = self._matriz[:n]
+        cuadrados = (
+            np.einsum('ij,ij->i', vectores, vectores)[:, None]
+            - 2 * vectores @ matriz.T
+            + np.einsum('ij,ij->i', matriz, matriz)[None, :]
+        )
+        distancias = np.sqrt(np.maximum(cuadrados, 0))
+        k = min(k, n)
+        if k < n:
+            indices = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+        else:
+            indices = np.tile(np.arange(n), (len(vectores), 1))
+        resultados = []
+        for fila, candidatos in zip(distancias, indices):
+            candidatos = candidatos[np.argsort(fila[candidatos])]
+            resultados.append([(self._claves[i], float(fila[i])) for i in candidatos])
+        return resultados
+
+    def estado(self):
+        """
+        Arrays necesarios para reconstruir el índice desde un snapshot.
+        """
+        return {}
+
+    def restaurar(self, claves, vectores, estado):
+        for clave, vector in zip(claves, vectores):
+            self.agregar(clave, vector)
+
+
+class IndiceIVF:
+    """
+    Índice aproximado IVF (inverted file): los vectores se reparten en listas
+    según su centroide más cercano (k-means) y cada búsqueda sólo revisa las
+    `nprobe` listas más cercanas a la consulta. Subir `nprobe` mejora el recall
+    a cambio de latencia; con nprobe >= nlist el resultado es exacto.
+    Mientras la galería es pequeña funciona como una única lista (búsqueda exacta).
+    """
+    nombre = 'ivf'
+
+    def __init__(self, nprobe=8, nlist=None, minimo_entrenamiento=1000):
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.minimo_entrenamiento = minimo_entrenamiento
+        self._centroides = None
+        self._listas = [IndiceExacto()]
+        self._lista_de = {}
+        self._tamano_entrenado = 0
+
+    def __len__(self):
+        return len(self._lista_de)
+
+    def __contains__(self, clave):
+        return clave in self._lista_de
+
+    @property
+    def claves(self):
+        return [clave for lista in self._listas for clave in lista.claves]
+
+    @property
+    def vectores(self):
+        vectores = [lista.vectores for lista in self._listas if len(lista)]
+        if not vectores:
+            return np.empty((0, DIMENSION_ENCODING), dtype=np.float64)
+        return np.concatenate(vectores)
+
+    def agregar(self, clave, vector):
+        lista = self._lista_mas_cercana(vector)
+        anterior = self._lista_de.get(clave)
+        if anterior is not None and anterior != lista:
+            self._listas[anterior].eliminar(clave)
+        self._listas[lista].agregar(clave, vector)
+        self._lista_de[clave] = lista
+
+        # Re-entrenamos cuando la galería creció lo suficiente desde el último entrenamiento
+        if len(self) >= max(self.minimo_entrenamiento, 2 * self._tamano_entrenado):
+            self.entrenar()
+
+    def eliminar(self, clave):
+        lista = self._lista_de.pop(clave, None)
+        if lista is not None:
+            self._listas[lista].eliminar(clave)
+
+    def buscar(self, vector, k=1):
+        if self._centroides is None:
+            return self._listas[0].buscar(vector, k)
+
+        distancias = np.linalg.norm(self._centroides - vector, axis=1)
+        nprobe = min(self.nprobe, len(self._centroides))
+        sondeadas = np.argpartition(distancias, nprobe - 1)[:nprobe]
+
+        candidatos = []
+        for lista in sondeadas:
+            candidatos.extend(self._listas[lista].buscar(vector, k))
+        candidatos.sort(key=lambda candidato: candidato[1])
+        return candidatos[:k]
+
+    def buscar_lote(self, vectores, k=1):
+        # Cada consulta revisa listas distintas, así que se buscan una por una
+        return [self.buscar(vector, k) for vector in vectores]
+
+    def entrenar(self):
+        """
+        Calcula los centroides con k-means sobre los vectores actuales y reparte
+        los vectores en las nuevas listas.
+        """
+        claves, vectores = self.claves, self.vectores
+        if not claves:
+            return
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(claves))))
+        self._asignar(claves, vectores, _kmeans(vectores, nlist))
+
+    def estado(self):
+        if self._centroides is None:
+            return {}
+        return {'centroides': self._centroides, 'tamano_entrenado': np.array(self._tamano_entrenado)}
+
+    def restaurar(self, claves, vectores, estado):
+        if 'centroides' in estado:
+            # Con los centroides del snapshot sólo hay que re-asignar (sin k-means)
+            self._asignar(claves, vectores, estado['centroides'])
+            self._tamano_entrenado = int(estado['tamano_entrenado'])
+        else:
+            for clave, vector in zip(claves, vectores):
+                self.agregar(clave, vector)
+
+    def _asignar(self, claves, vectores, centroides):
+        self._centroides = centroides
+        # Cada lista empieza pequeña: con cientos de listas la capacidad inicial pesa
+        self._listas = [IndiceExacto(capacidad=16) for _ in range(len(centroides))]
+        self._lista_de = {}
+        self._tamano_entrenado = len(claves)
+        if not len(claves):
+            return
+        asignaciones = _centroide_mas_cercano(vectores, centroides)
+        for clave, vector, lista in zip(claves, vectores, asignaciones):
+            self._listas[lista].agregar(clave, vector)
+            self._lista_de[clave] = int(lista)
+
+    def _lista_mas_cercana(self, vector):
+        if self._centroides is None:
+            return 0
+        return int(np.argmin(np.linalg.norm(self._centroides - vector, axis=1)))
+
+
+def _centroide_mas_cercano(vectores, centroides):
+    """
+    Índice del centroide más cercano para cada vector, usando
+    ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2 para hacerlo con un solo producto matricial.
+    """
+    distancias = (
+        np.einsum('ij,ij->i', vectores, vectores)[:, None]
+        - 2 * vectores @ centroides.T
+        + np.einsum('ij,ij->i', centroides, centroides)[None, :]
+    )
+    return np.argmin(distancias, axis=1)
+
+
+def _kmeans(vectores, k, iteraciones=10, muestra_por_lista=64, semilla=0):
+    """
+    k-means (Lloyd) sobre una muestra de los vectores. Devuelve la matriz de centroides.
+    """
+    rng = np.random.default_rng(semilla)
+    k = min(k, len(vectores))
+    if len(vectores) > k * muestra_por_lista:
+        vectores = vectores[rng.choice(len(vectores), k * muestra_por_lista, replace=False)]
+    centroides = vectores[rng.choice(len(vectores), k, replace=False)].copy()
+
+    for _ in range(iteraciones):
+        asignaciones = _centroide_mas_cercano(vectores, centroides)
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asignaciones, vectores)
+        conteos = np.bincount(asignaciones, minlength=k)
+        no_vacias = conteos > 0
+        # Los centroides sin vectores asignados se quedan donde estaban
+        centroides[no_vacias] = sumas[no_vacias] / conteos[no_vacias, None]
+    return centroides
+
+
+def crear_indice(backend='exacto', **opciones):
+    """
+    Crea el índice configurado: 'exacto' (búsqueda lineal) o 'ivf' (aproximado).
+    Las opciones (nprobe, nlist, minimo_entrenamiento) sólo aplican al índice IVF.
+    """
+    if backend == 'exacto':
+        return IndiceExacto()
+    if backend == 'ivf':
+        return IndiceIVF(**opciones)
+    raise ValueError(f"Backend de índice facial desconocido: {backend}")
@@ -1,46 +1,312 @@
+import hashlib
+import math
+import time
+from datetime import datetime, timedelta
+import cv2
 import face_recognition
 import numpy as np
-from .models import Residente, RegistroAcceso
-
-def get_residentes_encodings():
-    """
-    Obtiene los encodings faciales de todos los residentes registrados.
-    """
-    residentes = Residente.objects.filter(foto_perfil__isnull=False).exclude(foto_perfil__exact='')
-    known_face_encodings = []
-    known_face_ids = []
-
-    for residente in residentes:
-        try:
-            # Carga la imagen del residente desde su ruta de archivo
-            image = face_recognition.load_image_file(residente.foto_perfil.path)
-            # Obtiene el encoding facial (asumimos una sola cara por foto)
-            encoding = face_recognition.face_encodings(image)[0]
-            known_face_encodings.append(encoding)
-            known_face_ids.append(residente.id)
-        except (FileNotFoundError, IndexError) as e:
-            # Ignora residentes si su foto no existe o no se detecta una cara
-            print(f"Error procesando la foto del residente {residente.id}: {e}")
-            continue
-            
-    return known_face_encodings, known_face_ids
-
-def reconocer_rostro(image_to_check):
-    """
-    Compara una imagen dada con las de los residentes registrados.
-    """
-    known_encodings, known_ids = get_residentes_encodings()
-
-    if not known_encodings:
-        return None # No hay residentes contra los que comparar
-
-    unknown_encoding = face_recognition.face_encodings(image_to_check)[0]
-    
-    matches = face_recognition.compare_faces(known_encodings, unknown_encoding)
-    
-    if True in matches:
-        first_match_index = matches.index(True)
-        residente_id = known_ids[first_match_index]
-        return Residente.objects.get(id=residente_id)
-
-    return None # No se encontró ninguna coincidencia
\ No newline at end of file
+from django.conf import settings
+from django.utils import timezone
+from .models import Residente, Visitante
+from .face_gallery import obtener_galeria
+
+# Distancia máxima entre encodings para considerar que son la misma persona
+TOLERANCIA = getattr(settings, 'FACE_MATCH_TOLERANCE', 0.6)
+# Cantidad de candidatos más cercanos que se devuelven junto al resultado
+CANDIDATOS = getattr(settings, 'FACE_MATCH_TOP_K', 3)
+# Detector de caras: 'hog' (CPU, rápido) o 'cnn' (más preciso, ideal con GPU)
+MODELO_DETECCION = getattr(settings, 'FACE_DETECTION_MODEL', 'hog')
+# Veces que se agranda la imagen al detectar (ayuda con caras pequeñas, pero es más lento)
+UPSAMPLE_DETECCION = getattr(settings, 'FACE_DETECTION_UPSAMPLE', 1)
+# Lado mayor (px) al que se reduce la imagen antes de detectar; 0 para no reducir
+LADO_MAXIMO_DETECCION = getattr(settings, 'FACE_DETECTION_MAX_SIDE', 640)
+# Tolerancia (minutos) alrededor de las horas de entrada y salida previstas de un visitante
+MARGEN_VISITA = getattr(settings, 'VISIT_WINDOW_MARGIN_MINUTES', 30)
+
+
+def calcular_hash_foto(archivo):
+    """
+    Calcula el SHA-256 del contenido de una foto (FieldFile o archivo subido).
+    """
+    sha256 = hashlib.sha256()
+    archivo.open('rb')
+    for chunk in archivo.chunks():
+        sha256.update(chunk)
+    archivo.seek(0)
+    return sha256.hexdigest()
+
+
+def calcular_encoding(archivo):
+    """
+    Obtiene el encoding facial de una foto (asumimos una sola cara por foto).
+    Devuelve None si no se detecta ninguna cara.
+    """
+    archivo.open('rb')
+    image = face_recognition.load_image_file(archivo)
+    archivo.seek(0)
+    encodings = face_recognition.face_encodings(image)
+    return encodings[0] if encodings else None
+
+
+def actualizar_encoding(persona):
+    """
+    Recalcula el encoding facial de la persona sólo si su foto_perfil cambió.
+    El encoding se guarda como bytes de 128 float64 junto al hash de la foto.
+    Devuelve True si se recalculó.
+    """
+    if not persona.foto_perfil:
+        persona.encoding_facial = None
+        persona.foto_hash = ''
+        return False
+
+    # Una foto ya guardada y con hash registrado no cambió desde el último cálculo
+    if persona.foto_perfil._committed and persona.foto_hash:
+        return False
+
+    try:
+        foto_hash = calcular_hash_foto(persona.foto_perfil)
+    except FileNotFoundError as e:
+        print(f"Error leyendo la foto de {persona.pk}: {e}")
+        return False
+
+    if foto_hash == persona.foto_hash:
+        return False
+
+    encoding = calcular_encoding(persona.foto_perfil)
+    if encoding is None:
+        print(f"No se detectó ninguna cara en la foto de {persona.pk}")
+    persona.foto_hash = foto_hash
+    persona.encoding_facial = encoding.astype(np.float64).tobytes() if encoding is not None else None
+    return True
+
+
+def calcular_confianza(distancia, tolerancia=TOLERANCIA):
+    """
+    Convierte una distancia entre encodings en una confianza entre 0 y 1.
+    Una distancia igual a la tolerancia equivale a 0.5; por debajo crece rápido hacia 1.
+    """
+    if distancia > tolerancia:
+        return max(0.0, (1.0 - distancia) / ((1.0 - tolerancia) * 2.0))
+    lineal = 1.0 - (distancia / (tolerancia * 2.0))
+    return lineal + ((1.0 - lineal) * math.pow((lineal - 0.5) * 2, 0.2))
+
+
+def preparar_imagen(image_bgr):
+    """
+    Convierte la imagen de OpenCV (BGR) a RGB, que es lo que espera face_recognition,
+    y genera una copia reducida para la detección.
+    Devuelve (imagen_rgb, imagen_deteccion, escala).
+    """
+    image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+    alto, ancho = image_rgb.shape[:2]
+    if not LADO_MAXIMO_DETECCION or max(alto, ancho) <= LADO_MAXIMO_DETECCION:
+        return image_rgb, image_rgb, 1.0
+    escala = LADO_MAXIMO_DETECCION / float(max(alto, ancho))
+    reducida = cv2.resize(image_rgb, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+    return image_rgb, reducida, escala
+
+
+def escalar_ubicaciones(ubicaciones, escala, forma):
+    """
+    Lleva las cajas (top, right, bottom, left) detectadas en la imagen reducida
+    a coordenadas de la imagen original.
+    """
+    alto, ancho = forma[:2]
+    return [
+        (max(0, int(top / escala)), min(ancho, int(right / escala)),
+         min(alto, int(bottom / escala)), max(0, int(left / escala)))
+        for top, right, bottom, left in ubicaciones
+    ]
+
+
+def detectar_y_codificar(imagenes, tiempos=None):
+    """
+    Detecta las caras en versiones reducidas de las imágenes y calcula los encodings
+    sobre la resolución completa, para que las fotos de muchos megapíxeles no dominen
+    la latencia. Con el detector 'cnn' e imágenes del mismo tamaño, la detección se
+    hace en un solo lote.
+    Devuelve, por imagen, (ubicaciones, encodings). Si se pasa `tiempos`, acumula
+    ahí los milisegundos de cada etapa.
+    """
+    tiempos = tiempos if tiempos is not None else {}
+
+    inicio = time.perf_counter()
+    preparadas = [preparar_imagen(image) for image in imagenes]
+    _medir(tiempos, 'preprocesado', inicio)
+
+    inicio = time.perf_counter()
+    reducidas = [reducida for _, reducida, _ in preparadas]
+    if MODELO_DETECCION == 'cnn' and len(reducidas) > 1 and len({r.shape for r in reducidas}) == 1:
+        detecciones = face_recognition.batch_face_locations(
+            reducidas, number_of_times_to_upsample=UPSAMPLE_DETECCION)
+    else:
+        detecciones = [
+            face_recognition.face_locations(
+                reducida, number_of_times_to_upsample=UPSAMPLE_DETECCION, model=MODELO_DETECCION)
+            for reducida in reducidas
+        ]
+    _medir(tiempos, 'deteccion', inicio)
+
+    inicio = time.perf_counter()
+    resultados = []
+    for (image_rgb, _, escala), ubicaciones in zip(preparadas, detecciones):
+        ubicaciones = escalar_ubicaciones(ubicaciones, escala, image_rgb.shape)
+        # Todas las caras de la imagen se codifican en una sola llamada
+        encodings = face_recognition.face_encodings(image_rgb, known_face_locations=ubicaciones)
+        resultados.append((ubicaciones, encodings))
+    _medir(tiempos, 'codificacion', inicio)
+    return resultados
+
+
+def _medir(tiempos, etapa, inicio):
+    tiempos[etapa] = round(tiempos.get(etapa, 0) + (time.perf_counter() - inicio) * 1000, 2)
+
+
+def reconocer_rostro(image_to_check, tiempos=None):
+    """
+    Compara una imagen dada con las de los residentes y visitantes registrados.
+    Devuelve (persona, candidatos): la persona más cercana (Residente o Visitante)
+    si está dentro de la tolerancia, o None, y los candidatos más cercanos
+    con su distancia y confianza, calculados en una sola búsqueda.
+    Si hay varias caras se usa la más grande (la más cercana a la cámara).
+    Lanza IndexError si no se detecta ninguna cara.
+    """
+    ubicaciones, encodings = detectar_y_codificar([image_to_check], tiempos)[0]
+    return identificar_rostro(ubicaciones, encodings, tiempos)
+
+
+def indice_cara_principal(ubicaciones):
+    """
+    Índice de la cara más grande (la más cercana a la cámara), o 0 si no hay ubicaciones.
+    """
+    areas = [(bottom - top) * (right - left) for top, right, bottom, left in ubicaciones]
+    return int(np.argmax(areas)) if areas else 0
+
+
+def rect_ubicacion(ubicacion):
+    """
+    Convierte una ubicación (top, right, bottom, left) de face_recognition a (x, y, w, h).
+    """
+    top, right, bottom, left = ubicacion
+    return (left, top, right - left, bottom - top)
+
+
+def visita_vigente(visitante, momento=None):
+    """
+    Indica si el visitante puede entrar en `momento` (por defecto, ahora): su visita
+    es ese día y, si tiene horas de entrada o salida previstas, está dentro de ellas
+    con MARGEN_VISITA minutos de tolerancia.
+    """
+    momento = timezone.localtime(momento)
+    if visitante.fecha_visita != momento.date():
+        return False
+    margen = timedelta(minutes=MARGEN_VISITA)
+    if visitante.hora_entrada_prevista:
+        entrada = timezone.make_aware(datetime.combine(visitante.fecha_visita, visitante.hora_entrada_prevista))
+        if momento < entrada - margen:
+            return False
+    if visitante.hora_salida_prevista:
+        salida = timezone.make_aware(datetime.combine(visitante.fecha_visita, visitante.hora_salida_prevista))
+        if momento > salida + margen:
+            return False
+    return True
+
+
+def identificar_rostro(ubicaciones, encodings, tiempos=None):
+    """
+    Parte de reconocer_rostro que no toca las imágenes: busca en la galería la cara
+    más grande de las ya detectadas y codificadas (por ejemplo, en el servicio de
+    reconocimiento) y trae a la persona de la base de datos.
+    Lanza IndexError si no se detectó ninguna cara, aunque la galería esté vacía.
+    """
+    tiempos = tiempos if tiempos is not None else {}
+    if not len(encodings):
+        raise IndexError("No se detectó ninguna cara")
+    galeria = obtener_galeria()
+
+    if not len(galeria):
+        return None, [] # No hay personas contra las que comparar
+
+    unknown_encoding = encodings[indice_cara_principal(ubicaciones)]
+
+    inicio = time.perf_counter()
+    candidatos = _formatear_candidatos(galeria.buscar(unknown_encoding, k=CANDIDATOS))
+    _medir(tiempos, 'busqueda', inicio)
+
+    if not candidatos or candidatos[0]["distancia"] > TOLERANCIA:
+        return None, candidatos # No se encontró ninguna coincidencia
+
+    mejor = candidatos[0]
+    modelo = Residente if mejor["tipo"] == 'residente' else Visitante
+    return modelo.objects.filter(id=mejor["id"]).first(), candidatos
+
+
+def reconocer_rostros_lote(imagenes, tiempos=None):
+    """
+    Reconoce todas las caras de varias imágenes (ráfagas de fotogramas o grupos).
+    Detecta y codifica todas las caras de cada imagen, y busca todos los encodings
+    en la galería con una sola consulta por lotes.
+    Devuelve, por imagen, una lista de (ubicacion, persona, candidatos) por cara.
+    """
+    return identificar_rostros_lote(detectar_y_codificar(imagenes, tiempos), tiempos)
+
+
+def identificar_rostros_lote(detecciones, tiempos=None):
+    """
+    Parte de reconocer_rostros_lote que no toca las imágenes: recibe, por imagen,
+    (ubicaciones, encodings) ya calculados y los identifica todos de una vez.
+    """
+    tiempos = tiempos if tiempos is not None else {}
+    ubicaciones_por_imagen = []
+    encodings = []
+    for ubicaciones, encodings_imagen in detecciones:
+        encodings.extend(encodings_imagen)
+        ubicaciones_por_imagen.append(ubicaciones)
+
+    inicio = time.perf_counter()
+    galeria = obtener_galeria()
+    if encodings and len(galeria):
+        busquedas = galeria.buscar_lote(encodings, k=CANDIDATOS)
+    else:
+        busquedas = [[] for _ in encodings]
+    _medir(tiempos, 'busqueda', inicio)
+    candidatos_por_cara = [_formatear_candidatos(resultados) for resultados in busquedas]
+
+    # Traemos a todas las personas reconocidas con una consulta por modelo
+    aceptados = [candidatos[0] for candidatos in candidatos_por_cara
+                 if candidatos and candidatos[0]["distancia"] <= TOLERANCIA]
+    personas = {
+        'residente': Residente.objects.select_related('unidad').prefetch_related('vehiculos').in_bulk(
+            [c["id"] for c in aceptados if c["tipo"] == 'residente']),
+        'visitante': Visitante.objects.select_related('autorizado_por').in_bulk(
+            [c["id"] for c in aceptados if c["tipo"] == 'visitante']),
+    }
+
+    resultados = []
+    caras = iter(candidatos_por_cara)
+    for ubicaciones in ubicaciones_por_imagen:
+        resultados_imagen = []
+        for ubicacion in ubicaciones:
+            candidatos = next(caras)
+            persona = None
+            if candidatos and candidatos[0]["distancia"] <= TOLERANCIA:
+                persona = personas[candidatos[0]["tipo"]].get(candidatos[0]["id"])
+            resultados_imagen.append((ubicacion, persona, candidatos))
+        resultados.append(resultados_imagen)
+    return resultados
+
+
+def _formatear_candidatos(resultados):
+    """
+    Convierte los resultados (tipo, id, distancia) de la galería en diccionarios
+    con la confianza de cada candidato.
+    """
+    return [
+        {
+            "tipo": tipo,
+            "id": persona_id,
+            "distancia": round(distancia, 4),
+            "confianza": round(calcular_confianza(distancia), 4),
+        }
+        for tipo, persona_id, distancia in resultados
+    ]
@@ -0,0 +1,52 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class FiltroParametros(BaseFilterBackend):
+    """
+    Filtra los listados con parámetros de la URL declarados en la vista:
+    - `filtros`: {parametro: campo}, ej. {'unidad': 'unidad', 'pagado': 'pagado'}
+      -> ?unidad=<uuid>&pagado=true
+    - `campo_fecha`: campo usado por ?desde= y ?hasta= (inclusive), ej. 'timestamp'
+      -> ?desde=2025-01-01&hasta=2025-01-31
+    Los valores se convierten con el campo del modelo; uno inválido devuelve 400.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        condiciones = {}
+        for parametro, campo in getattr(view, 'filtros', {}).items():
+            valor = request.query_params.get(parametro)
+            if valor not in (None, ''):
+                condiciones[campo] = self._convertir(queryset.model, campo, parametro, valor)
+
+        campo_fecha = getattr(view, 'campo_fecha', None)
+        if campo_fecha:
+            for parametro, operador in (('desde', 'gte'), ('hasta', 'lte')):
+                valor = request.query_params.get(parametro)
+                if valor:
+                    fecha = self._convertir(queryset.model, campo_fecha, parametro, valor)
+                    if operador == 'lte' and len(valor) == 10 and hasattr(fecha, 'hour'):
+                        # ?hasta=AAAA-MM-DD incluye todo ese día
+                        fecha = fecha.replace(hour=23, minute=59, second=59, microsecond=999999)
+                    condiciones[f'{campo_fecha}__{operador}'] = fecha
+
+        return queryset.filter(**condiciones) if condiciones else queryset
+
+    def _convertir(self, modelo, campo, parametro, valor):
+        # Se sigue la ruta del campo (ej. 'residente__unidad') hasta el campo final
+        for nombre in campo.split('__'):
+            field = modelo._meta.get_field(nombre)
+            modelo = field.related_model or modelo
+        if isinstance(field, models.BooleanField):
+            # BooleanField acepta 'True'/'t'/'1' pero no el 'true' habitual en las URLs
+            valor = {'true': 'True', 'false': 'False'}.get(valor.lower(), valor)
+        try:
+            convertido = field.to_python(valor)
+        except DjangoValidationError:
+            raise ValidationError({parametro: f"Valor inválido: '{valor}'."})
+        if hasattr(convertido, 'tzinfo') and hasattr(convertido, 'hour') and timezone.is_naive(convertido):
+            convertido = timezone.make_aware(convertido)
+        return convertido
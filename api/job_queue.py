@@ -0,0 +1,118 @@
+import queue
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+
+class ColaLlena(Exception):
+    """Se lanza cuando la cola de trabajos no admite más trabajos pendientes."""
+
+
+# Cada cuántos segundos se vuelve a leer un trabajo de otro proceso mientras se espera (long-poll)
+INTERVALO_CONSULTA = 0.1
+
+
+class ColaTrabajos:
+    """
+    Cola de trabajos local (en memoria) atendida por hilos en segundo plano.
+    Cada trabajo recibe un id con el que se consulta su estado y resultado.
+    Los trabajos se ejecutan en el proceso que los encoló, pero su estado y
+    resultado se guardan en la caché `cache` de Django: cualquier worker que
+    comparta esa caché responde la consulta. Cada estado se guarda `ttl` segundos.
+    Es un reemplazo local de un broker (Redis, RabbitMQ) para un solo nodo.
+    """
+
+    def __init__(self, hilos=2, capacidad=100, ttl=600, cache='default'):
+        self.ttl = ttl
+        self.cache = cache
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._condicion = threading.Condition()
+        for numero in range(hilos):
+            threading.Thread(target=self._atender, name=f'cola-trabajos-{numero}', daemon=True).start()
+
+    def encolar(self, funcion, *args):
+        """
+        Agrega un trabajo a la cola y devuelve su id. `funcion` debe devolver un Response de DRF.
+        """
+        trabajo_id = uuid.uuid4()
+        self._guardar({"id": trabajo_id, "estado": "pendiente", "creado": time.time()})
+        try:
+            self._cola.put_nowait((trabajo_id, funcion, args))
+        except queue.Full:
+            caches[self.cache].delete(self._clave(trabajo_id))
+            raise ColaLlena()
+        return trabajo_id
+
+    def obtener(self, trabajo_id, esperar=0):
+        """
+        Devuelve una copia del trabajo (o None si no existe o ya venció).
+        Si `esperar` > 0 y el trabajo no terminó, espera hasta ese número de segundos (long-poll):
+        los trabajos de este proceso avisan al terminar, los de otros se vuelven a leer
+        cada INTERVALO_CONSULTA segundos.
+        """
+        limite = time.time() + esperar
+        while True:
+            trabajo = caches[self.cache].get(self._clave(trabajo_id))
+            if trabajo is None or trabajo["estado"] in ("completado", "error"):
+                return trabajo
+            restante = limite - time.time()
+            if restante <= 0:
+                return trabajo
+            with self._condicion:
+                self._condicion.wait(min(restante, INTERVALO_CONSULTA))
+
+    def _atender(self):
+        while True:
+            trabajo_id, funcion, args = self._cola.get()
+            self._actualizar(trabajo_id, estado="procesando")
+            try:
+                respuesta = funcion(*args)
+                self._actualizar(trabajo_id, estado="completado", codigo=respuesta.status_code, resultado=respuesta.data)
+            except Exception as e:
+                self._actualizar(trabajo_id, estado="error", codigo=500, resultado={"error": str(e)})
+            finally:
+                # Cada hilo tiene su propia conexión: la cerramos para no dejarla abierta entre trabajos
+                connections.close_all()
+                self._cola.task_done()
+
+    def _actualizar(self, trabajo_id, **campos):
+        # Sólo el hilo que atiende el trabajo lo modifica después de encolarlo
+        trabajo = caches[self.cache].get(self._clave(trabajo_id))
+        if trabajo is not None:
+            trabajo.update(campos)
+            if trabajo["estado"] in ("completado", "error"):
+                trabajo["terminado"] = time.time()
+            self._guardar(trabajo)
+        with self._condicion:
+            self._condicion.notify_all()
+
+    def _guardar(self, trabajo):
+        caches[self.cache].set(self._clave(trabajo["id"]), trabajo, timeout=self.ttl)
+
+    @staticmethod
+    def _clave(trabajo_id):
+        return f'trabajo:{trabajo_id}'
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def obtener_cola():
+    """
+    Devuelve la cola de trabajos del proceso, creándola (y arrancando sus hilos) la primera vez.
+    """
+    global _cola
+    if _cola is None:
+        with _cola_lock:
+            if _cola is None:
+                _cola = ColaTrabajos(
+                    hilos=getattr(settings, 'JOB_QUEUE_THREADS', 2),
+                    capacidad=getattr(settings, 'JOB_QUEUE_SIZE', 100),
+                    ttl=getattr(settings, 'JOB_RESULT_TTL', 600),
+                    cache=getattr(settings, 'JOB_CACHE', 'default'),
+                )
+    return _cola
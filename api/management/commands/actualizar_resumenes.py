@@ -0,0 +1,33 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+
+from api.dashboard import recalcular_accesos, recalcular_gastos, recalcular_reservas
+
+
+class Command(BaseCommand):
+    help = ('Recalcula los resúmenes del dashboard de gastos vencidos y de ingresos por reservas. '
+            'Conviene ejecutarlo periódicamente (por ejemplo, cada hora desde cron). '
+            'El resumen de accesos se mantiene solo al escribir los registros; con --accesos se reconstruye.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accesos', action='store_true',
+                            help='Reconstruye también el resumen de accesos a partir de los registros.')
+        parser.add_argument('--desde', type=str, default=None,
+                            help='Con --accesos, fecha (AAAA-MM-DD) desde la que se reconstruye; '
+                                 'por defecto, desde el registro más antiguo que queda en la base de datos.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Resumen de gastos: {recalcular_gastos()} meses.')
+        self.stdout.write(f'Resumen de reservas: {recalcular_reservas()} filas.')
+
+        if options['accesos']:
+            desde = None
+            if options['desde']:
+                try:
+                    desde = datetime.datetime.strptime(options['desde'], '%Y-%m-%d').replace(
+                        tzinfo=datetime.timezone.utc)
+                except ValueError:
+                    raise CommandError('--desde debe tener el formato AAAA-MM-DD.')
+            self.stdout.write(f'Resumen de accesos: {recalcular_accesos(desde)} filas.')
+
+        self.stdout.write(self.style.SUCCESS('Resúmenes actualizados.'))
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.access_partitions import archivar_mes, inicio_mes, meses_entre
+from api.models import RegistroAcceso
+
+
+class Command(BaseCommand):
+    help = ('Archiva los registros de acceso más antiguos que el período de retención: '
+            'cada mes se guarda en un archivo .jsonl.gz y se quita de la base de datos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int, default=getattr(settings, 'ACCESS_LOG_RETENTION_MONTHS', 12),
+            help='Meses completos que se conservan en la base de datos, además del actual.')
+        parser.add_argument(
+            '--directorio', default=getattr(settings, 'ACCESS_LOG_ARCHIVE_DIR', 'archivo'),
+            help='Directorio donde se guardan los archivos comprimidos.')
+
+    def handle(self, *args, **options):
+        # Primer mes que se conserva: todo lo anterior se archiva
+        hoy = timezone.now()
+        anio, mes = hoy.year, hoy.month
+        for _ in range(options['meses']):
+            anio, mes = (anio - 1, 12) if mes == 1 else (anio, mes - 1)
+        limite = inicio_mes(anio, mes)
+
+        primero = RegistroAcceso.objects.filter(timestamp__lt=limite).order_by('timestamp').first()
+        if primero is None:
+            self.stdout.write(self.style.SUCCESS('No hay registros de acceso para archivar.'))
+            return
+
+        total = 0
+        for anio_archivo, mes_archivo in meses_entre(primero.timestamp, limite):
+            if inicio_mes(anio_archivo, mes_archivo) >= limite:
+                break
+            ruta, cantidad = archivar_mes(anio_archivo, mes_archivo, options['directorio'])
+            if ruta:
+                total += cantidad
+                self.stdout.write(f'{anio_archivo:04d}-{mes_archivo:02d}: {cantidad} registros archivados en {ruta}.')
+
+        self.stdout.write(self.style.SUCCESS(f'Se archivaron {total} registros de acceso.'))
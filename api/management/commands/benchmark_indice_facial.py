@@ -0,0 +1,76 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.face_index import DIMENSION_ENCODING, IndiceExacto, IndiceIVF
+from api.models import Residente, Visitante
+
+
+class Command(BaseCommand):
+    help = 'Compara recall y latencia (p50/p99) del índice facial aproximado (IVF) contra la búsqueda exacta.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rostros', type=int, default=20000,
+                            help='Cantidad de rostros sintéticos en la galería.')
+        parser.add_argument('--consultas', type=int, default=1000,
+                            help='Cantidad de búsquedas a medir.')
+        parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32],
+                            help='Valores de nprobe a comparar.')
+        parser.add_argument('--nlist', type=int, default=None,
+                            help='Cantidad de listas del IVF (por defecto 4 * sqrt(rostros)).')
+        parser.add_argument('--desde-galeria', action='store_true',
+                            help='Usa los encodings guardados en la base de datos en lugar de datos sintéticos.')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        vectores = self._vectores(options, rng)
+        if not len(vectores):
+            self.stdout.write(self.style.ERROR('No hay encodings para medir.'))
+            return
+
+        # Las consultas son rostros de la galería con ruido, como una nueva foto de la misma persona
+        elegidos = rng.integers(0, len(vectores), options['consultas'])
+        consultas = vectores[elegidos] + rng.normal(0, 0.02, (len(elegidos), DIMENSION_ENCODING))
+        claves = list(range(len(vectores)))
+
+        exacto = IndiceExacto()
+        exacto.restaurar(claves, vectores, {})
+        esperados, latencias = self._medir(exacto, consultas)
+        self._reportar('exacto', esperados, esperados, latencias)
+
+        inicio = time.perf_counter()
+        ivf = IndiceIVF(nlist=options['nlist'], minimo_entrenamiento=len(vectores) + 1)
+        ivf.restaurar(claves, vectores, {})
+        ivf.entrenar()
+        self.stdout.write(f"IVF entrenado con {len(ivf._listas)} listas en {time.perf_counter() - inicio:.2f} s")
+
+        for nprobe in options['nprobe']:
+            ivf.nprobe = nprobe
+            resultados, latencias = self._medir(ivf, consultas)
+            self._reportar(f'ivf nprobe={nprobe}', esperados, resultados, latencias)
+
+    def _vectores(self, options, rng):
+        if options['desde_galeria']:
+            encodings = [
+                np.frombuffer(encoding, dtype=np.float64)
+                for modelo in (Residente, Visitante)
+                for encoding in modelo.objects.exclude(encoding_facial__isnull=True).values_list('encoding_facial', flat=True)
+            ]
+            return np.array(encodings).reshape(-1, DIMENSION_ENCODING)
+        # Escala similar a los encodings de dlib: personas distintas quedan a ~1.0 de distancia
+        return rng.normal(0, 0.06, (options['rostros'], DIMENSION_ENCODING))
+
+    def _medir(self, indice, consultas):
+        resultados, latencias = [], []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            mejor = indice.buscar(consulta, k=1)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            resultados.append(mejor[0][0] if mejor else None)
+        return resultados, np.array(latencias)
+
+    def _reportar(self, nombre, esperados, resultados, latencias):
+        recall = np.mean([esperado == resultado for esperado, resultado in zip(esperados, resultados)])
+        self.stdout.write(
+            f"{nombre:<16} recall@1={recall:.3f}  p50={np.percentile(latencias, 50):.3f} ms  "
+            f"p99={np.percentile(latencias, 99):.3f} ms")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Residente, Visitante
+
+
+class Command(BaseCommand):
+    help = 'Calcula y guarda los encodings faciales de los residentes y visitantes que aún no los tienen.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todos', action='store_true',
+            help='Recalcula el encoding de todos los residentes y visitantes, aunque su foto no haya cambiado.')
+
+    def handle(self, *args, **options):
+        for modelo in (Residente, Visitante):
+            # La foto del visitante es opcional
+            personas = modelo.objects.exclude(foto_perfil='').exclude(foto_perfil__isnull=True)
+            if not options['todos']:
+                personas = personas.filter(foto_hash='')
+
+            calculados = 0
+            for persona in personas.iterator():
+                # Al vaciar el hash, la señal pre_save vuelve a calcular el encoding
+                persona.foto_hash = ''
+                persona.save(update_fields=['encoding_facial', 'foto_hash'])
+                if persona.encoding_facial is not None:
+                    calculados += 1
+
+            self.stdout.write(self.style.SUCCESS(
+                f'Se calcularon {calculados} encodings faciales de {modelo._meta.verbose_name_plural}.'))
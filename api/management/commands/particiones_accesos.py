@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.access_partitions import crear_particion, es_postgresql, meses_entre, nombre_particion
+
+
+class Command(BaseCommand):
+    help = ('Crea por adelantado las particiones mensuales de los registros de acceso (PostgreSQL). '
+            'Conviene ejecutarlo una vez al mes, por ejemplo desde cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=3,
+                            help='Cantidad de meses futuros, además del actual, con partición propia.')
+
+    def handle(self, *args, **options):
+        if not es_postgresql():
+            self.stdout.write(self.style.WARNING(
+                'La base de datos no es PostgreSQL: los registros de acceso no están particionados.'))
+            return
+
+        hoy = timezone.now()
+        creadas = 0
+        for anio, mes in meses_entre(hoy, hoy, adelante=options['meses']):
+            if crear_particion(anio, mes):
+                creadas += 1
+                self.stdout.write(f'Partición {nombre_particion(anio, mes)} creada.')
+
+        self.stdout.write(self.style.SUCCESS(f'Se crearon {creadas} particiones.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.balance_triggers import recalcular_saldos, saldos_descuadrados, tiene_triggers, triggers_faltantes
+
+
+class Command(BaseCommand):
+    help = ('Recalcula el saldo deudor de cada unidad como la suma de sus gastos no pagados. '
+            'Sirve para conciliar saldos editados a mano o cargados antes de los triggers.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo-revisar', action='store_true',
+                            help='Sólo lista las unidades con el saldo descuadrado, sin corregirlas.')
+
+    def handle(self, *args, **options):
+        faltantes = triggers_faltantes()
+        if not tiene_triggers():
+            self.stdout.write(self.style.WARNING(
+                'La base de datos no tiene triggers de saldo: conviene ejecutar este comando periódicamente.'))
+        elif faltantes:
+            self.stdout.write(self.style.WARNING(
+                f'Faltan los triggers de saldo {", ".join(faltantes)}: ejecute `python manage.py migrate`.'))
+
+        with transaction.atomic():
+            descuadradas = list(saldos_descuadrados())
+            for unidad in descuadradas:
+                self.stdout.write(
+                    f'Unidad {unidad.numero}: saldo {unidad.saldo_deudor}, calculado {unidad.saldo_calculado}')
+            if options['solo_revisar']:
+                self.stdout.write(f'{len(descuadradas)} unidades con el saldo descuadrado.')
+                return
+            recalcular_saldos()
+
+        self.stdout.write(self.style.SUCCESS(f'Se corrigieron {len(descuadradas)} saldos.'))
@@ -1,92 +1,181 @@
 import cv2
 import time
-from django.core.management.base import BaseCommand
-from django.core.files.base import ContentFile
-import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
-# Importamos la lógica de OCR y los modelos de la app 'api'
-from api.ocr_logic import reconocer_placa
-from api.models import RegistroAcceso
+# Importamos el pipeline de cámaras de la app 'api'
+from api.access_log import obtener_escritor_accesos
+from api.camera_pipeline import (
+    BACKENDS_CAPTURA, CapturaCamara, FiltroFotogramas, ProcesadorPlacas, SalidaDepuracion,
+    anotar,
+)
 
 # --- CONFIGURACIÓN ---
 # 0 para la cámara web, o la ruta a un archivo de video
 VIDEO_SOURCE = "api/mi_video.mp4"
 COOLDOWN_SECONDS = 30  # Tiempo en segundos para no registrar la misma placa repetidamente
+OCR_THREADS = 4  # Hilos de OCR compartidos por todas las cámaras
+STATS_SECONDS = 10  # Cada cuántos segundos se muestran las estadísticas por cámara
+DEBUG_FPS = 2  # Fotogramas anotados por segundo en la salida de depuración del modo sin ventanas
 # ---------------------
 
 
 class Command(BaseCommand):
-    help = 'Inicia el proceso de reconocimiento de placas a través de una cámara en tiempo real.'
+    help = 'Inicia el proceso de reconocimiento de placas a través de una o varias cámaras en tiempo real.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fuente', action='append', default=[], metavar='NOMBRE=FUENTE',
+            help="Cámara a analizar (repetible). Ej: --fuente porton=rtsp://10.0.0.5/stream --fuente salida=0. "
+                 "Si no se indica, se usa CAMERA_SOURCES de settings o VIDEO_SOURCE.")
+        parser.add_argument('--hilos-ocr', type=int, default=OCR_THREADS,
+                            help='Hilos de OCR compartidos por todas las cámaras.')
+        parser.add_argument('--fps-ocr', type=float, default=None,
+                            help='Fotogramas por segundo analizados como máximo por cámara (0 = todos).')
+        parser.add_argument('--movimiento', choices=['mog2', 'diferencia', 'ninguno'], default=None,
+                            help='Detección de movimiento antes del OCR (por defecto CAMERA_GATING).')
+        parser.add_argument('--roi', default=None, metavar='X0,Y0,X1,Y1',
+                            help='Región donde se busca movimiento, en fracciones del fotograma. Ej: 0.2,0.5,0.8,1')
+        parser.add_argument('--sin-ventanas', action='store_true',
+                            help='Modo producción: no abre ventanas (cv2.imshow) ni anota los fotogramas.')
+        parser.add_argument('--grabar', metavar='DIRECTORIO', default=None,
+                            help='Sin ventanas: graba un video anotado por cámara en DIRECTORIO.')
+        parser.add_argument('--mjpeg', metavar='PUERTO', type=int, default=None,
+                            help='Sin ventanas: sirve los fotogramas anotados como MJPEG en http://127.0.0.1:PUERTO/<camara>.')
+        parser.add_argument('--fps-depuracion', type=float, default=DEBUG_FPS,
+                            help='Fotogramas anotados por segundo en --grabar/--mjpeg.')
+        parser.add_argument('--backend', choices=sorted(BACKENDS_CAPTURA), default=None,
+                            help='Backend de captura de OpenCV (por defecto CAMERA_CAPTURE).')
+
+    def handle(self, *args, **options):
+        fuentes = self._fuentes(options['fuente'])
 
-    def handle(self, *args, **kwargs):
         self.stdout.write(self.style.SUCCESS(
-            'Iniciando el sistema de vigilancia de placas...'))
-
-        cap = cv2.VideoCapture(VIDEO_SOURCE)
-
-        if not cap.isOpened():
-            self.stdout.write(self.style.ERROR(
-                f"Error: No se pudo abrir la fuente de video: {VIDEO_SOURCE}"))
-            return
-
-        # Diccionario para rastrear la última vez que se vio una placa
-        last_seen_plates = {}
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                self.stdout.write(self.style.WARNING(
-                    "Fin del video o error al leer el fotograma. Reiniciando captura..."))
-                # Si es un archivo de video, termina. Si es una cámara, podría intentar reconectar.
-                if isinstance(VIDEO_SOURCE, str):
+            f'Iniciando el sistema de vigilancia de placas con {len(fuentes)} cámara(s)...'))
+
+        escritor = obtener_escritor_accesos()
+        procesador = ProcesadorPlacas(escritor, hilos=options['hilos_ocr'], cooldown=COOLDOWN_SECONDS,
+                                      seguimiento=self._seguimiento())
+
+        # Cada cámara tiene su propio filtro (el modelo de fondo es distinto en cada una)
+        gating = self._gating(options)
+        captura = dict(getattr(settings, 'CAMERA_CAPTURE', {}))
+        if options['backend']:
+            captura['BACKEND'] = options['backend']
+        camaras = [CapturaCamara(nombre, fuente, filtro=FiltroFotogramas(**gating) if gating else None,
+                                 captura=captura)
+                   for nombre, fuente in fuentes.items()]
+
+        ventanas = not options['sin_ventanas']
+        salida = None
+        if not ventanas and (options['grabar'] or options['mjpeg']):
+            salida = SalidaDepuracion(fps=options['fps_depuracion'], directorio=options['grabar'],
+                                      puerto=options['mjpeg'])
+        for camara in camaras:
+            camara.start()
+
+        ultimo_reporte = time.time()
+        anteriores = {camara.nombre: (0, 0) for camara in camaras}
+        try:
+            while any(not camara.terminada for camara in camaras):
+                for camara in camaras:
+                    # Un solo fotograma en proceso por cámara: mientras tanto la captura sigue
+                    # reemplazando el último fotograma y los intermedios se descartan
+                    if procesador.ocupado(camara.nombre):
+                        continue
+                    ultimo = camara.ultimo_fotograma()
+                    if ultimo is None:
+                        # Sin fotogramas nuevos (filtrados por movimiento): las placas que se
+                        # dejaron de ver generan su evento igual
+                        procesador.expirar(camara.nombre)
+                        continue
+                    _, frame = ultimo
+                    procesador.enviar(camara.nombre, frame)
+                    lectura = procesador.ultima_lectura.get(camara.nombre)
+                    if ventanas:
+                        self._mostrar(camara.nombre, frame, lectura)
+                    elif salida is not None:
+                        salida.publicar(camara.nombre, frame, lectura)
+
+                # Mostramos el video en una ventana por cámara; 'q' para salir
+                if ventanas and cv2.waitKey(1) & 0xFF == ord('q'):
                     break
-                cap.release()
-                cap = cv2.VideoCapture(VIDEO_SOURCE)
-                continue
-
-            # Llamamos a la función de reconocimiento que ya tenemos
-            vehiculo_encontrado, placa_detectada, rect_placa = reconocer_placa(
-                frame)
-
-            if vehiculo_encontrado:
-                current_time = time.time()
-                placa = vehiculo_encontrado.placa
-
-                # Comprobamos si la placa está en cooldown
-                if placa not in last_seen_plates or (current_time - last_seen_plates[placa]) > COOLDOWN_SECONDS:
-                    self.stdout.write(self.style.SUCCESS(
-                        f"¡Acceso concedido! Vehículo con placa {placa} reconocido."))
-
-                    # Guardar el frame como imagen en memoria
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    image_content = ContentFile(
-                        buffer.tobytes(), name=f'{placa}_{int(current_time)}.jpg')
-
-                    # Crear el registro de acceso en la base de datos
-                    RegistroAcceso.objects.create(
-                        residente=vehiculo_encontrado.residente_asociado,
-                        tipo='ENTRADA',
-                        foto_capturada=image_content
-                    )
-
-                    # Actualizar el tiempo de la última vez que se vio la placa
-                    last_seen_plates[placa] = current_time
-
-            # Dibujar el rectángulo de la placa detectada para depuración visual
-            if rect_placa:
-                (x, y, w, h) = rect_placa
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(frame, placa_detectada, (x, y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-            # Mostramos el video en una ventana (opcional)
-            # Puedes comentar estas dos líneas si corres el script en un servidor sin pantalla
-            cv2.imshow("Sistema de Vigilancia - Presiona 'q' para salir", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+
+                if time.time() - ultimo_reporte >= STATS_SECONDS:
+                    self._reportar(camaras, procesador, anteriores, time.time() - ultimo_reporte)
+                    ultimo_reporte = time.time()
+                time.sleep(0.005)
+        except KeyboardInterrupt:
+            pass
 
         # Liberar recursos al finalizar
-        cap.release()
-        cv2.destroyAllWindows()
+        for camara in camaras:
+            camara.detener()
+        procesador.detener()
+        escritor.detener()
+        if salida is not None:
+            salida.cerrar()
+        if ventanas:
+            cv2.destroyAllWindows()
         self.stdout.write(self.style.SUCCESS(
-            'Sistema de vigilancia detenido.'))
+            f'Sistema de vigilancia detenido. Accesos registrados: {escritor.escritos}.'))
+
+    def _fuentes(self, argumentos):
+        if argumentos:
+            fuentes = {}
+            for argumento in argumentos:
+                nombre, separador, fuente = argumento.partition('=')
+                if not separador:
+                    # Sin nombre: se usa la fuente como nombre
+                    nombre, fuente = argumento, argumento
+                fuentes[nombre] = fuente
+            return fuentes
+        fuentes = getattr(settings, 'CAMERA_SOURCES', None) or {'camara': VIDEO_SOURCE}
+        return {nombre: str(fuente) for nombre, fuente in fuentes.items()}
+
+    def _seguimiento(self):
+        configuracion = getattr(settings, 'PLATE_TRACKING', {})
+        return {
+            'iou_minimo': configuracion.get('IOU_MINIMO', 0.3),
+            'votos': configuracion.get('VOTOS', 3),
+            'apoyo_minimo': configuracion.get('APOYO_MINIMO', 0.6),
+            'olvido': configuracion.get('OLVIDO', 1.5),
+        }
+
+    def _gating(self, options):
+        configuracion = getattr(settings, 'CAMERA_GATING', {})
+        fps = options['fps_ocr'] if options['fps_ocr'] is not None else configuracion.get('FPS', 0)
+        movimiento = options['movimiento'] or configuracion.get('MOVIMIENTO')
+        if movimiento == 'ninguno':
+            movimiento = None
+        roi = configuracion.get('ROI')
+        if options['roi']:
+            roi = tuple(float(valor) for valor in options['roi'].split(','))
+            if len(roi) != 4:
+                raise CommandError('--roi debe tener el formato X0,Y0,X1,Y1')
+        if not fps and not movimiento:
+            return None
+        return {
+            'fps': fps,
+            'movimiento': movimiento,
+            'roi': roi,
+            'area_minima': configuracion.get('AREA_MINIMA', 0.01),
+            'mantener': configuracion.get('MANTENER', 2.0),
+        }
+
+    def _mostrar(self, nombre, frame, lectura):
+        # Dibujar el rectángulo de la última placa detectada para depuración visual
+        frame = anotar(frame, lectura)
+        cv2.imshow(f"Sistema de Vigilancia - {nombre} - Presiona 'q' para salir", frame)
+
+    def _reportar(self, camaras, procesador, anteriores, segundos):
+        for camara in camaras:
+            procesados = procesador.procesados.get(camara.nombre, 0)
+            seguidor = procesador.seguidor(camara.nombre)
+            pistas = f" | pistas {seguidor.pistas_creadas} | OCR evitados {seguidor.ocr_evitados}" if seguidor else ""
+            leidos_antes, procesados_antes = anteriores[camara.nombre]
+            anteriores[camara.nombre] = (camara.leidos, procesados)
+            self.stdout.write(
+                f"[{camara.nombre}] captura {(camara.leidos - leidos_antes) / segundos:.1f} FPS | "
+                f"OCR {(procesados - procesados_antes) / segundos:.1f} FPS | leídos {camara.leidos} | "
+                f"filtrados {camara.filtrados} | descartados {camara.descartados} | procesados {procesados}{pistas}")
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_areacomun_aviso_registroacceso_descripcion_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='residente',
+            name='encoding_facial',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='residente',
+            name='foto_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 de la foto usada para calcular el encoding', max_length=64),
+        ),
+    ]
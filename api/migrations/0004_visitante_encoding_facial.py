@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_residente_encoding_facial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitante',
+            name='encoding_facial',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='visitante',
+            name='foto_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 de la foto usada para calcular el encoding', max_length=64),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_visitante_encoding_facial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registroacceso',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Fecha y hora del evento'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:36
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_registroacceso_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroacceso',
+            name='foto_miniatura',
+            field=models.ImageField(blank=True, editable=False, help_text='Miniatura de la foto capturada para listados', null=True, upload_to=api.models.ruta_captura),
+        ),
+        migrations.AddField(
+            model_name='registroacceso',
+            name='foto_recorte',
+            field=models.ImageField(blank=True, editable=False, help_text='Recorte de la cara o de la placa reconocida', null=True, upload_to=api.models.ruta_captura),
+        ),
+        migrations.AlterField(
+            model_name='registroacceso',
+            name='foto_capturada',
+            field=models.ImageField(blank=True, help_text='Foto capturada por la cámara en el momento del acceso', null=True, upload_to=api.models.ruta_captura),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+def particionar(apps, schema_editor):
+    # El particionado nativo sólo existe en PostgreSQL; en SQLite sólo se crean los índices
+    from api.access_partitions import es_postgresql, particionar_tabla
+    if es_postgresql(schema_editor.connection):
+        particionar_tabla(schema_editor)
+
+
+def despartir(apps, schema_editor):
+    from api.access_partitions import es_postgresql, despartir_tabla
+    if es_postgresql(schema_editor.connection):
+        despartir_tabla(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_registroacceso_recorte_miniatura'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, despartir),
+        migrations.AddIndex(
+            model_name='registroacceso',
+            index=models.Index(fields=['timestamp', 'residente'], name='registro_ts_residente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroacceso',
+            index=models.Index(fields=['timestamp', 'visitante'], name='registro_ts_visitante_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_registroacceso_particionado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aviso',
+            index=models.Index(fields=['fecha_publicacion'], name='aviso_publicacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['unidad', 'pagado'], name='gasto_unidad_pagado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['fecha_emision', 'id'], name='gasto_emision_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['fecha_vencimiento'], name='gasto_vencimiento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservaareacomun',
+            index=models.Index(fields=['fecha_creacion'], name='reserva_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservaareacomun',
+            index=models.Index(fields=['fecha_reserva'], name='reserva_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:05
+
+from django.db import migrations
+
+
+def crear_triggers(apps, schema_editor):
+    # Reemplazan a las señales de Gasto que actualizaban el saldo desde Python
+    from api.balance_triggers import crear_triggers
+    crear_triggers(schema_editor)
+
+
+def eliminar_triggers(apps, schema_editor):
+    from api.balance_triggers import eliminar_triggers
+    eliminar_triggers(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_indices_listados'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_triggers, eliminar_triggers),
+    ]
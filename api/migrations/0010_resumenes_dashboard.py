@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_triggers_saldo_deudor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenGastos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes de vencimiento', unique=True)),
+                ('pendiente', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('vencido', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cantidad_vencidos', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='registroacceso',
+            name='punto_acceso',
+            field=models.CharField(blank=True, default='', help_text='Cámara o puerta por la que se registró el acceso', max_length=50),
+        ),
+        migrations.CreateModel(
+            name='ResumenAccesos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(help_text='Inicio de la hora (UTC)')),
+                ('punto_acceso', models.CharField(blank=True, default='', max_length=50)),
+                ('tipo', models.CharField(choices=[('ENTRADA', 'Entrada'), ('SALIDA', 'Salida')], max_length=10)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hora', 'punto_acceso', 'tipo'), name='resumen_accesos_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenReservas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes de la reserva')),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, help_text='Reservas pagadas', max_digits=14)),
+                ('por_cobrar', models.DecimalField(decimal_places=2, default=0, help_text='Reservas no pagadas', max_digits=14)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('area_comun', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='api.areacomun')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mes', 'area_comun'), name='resumen_reservas_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:10
+
+import datetime
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def completar_fecha_creacion(apps, schema_editor):
+    # Los gastos existentes reciben la medianoche de su fecha de emisión más un
+    # microsegundo por gasto, para que el cursor no encuentre valores repetidos
+    Gasto = apps.get_model('api', 'Gasto')
+    lote, fecha_actual, orden = [], None, 0
+    for gasto in Gasto.objects.order_by('fecha_emision', 'id').only('id', 'fecha_emision').iterator(chunk_size=2000):
+        if gasto.fecha_emision != fecha_actual:
+            fecha_actual, orden = gasto.fecha_emision, 0
+        gasto.fecha_creacion = datetime.datetime.combine(
+            fecha_actual, datetime.time(), tzinfo=datetime.timezone.utc) + datetime.timedelta(microseconds=orden)
+        orden += 1
+        lote.append(gasto)
+        if len(lote) >= 1000:
+            Gasto.objects.bulk_update(lote, ['fecha_creacion'])
+            lote = []
+    Gasto.objects.bulk_update(lote, ['fecha_creacion'])
+
+
+def reinstalar_triggers(apps, schema_editor):
+    # Al deshacerla, quitar la columna en SQLite reconstruye la tabla y borra los triggers de saldo
+    from api.balance_triggers import reinstalar_triggers
+    reinstalar_triggers(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_resumenes_dashboard'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstalar_triggers),
+        migrations.AddField(
+            model_name='gasto',
+            name='fecha_creacion',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(completar_fecha_creacion, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='gasto',
+            name='gasto_emision_idx',
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['fecha_creacion'], name='gasto_creacion_idx'),
+        ),
+    ]
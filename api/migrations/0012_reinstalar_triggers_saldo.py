@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:40
+
+from django.db import migrations
+
+
+def reinstalar_triggers(apps, schema_editor):
+    # En SQLite, 0011 reconstruyó la tabla de gastos y con ella se borraron los
+    # triggers de 0009: se vuelven a crear y se concilian los saldos que quedaron
+    # sin actualizar mientras faltaban
+    from api.balance_triggers import recalcular_saldos, reinstalar_triggers
+    reinstalar_triggers(schema_editor)
+    recalcular_saldos()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_gasto_fecha_creacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstalar_triggers, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 
 class UnidadHabitacional(models.Model):
@@ -25,6 +26,10 @@ class Residente(models.Model):
     foto_perfil = models.ImageField(
         upload_to='residentes/', help_text="Foto para reconocimiento facial")
     unidad = models.ForeignKey(UnidadHabitacional, on_delete=models.SET_NULL, null=True, blank=True, related_name='residentes')
+    # Encoding facial (vector de 128 floats) calculado una sola vez a partir de foto_perfil
+    encoding_facial = models.BinaryField(blank=True, null=True, editable=False)
+    foto_hash = models.CharField(
+        max_length=64, blank=True, editable=False, help_text="SHA-256 de la foto usada para calcular el encoding")
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
@@ -45,11 +50,23 @@ class Visitante(models.Model):
     hora_salida_prevista = models.TimeField(blank=True, null=True)
     foto_perfil = models.ImageField(
         upload_to='visitantes/', blank=True, null=True, help_text="Foto opcional para reconocimiento")
+    encoding_facial = models.BinaryField(blank=True, null=True, editable=False)
+    foto_hash = models.CharField(
+        max_length=64, blank=True, editable=False, help_text="SHA-256 de la foto usada para calcular el encoding")
 
     def __str__(self):
         return f"Visitante: {self.nombre} {self.apellido} (Autorizado por: {self.autorizado_por.nombre})"
 
 
+def ruta_captura(instance, filename):
+    """
+    Guarda las capturas en carpetas por fecha del evento (capturas_acceso/AAAA/MM/DD/),
+    para que ningún directorio crezca sin límite.
+    """
+    fecha = instance.timestamp or timezone.now()
+    return f"capturas_acceso/{fecha:%Y/%m/%d}/{filename}"
+
+
 class RegistroAcceso(models.Model):
     """Modelo para registrar las entradas y salidas."""
     TIPO_ACCESO = [
@@ -63,12 +80,27 @@ class RegistroAcceso(models.Model):
     visitante = models.ForeignKey(
         Visitante, on_delete=models.SET_NULL, null=True, blank=True)
     timestamp = models.DateTimeField(
-        auto_now_add=True, help_text="Fecha y hora del evento")
+        default=timezone.now, editable=False, help_text="Fecha y hora del evento")
     tipo = models.CharField(max_length=10, choices=TIPO_ACCESO)
+    punto_acceso = models.CharField(
+        max_length=50, blank=True, default='', help_text="Cámara o puerta por la que se registró el acceso")
     foto_capturada = models.ImageField(
-        upload_to='capturas_acceso/', help_text="Foto capturada por la cámara en el momento del acceso", blank=True, null=True)
+        upload_to=ruta_captura, help_text="Foto capturada por la cámara en el momento del acceso", blank=True, null=True)
+    foto_recorte = models.ImageField(
+        upload_to=ruta_captura, blank=True, null=True, editable=False,
+        help_text="Recorte de la cara o de la placa reconocida")
+    foto_miniatura = models.ImageField(
+        upload_to=ruta_captura, blank=True, null=True, editable=False,
+        help_text="Miniatura de la foto capturada para listados")
     descripcion = models.CharField(max_length=255, blank=True, null=True, help_text="Descripción adicional del evento")
 
+    class Meta:
+        # En PostgreSQL la tabla está particionada por mes sobre timestamp (ver access_partitions.py)
+        indexes = [
+            models.Index(fields=['timestamp', 'residente'], name='registro_ts_residente_idx'),
+            models.Index(fields=['timestamp', 'visitante'], name='registro_ts_visitante_idx'),
+        ]
+
     def __str__(self):
         persona = self.residente if self.residente else self.visitante
         return f"{self.tipo} de {persona if persona else 'N/A'} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
@@ -111,6 +143,13 @@ class ReservaAreaComun(models.Model):
     pagado = models.BooleanField(default=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Orden de la paginación por cursor y filtro ?desde=/?hasta= (ver api/views.py)
+        indexes = [
+            models.Index(fields=['fecha_creacion'], name='reserva_creacion_idx'),
+            models.Index(fields=['fecha_reserva'], name='reserva_fecha_idx'),
+        ]
+
     def __str__(self):
         return f"Reserva de {self.area_comun} por {self.residente} para {self.fecha_reserva}"
 
@@ -124,6 +163,17 @@ class Gasto(models.Model):
     fecha_emision = models.DateField(auto_now_add=True)
     fecha_vencimiento = models.DateField()
     pagado = models.BooleanField(default=False)
+    # Momento exacto de creación: clave de la paginación por cursor (fecha_emision se repite
+    # en todos los gastos de una misma generación de expensas)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Gastos pendientes de una unidad, orden de la paginación por cursor y filtro por vencimiento
+        indexes = [
+            models.Index(fields=['unidad', 'pagado'], name='gasto_unidad_pagado_idx'),
+            models.Index(fields=['fecha_creacion'], name='gasto_creacion_idx'),
+            models.Index(fields=['fecha_vencimiento'], name='gasto_vencimiento_idx'),
+        ]
 
     def __str__(self):
         return f"Gasto de {self.monto} para {self.unidad.numero} - {self.descripcion}"
@@ -136,5 +186,63 @@ class Aviso(models.Model):
     contenido = models.TextField()
     fecha_publicacion = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['fecha_publicacion'], name='aviso_publicacion_idx')]
+
     def __str__(self):
         return self.titulo
+
+
+class ResumenAccesos(models.Model):
+    """
+    Cantidad de accesos por hora, punto de acceso y tipo, para el dashboard.
+    El escritor de accesos la incrementa al guardar cada lote (ver dashboard.py).
+    """
+    hora = models.DateTimeField(help_text="Inicio de la hora (UTC)")
+    punto_acceso = models.CharField(max_length=50, blank=True, default='')
+    tipo = models.CharField(max_length=10, choices=RegistroAcceso.TIPO_ACCESO)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hora', 'punto_acceso', 'tipo'], name='resumen_accesos_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.cantidad} {self.tipo} en {self.punto_acceso or 'N/A'} - {self.hora.strftime('%Y-%m-%d %H:00')}"
+
+
+class ResumenGastos(models.Model):
+    """
+    Gastos no pagados por mes de vencimiento, para el dashboard.
+    Lo recalcula el comando actualizar_resumenes.
+    """
+    mes = models.DateField(unique=True, help_text="Primer día del mes de vencimiento")
+    pendiente = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    vencido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cantidad_vencidos = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Gastos de {self.mes.strftime('%Y-%m')}: {self.vencido} vencido"
+
+
+class ResumenReservas(models.Model):
+    """
+    Ingresos por reservas de cada área común por mes, para el dashboard.
+    Lo recalcula el comando actualizar_resumenes.
+    """
+    mes = models.DateField(help_text="Primer día del mes de la reserva")
+    area_comun = models.ForeignKey(AreaComun, on_delete=models.CASCADE, related_name='resumenes')
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Reservas pagadas")
+    por_cobrar = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Reservas no pagadas")
+    cantidad = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'area_comun'], name='resumen_reservas_unico'),
+        ]
+
+    def __str__(self):
+        return f"Reservas de {self.area_comun} en {self.mes.strftime('%Y-%m')}: {self.ingresos}"
@@ -0,0 +1,114 @@
+import threading
+import numpy as np
+from django.conf import settings
+
+# Sólo letras mayúsculas y números, una sola línea de texto (psm 7)
+CARACTERES_PLACA = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+CONFIG_PYTESSERACT = f"-c tessedit_char_whitelist={CARACTERES_PLACA} --psm 7"
+
+
+class MotorPytesseract:
+    """
+    Motor OCR con pytesseract: lanza un proceso `tesseract` por cada imagen.
+    Se mantiene como respaldo cuando tesserocr no está instalado.
+    """
+    nombre = 'pytesseract'
+
+    def __init__(self):
+        import pytesseract
+        # Le indicamos a pytesseract dónde encontrar el ejecutable de Tesseract
+        pytesseract.pytesseract.tesseract_cmd = getattr(
+            settings, 'TESSERACT_CMD', r'C:\Program Files\Tesseract-OCR\tesseract.exe')
+        self._pytesseract = pytesseract
+
+    def preparar(self):
+        pass
+
+    def reconocer_lote(self, rois):
+        """
+        Lee el texto de cada ROI en escala de grises. Es un generador: quien lo consume
+        puede detenerse en la primera placa válida sin pagar el OCR del resto.
+        """
+        for roi in rois:
+            yield self._pytesseract.image_to_string(roi, config=CONFIG_PYTESSERACT)
+
+
+class MotorTesserocr:
+    """
+    Motor OCR con tesserocr: usa la API de Tesseract dentro del mismo proceso.
+    El motor se inicializa una sola vez por hilo (cargar el modelo de idioma es lo caro)
+    y se reutiliza para todas las ROIs de todos los fotogramas.
+    """
+    nombre = 'tesserocr'
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+
+    def preparar(self):
+        """
+        Inicializa el motor del hilo actual, por ejemplo al arrancar un worker.
+        """
+        self._api()
+
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            opciones = {'lang': 'eng', 'psm': self._tesserocr.PSM.SINGLE_LINE}
+            tessdata = getattr(settings, 'TESSDATA_PREFIX', None)
+            if tessdata:
+                opciones['path'] = str(tessdata)
+            api = self._tesserocr.PyTessBaseAPI(**opciones)
+            api.SetVariable('tessedit_char_whitelist', CARACTERES_PLACA)
+            self._local.api = api
+        return api
+
+    def reconocer_lote(self, rois):
+        """
+        Lee el texto de cada ROI en escala de grises reutilizando el mismo motor.
+        Es un generador, igual que en MotorPytesseract.
+        """
+        api = self._api()
+        for roi in rois:
+            roi = np.ascontiguousarray(roi)
+            alto, ancho = roi.shape[:2]
+            api.SetImageBytes(roi.tobytes(), ancho, alto, 1, ancho)
+            yield api.GetUTF8Text()
+
+
+MOTORES = {
+    'tesserocr': MotorTesserocr,
+    'pytesseract': MotorPytesseract,
+}
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def crear_motor(backend='auto'):
+    """
+    Crea el motor OCR configurado. Con 'auto' usa tesserocr si está disponible y,
+    si no, pytesseract.
+    """
+    if backend != 'auto':
+        return MOTORES[backend]()
+    try:
+        motor = MotorTesserocr()
+        motor.preparar()
+        return motor
+    except (ImportError, RuntimeError):
+        # tesserocr no está instalado o no encuentra los datos de idioma
+        return MotorPytesseract()
+
+
+def obtener_motor():
+    """
+    Devuelve el motor OCR del proceso, creándolo la primera vez.
+    """
+    global _motor
+    if _motor is None:
+        with _motor_lock:
+            if _motor is None:
+                _motor = crear_motor(getattr(settings, 'OCR_BACKEND', 'auto'))
+    return _motor
@@ -1,15 +1,103 @@
-import pytesseract
 import cv2
 import re
 import os
-from .models import Vehiculo
-
-# Le indicamos a pytesseract dónde encontrar el ejecutable de Tesseract
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+import threading
+from django.conf import settings
+from .ocr_backends import obtener_motor
+from .plate_cache import obtener_cache_placas
 
 # Ancho y alto mínimo del contorno para ser considerado una placa
 MIN_PLATE_WIDTH = 60
 MIN_PLATE_HEIGHT = 15
+# Cantidad máxima de candidatos (los mejor puntuados) que pasan al OCR por fotograma
+MAX_CANDIDATOS_OCR = getattr(settings, 'OCR_MAX_CANDIDATES', 5)
+# Relación ancho/alto típica de una placa
+ASPECTO_PLACA = 4.0
+
+# Contadores acumulados del proceso: candidatos examinados vs llamadas al OCR
+_contadores = {"fotogramas": 0, "contornos": 0, "candidatos": 0, "llamadas_ocr": 0, "placas_leidas": 0}
+_contadores_lock = threading.Lock()
+
+
+def estadisticas_ocr():
+    """
+    Devuelve una copia de los contadores acumulados de leer_placa en este proceso.
+    """
+    with _contadores_lock:
+        return dict(_contadores)
+
+
+def sumar_estadisticas(estadisticas):
+    """
+    Acumula en los contadores del proceso las estadísticas de un fotograma.
+    """
+    with _contadores_lock:
+        _contadores["fotogramas"] += 1
+        for clave, valor in estadisticas.items():
+            _contadores[clave] += valor
+
+
+def _suma_rect(integral, x, y, w, h):
+    """
+    Suma de los píxeles de un rectángulo en O(1) usando la imagen integral.
+    """
+    return integral[y + h, x + w] - integral[y, x + w] - integral[y + h, x] + integral[y, x]
+
+
+def puntuar_candidatos(candidatos, bordes, binaria, forma):
+    """
+    Ordena los rectángulos candidatos de más a menos probable de ser una placa.
+    Combina densidad de bordes (los caracteres generan muchos), rectangularidad del
+    contorno, proporción de píxeles de texto, relación de aspecto y una preferencia
+    por la mitad inferior y el centro del fotograma, donde suele aparecer la placa.
+    `candidatos` es una lista de (contorno, (x, y, w, h)); devuelve los rects ordenados.
+    """
+    alto_imagen, ancho_imagen = forma[:2]
+    # Imágenes integrales: cada densidad se calcula en O(1) por candidato
+    integral_bordes = cv2.integral(bordes // 255)
+    integral_binaria = cv2.integral(binaria // 255)
+
+    puntuados = []
+    for contorno, (x, y, w, h) in candidatos:
+        area = float(w * h)
+        densidad_bordes = _suma_rect(integral_bordes, x, y, w, h) / area
+        relleno = _suma_rect(integral_binaria, x, y, w, h) / area
+        rectangularidad = cv2.contourArea(contorno) / area
+
+        puntaje = (
+            # Las placas tienen bastantes bordes (caracteres), pero no ruido total
+            1.5 * (1.0 - min(abs(densidad_bordes - 0.2) / 0.2, 1.0))
+            # Texto oscuro sobre fondo claro: entre 15% y 50% de píxeles "de tinta"
+            + 1.0 * (1.0 - min(abs(relleno - 0.3) / 0.3, 1.0))
+            + 1.0 * min(rectangularidad, 1.0)
+            + 0.5 * (1.0 - min(abs(w / float(h) - ASPECTO_PLACA) / ASPECTO_PLACA, 1.0))
+            # Prioridad por posición: mitad inferior y centro horizontal del fotograma
+            + 0.5 * (1.0 - abs((y + h / 2.0) / alto_imagen - 0.65))
+            + 0.5 * (1.0 - abs((x + w / 2.0) / ancho_imagen - 0.5) * 2)
+        )
+        puntuados.append((puntaje, (x, y, w, h)))
+
+    puntuados.sort(key=lambda candidato: candidato[0], reverse=True)
+    return _suprimir_solapados([rect for _, rect in puntuados])
+
+
+def _suprimir_solapados(rects, umbral=0.6):
+    """
+    Quita los rectángulos que se solapan mucho con uno mejor puntuado
+    (RETR_LIST devuelve el borde interior y exterior de una misma placa).
+    """
+    elegidos = []
+    for x, y, w, h in rects:
+        solapado = False
+        for ex, ey, ew, eh in elegidos:
+            interseccion = max(0, min(x + w, ex + ew) - max(x, ex)) * max(0, min(y + h, ey + eh) - max(y, ey))
+            union = w * h + ew * eh - interseccion
+            if union and interseccion / float(union) > umbral:
+                solapado = True
+                break
+        if not solapado:
+            elegidos.append((x, y, w, h))
+    return elegidos
 
 
 def validar_formato_placa(texto):
@@ -28,9 +116,34 @@ def validar_formato_placa(texto):
     return None
 
 
-def reconocer_placa(image):
+def leer_placa(image, estadisticas=None):
     """
     Procesa una imagen para detectar, leer y validar una placa de vehículo.
+    Sólo hace el trabajo de visión/OCR (no consulta la base de datos), así puede
+    ejecutarse en los procesos del servicio de reconocimiento.
+    Sólo los MAX_CANDIDATOS_OCR candidatos mejor puntuados pasan al OCR, así el costo
+    por fotograma queda acotado. Si se pasa `estadisticas`, se llenan ahí los contadores
+    del fotograma (contornos, candidatos, llamadas_ocr, placas_leidas).
+    Devuelve (placa_limpia, rect_placa); placa_limpia es "" si no se leyó ninguna.
+    """
+    estadisticas = estadisticas if estadisticas is not None else {}
+    estadisticas.update({"contornos": 0, "candidatos": 0, "llamadas_ocr": 0, "placas_leidas": 0})
+    try:
+        return _leer_placa(image, estadisticas)
+    finally:
+        sumar_estadisticas(estadisticas)
+
+
+def _leer_placa(image, estadisticas):
+    gray, candidatos = detectar_candidatos(image, estadisticas)
+    return leer_candidatos(gray, candidatos[:MAX_CANDIDATOS_OCR], estadisticas)
+
+
+def detectar_candidatos(image, estadisticas):
+    """
+    Etapa de visión de leer_placa, sin OCR: busca los rectángulos que podrían ser
+    una placa y los ordena de más a menos probable.
+    Devuelve (gray, rects), con la imagen en grises de la que se recortan las ROIs.
     """
     # 1. Pre-procesamiento de la imagen
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -49,30 +162,69 @@ def reconocer_placa(image):
     contornos, _ = cv2.findContours(
         closing, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
 
-    # Variable para guardar las coordenadas del rectángulo de la placa detectada
-    rect_placa = None
-    placa_limpia = ""
-    # Iterar sobre los contornos encontrados
+    # 3. Filtrado de contornos por tamaño y forma
+    candidatos = []
     for c in contornos:
-        # 3. Filtrado de contornos por tamaño y forma
         (x, y, w, h) = cv2.boundingRect(c)
         aspect_ratio = w / float(h)
         if w > MIN_PLATE_WIDTH and h > MIN_PLATE_HEIGHT and 2.5 < aspect_ratio < 5.0:
-            # 4. Recorte de la posible placa (ROI - Region of Interest)
-            roi = gray[y:y+h, x:x+w]
+            candidatos.append((c, (x, y, w, h)))
+    estadisticas["contornos"] = estadisticas.get("contornos", 0) + len(contornos)
+    estadisticas["candidatos"] = estadisticas.get("candidatos", 0) + len(candidatos)
+    if not candidatos:
+        return gray, []
+
+    # 4. Ranking de candidatos: sólo los mejores pasan al OCR
+    bordes = cv2.Canny(blurred, 100, 200)
+    return gray, puntuar_candidatos(candidatos, bordes, thresh, gray.shape)
+
+
+def leer_candidatos(gray, mejores, estadisticas):
+    """
+    Lee con OCR los rectángulos dados, en orden, hasta encontrar una placa válida.
+    Devuelve (placa_limpia, rect_placa), o ("", None) si ninguno se pudo leer.
+    """
+    if not mejores:
+        return "", None
 
-            # 5. OCR con Tesseract y configuración optimizada
-            config = "-c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 --psm 7"
-            texto_extraido = pytesseract.image_to_string(roi, config=config)
+    # 5. Recorte de las posibles placas (ROI - Region of Interest)
+    rois = (gray[y:y+h, x:x+w] for (x, y, w, h) in mejores)
 
-            # 6. Validación del formato de la placa
-            placa_validada = validar_formato_placa(texto_extraido)
-            if placa_validada:
-                placa_limpia = placa_validada
-                rect_placa = (x, y, w, h) # Guardamos las coordenadas
-                break  # Encontramos una placa válida, salimos del bucle
+    # 6. OCR de las ROIs del fotograma con el mismo motor de Tesseract
+    for rect, texto_extraido in zip(mejores, obtener_motor().reconocer_lote(rois)):
+        estadisticas["llamadas_ocr"] = estadisticas.get("llamadas_ocr", 0) + 1
+        # 7. Validación del formato de la placa
+        placa_validada = validar_formato_placa(texto_extraido)
+        if placa_validada:
+            estadisticas["placas_leidas"] = estadisticas.get("placas_leidas", 0) + 1
+            # Encontramos una placa válida: el resto de ROIs ya no se procesa
+            return placa_validada, rect
 
-    # Buscar el vehículo en la base de datos
-    vehiculo = Vehiculo.objects.filter(placa=placa_limpia).first()
+    return "", None
 
-    return vehiculo, placa_limpia, rect_placa
+
+def buscar_vehiculo(placa_limpia):
+    """
+    Busca el vehículo registrado con la placa dada (None si no hay placa o no existe).
+    Usa la caché de placas en memoria, así que normalmente no consulta la base de datos.
+    Si la placa no coincide exactamente, acepta la registrada más parecida (un error de OCR).
+    """
+    return buscar_vehiculo_aproximado(placa_limpia)[0]
+
+
+def buscar_vehiculo_aproximado(placa_limpia):
+    """
+    Como buscar_vehiculo, pero devuelve (vehiculo, distancia) entre la placa leída y
+    la registrada (0 si coinciden exactamente, None si no se encontró).
+    """
+    if not placa_limpia:
+        return None, None
+    return obtener_cache_placas().buscar_aproximada(placa_limpia)
+
+
+def reconocer_placa(image):
+    """
+    Detecta y lee la placa de la imagen y busca el vehículo en la base de datos.
+    """
+    placa_limpia, rect_placa = leer_placa(image)
+    return buscar_vehiculo(placa_limpia), placa_limpia, rect_placa
@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PaginacionNumerada(PageNumberPagination):
+    """
+    Paginación por defecto de los listados: ?page=N, con ?page_size= hasta max_page_size.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class PaginacionPorCursor(CursorPagination):
+    """
+    Paginación por cursor (keyset) para los recursos ordenados por fecha: cada página
+    continúa desde la última fila de la anterior usando el índice, sin OFFSET, así
+    el costo no crece al avanzar páginas ni se repiten filas si llegan registros nuevos.
+    La vista indica el orden con `orden_cursor` (por defecto, los más nuevos primero).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-timestamp'
+
+    def get_ordering(self, request, queryset, view):
+        orden = getattr(view, 'orden_cursor', self.ordering)
+        return (orden,) if isinstance(orden, str) else tuple(orden)
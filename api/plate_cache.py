@@ -0,0 +1,154 @@
+import threading
+import time
+from django.conf import settings
+
+from .models import Vehiculo
+from .plate_index import DISTANCIA_MAXIMA, IndicePlacas
+
+
+class CachePlacas:
+    """
+    Mapa en memoria placa -> Vehiculo (con su residente ya cargado) para que leer una
+    placa no consulte la base de datos. Se mantiene al día con las señales de Vehiculo
+    y Residente de este proceso; los cambios hechos en otros procesos se ven al
+    recargar (cada `recarga` segundos) o, para placas nuevas, cuando vence su entrada
+    en la caché negativa (placas leídas que no están registradas, por `ttl_negativo` segundos).
+    Un IndicePlacas permite además encontrar la placa registrada más parecida a una
+    lectura con errores del OCR (ver buscar_aproximada).
+    """
+
+    def __init__(self, ttl_negativo=30, recarga=300, max_negativos=10000, max_distancia=1.0):
+        if max_distancia > DISTANCIA_MAXIMA:
+            # Se avisa al arrancar y no en cada búsqueda
+            raise ValueError(f"PLATE_FUZZY_MAX_DISTANCE no puede superar {DISTANCIA_MAXIMA} (ver plate_index.py).")
+        self._lock = threading.RLock()
+        self.ttl_negativo = ttl_negativo
+        self.recarga = recarga
+        self.max_negativos = max_negativos
+        self.max_distancia = max_distancia
+        self._vehiculos = {}
+        self._indice = IndicePlacas()
+        self._placas_por_id = {}
+        self._negativos = {}
+        self._cargada_en = 0.0
+        self.cargada = False
+
+    def __len__(self):
+        return len(self._vehiculos)
+
+    def cargar(self):
+        """
+        Carga todos los vehículos con una sola consulta.
+        """
+        vehiculos = {v.placa: v for v in Vehiculo.objects.select_related('residente_asociado')}
+        indice = IndicePlacas()
+        for placa in vehiculos:
+            indice.agregar(placa)
+        with self._lock:
+            self._vehiculos = vehiculos
+            self._indice = indice
+            self._placas_por_id = {v.pk: placa for placa, v in vehiculos.items()}
+            self._negativos = {}
+            self._cargada_en = time.monotonic()
+            self.cargada = True
+
+    def buscar(self, placa):
+        """
+        Devuelve el vehículo con esa placa o None. Sólo consulta la base de datos si la
+        placa no está en el mapa ni se vio hace poco como no registrada.
+        """
+        if self.recarga and time.monotonic() - self._cargada_en > self.recarga:
+            with self._lock:
+                if time.monotonic() - self._cargada_en > self.recarga:
+                    self.cargar()
+
+        vehiculo = self._vehiculos.get(placa)
+        if vehiculo is not None:
+            return vehiculo
+        visto = self._negativos.get(placa)
+        if visto is not None and time.monotonic() - visto < self.ttl_negativo:
+            return None
+
+        # Placa desconocida: puede haberse registrado desde otro proceso
+        vehiculo = Vehiculo.objects.select_related('residente_asociado').filter(placa=placa).first()
+        with self._lock:
+            if vehiculo is not None:
+                self._guardar(vehiculo)
+            else:
+                if len(self._negativos) >= self.max_negativos:
+                    self._negativos.clear()
+                self._negativos[placa] = time.monotonic()
+        return vehiculo
+
+    def buscar_aproximada(self, placa):
+        """
+        Como buscar, pero si la placa no está registrada tal cual se busca la registrada
+        más parecida (dentro de max_distancia, ver plate_index.py).
+        Devuelve (vehiculo, distancia); distancia es 0 en una coincidencia exacta.
+        """
+        vehiculo = self.buscar(placa)
+        if vehiculo is not None:
+            return vehiculo, 0.0
+        if not self.max_distancia:
+            return None, None
+        registrada, distancia = self._indice.buscar(placa, self.max_distancia)
+        vehiculo = self._vehiculos.get(registrada) if registrada else None
+        if vehiculo is None:
+            return None, None
+        return vehiculo, distancia
+
+    def actualizar_vehiculo(self, pk):
+        """
+        Vuelve a leer un vehículo guardado (su placa o su residente pudieron cambiar).
+        """
+        vehiculo = Vehiculo.objects.select_related('residente_asociado').filter(pk=pk).first()
+        with self._lock:
+            self._quitar(pk)
+            if vehiculo is not None:
+                self._guardar(vehiculo)
+
+    def eliminar_vehiculo(self, pk):
+        with self._lock:
+            self._quitar(pk)
+
+    def actualizar_residente(self, residente_id):
+        """
+        Vuelve a leer los vehículos de un residente modificado, para que el residente
+        devuelto junto al vehículo no quede desactualizado.
+        """
+        vehiculos = list(Vehiculo.objects.select_related('residente_asociado')
+                         .filter(residente_asociado_id=residente_id))
+        with self._lock:
+            for vehiculo in vehiculos:
+                self._quitar(vehiculo.pk)
+                self._guardar(vehiculo)
+
+    def _guardar(self, vehiculo):
+        self._vehiculos[vehiculo.placa] = vehiculo
+        self._placas_por_id[vehiculo.pk] = vehiculo.placa
+        self._indice.agregar(vehiculo.placa)
+        self._negativos.pop(vehiculo.placa, None)
+
+    def _quitar(self, pk):
+        placa = self._placas_por_id.pop(pk, None)
+        if placa is not None:
+            self._vehiculos.pop(placa, None)
+            self._indice.eliminar(placa)
+
+
+cache_placas = CachePlacas(
+    ttl_negativo=getattr(settings, 'PLATE_NEGATIVE_TTL', 30),
+    recarga=getattr(settings, 'PLATE_CACHE_REFRESH', 300),
+    max_distancia=getattr(settings, 'PLATE_FUZZY_MAX_DISTANCE', 1.0),
+)
+
+
+def obtener_cache_placas():
+    """
+    Devuelve la caché de placas del proceso, cargándola la primera vez.
+    """
+    if not cache_placas.cargada:
+        with cache_placas._lock:
+            if not cache_placas.cargada:
+                cache_placas.cargar()
+    return cache_placas
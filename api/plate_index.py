@@ -0,0 +1,110 @@
+from collections import defaultdict
+
+# Caracteres que el OCR confunde entre sí: cambiar uno por otro del mismo grupo cuesta
+# COSTO_CONFUSION en lugar de 1. Con un costo >= 0.5 la distancia sigue siendo una métrica.
+GRUPOS_CONFUSION = ["0ODQ", "1IL", "2Z", "5S", "6G", "8B", "4A", "7T"]
+COSTO_CONFUSION = 0.5
+
+# Distancia máxima que el índice busca sin omitir placas: encuentra toda placa a la que
+# se llega con confusiones y a lo sumo una edición de otro tipo, es decir, toda placa a
+# distancia menor que 2 (las distancias son múltiplos de COSTO_CONFUSION)
+DISTANCIA_MAXIMA = 1.5
+
+_CANONICO = {caracter: grupo[0] for grupo in GRUPOS_CONFUSION for caracter in grupo}
+
+
+def canonizar(placa):
+    """
+    Reemplaza cada carácter por el representante de su grupo de confusión.
+    """
+    return ''.join(_CANONICO.get(caracter, caracter) for caracter in placa)
+
+
+def costo_sustitucion(a, b):
+    if a == b:
+        return 0.0
+    if _CANONICO.get(a, a) == _CANONICO.get(b, b):
+        return COSTO_CONFUSION
+    return 1.0
+
+
+def distancia_placas(a, b):
+    """
+    Distancia de edición ponderada: insertar o borrar cuesta 1, sustituir cuesta 1
+    o COSTO_CONFUSION si los caracteres suelen confundirse (O/0, B/8, S/5...).
+    """
+    anterior = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        actual = [float(i)]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + costo_sustitucion(ca, cb)))
+        anterior = actual
+    return anterior[-1]
+
+
+def _variantes(clave):
+    """
+    La clave y todas las versiones con un carácter borrado.
+    """
+    return {clave} | {clave[:i] + clave[i + 1:] for i in range(len(clave))}
+
+
+class IndicePlacas:
+    """
+    Índice de placas para buscar la registrada más parecida a una lectura del OCR.
+    Cada placa se indexa por su forma canónica (grupos de confusión unificados) y sus
+    variantes con un carácter borrado: dos placas que difieren en confusiones y a lo
+    sumo una edición cualquiera comparten alguna variante. Así una búsqueda consulta
+    unas pocas entradas del diccionario y sólo calcula la distancia exacta sobre
+    esos candidatos, sin recorrer todas las placas.
+    """
+
+    def __init__(self):
+        self._variantes = defaultdict(set)
+        self._placas = set()
+
+    def __len__(self):
+        return len(self._placas)
+
+    def agregar(self, placa):
+        self._placas.add(placa)
+        for variante in _variantes(canonizar(placa)):
+            self._variantes[variante].add(placa)
+
+    def eliminar(self, placa):
+        self._placas.discard(placa)
+        for variante in _variantes(canonizar(placa)):
+            placas = self._variantes.get(variante)
+            if placas is not None:
+                placas.discard(placa)
+                if not placas:
+                    del self._variantes[variante]
+
+    def buscar(self, placa, max_distancia=1.0):
+        """
+        Devuelve (placa_registrada, distancia) de la placa más cercana dentro de
+        max_distancia, o (None, None) si no hay ninguna o si hay un empate entre
+        placas distintas (no se puede decidir cuál es la correcta).
+        Encuentra cualquier cantidad de confusiones más a lo sumo una edición de otro tipo:
+        max_distancia no puede superar DISTANCIA_MAXIMA.
+        """
+        if max_distancia > DISTANCIA_MAXIMA:
+            raise ValueError(
+                f"max_distancia no puede superar {DISTANCIA_MAXIMA}: el índice no encontraría todas las placas.")
+        candidatos = set()
+        for variante in _variantes(canonizar(placa)):
+            candidatos |= self._variantes.get(variante, set())
+
+        mejor, mejor_distancia, empate = None, None, False
+        for candidato in candidatos:
+            distancia = distancia_placas(placa, candidato)
+            if distancia > max_distancia:
+                continue
+            if mejor_distancia is None or distancia < mejor_distancia:
+                mejor, mejor_distancia, empate = candidato, distancia, False
+            elif distancia == mejor_distancia:
+                empate = True
+
+        if mejor is None or empate:
+            return None, None
+        return mejor, mejor_distancia
@@ -0,0 +1,180 @@
+import itertools
+from collections import Counter
+
+from .ocr_logic import (
+    MAX_CANDIDATOS_OCR, detectar_candidatos, leer_candidatos, sumar_estadisticas, validar_formato_placa,
+)
+
+
+def _iou(a, b):
+    """
+    Intersección sobre unión de dos rectángulos (x, y, w, h).
+    """
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    interseccion = max(0, min(ax + aw, bx + bw) - max(ax, bx)) * max(0, min(ay + ah, by + bh) - max(ay, by))
+    union = aw * ah + bw * bh - interseccion
+    return interseccion / float(union) if union else 0.0
+
+
+class PistaPlaca:
+    """
+    Una placa seguida a través de los fotogramas: su último rectángulo, el
+    desplazamiento entre fotogramas y las lecturas de OCR acumuladas para votar.
+    """
+
+    def __init__(self, id, rect, momento):
+        self.id = id
+        self.rect = rect
+        self.desplazamiento = (0, 0)
+        self.ultimo_visto = momento
+        self.lecturas = []
+        self.fotograma = None
+        self.rect_fotograma = None
+        self.confirmada = False
+        self.emitida = False
+
+    def prediccion(self):
+        """
+        Rectángulo esperado en el siguiente fotograma (velocidad constante).
+        """
+        x, y, w, h = self.rect
+        dx, dy = self.desplazamiento
+        return (x + dx, y + dy, w, h)
+
+    def actualizar(self, rect, momento):
+        self.desplazamiento = (rect[0] - self.rect[0], rect[1] - self.rect[1])
+        self.rect = rect
+        self.ultimo_visto = momento
+
+    def votar(self, placa, fotograma):
+        self.lecturas.append(placa)
+        # Fotograma (y posición de la placa en él) de la última lectura, para el registro de acceso
+        self.fotograma = fotograma
+        self.rect_fotograma = self.rect
+
+    def consenso(self):
+        """
+        Combina las lecturas carácter por carácter (entre las de la longitud más votada).
+        Devuelve (placa, apoyo), donde apoyo es la fracción de votos del carácter menos
+        votado: 1.0 si todas las lecturas coinciden.
+        """
+        if not self.lecturas:
+            return "", 0.0
+        largo = Counter(len(lectura) for lectura in self.lecturas).most_common(1)[0][0]
+        mismas = [lectura for lectura in self.lecturas if len(lectura) == largo]
+
+        caracteres = []
+        apoyo = 1.0
+        for posicion in zip(*mismas):
+            caracter, votos = Counter(posicion).most_common(1)[0]
+            caracteres.append(caracter)
+            apoyo = min(apoyo, votos / float(len(mismas)))
+
+        placa = validar_formato_placa(''.join(caracteres))
+        if placa is None:
+            # La combinación no tiene formato de placa: usamos la lectura más repetida
+            placa = Counter(self.lecturas).most_common(1)[0][0]
+        return placa, apoyo
+
+
+class SeguidorPlacas:
+    """
+    Sigue las placas de una cámara entre fotogramas emparejando los rectángulos
+    candidatos por IoU con la posición predicha de cada pista.
+    Mientras una pista no está confirmada se hace OCR sólo de su rectángulo y se
+    acumulan votos; una vez confirmada (`votos` lecturas con apoyo suficiente) se
+    reutiliza su lectura sin volver a llamar al OCR. Cada pista produce un único
+    evento: al confirmarse o, si no llegó a confirmarse, al perderse. El momento
+    del evento es `ultimo_visto` de la pista, no el de su emisión.
+    """
+
+    def __init__(self, iou_minimo=0.3, votos=3, apoyo_minimo=0.6, olvido=1.5):
+        self.iou_minimo = iou_minimo
+        self.votos = votos
+        self.apoyo_minimo = apoyo_minimo
+        self.olvido = olvido
+        self.pistas = []
+        self._ids = itertools.count(1)
+        self.pistas_creadas = 0
+        self.ocr_evitados = 0
+
+    def procesar(self, image, momento):
+        """
+        Procesa un fotograma y devuelve las pistas que deben generar un evento de acceso.
+        """
+        estadisticas = {}
+        gray, libres = detectar_candidatos(image, estadisticas)
+
+        # 1. Pistas existentes: cada una toma el candidato que mejor se solapa con su predicción
+        for pista in self.pistas:
+            rect = self._emparejar(pista, libres)
+            if rect is None:
+                continue
+            libres.remove(rect)
+            pista.actualizar(rect, momento)
+            if pista.confirmada:
+                self.ocr_evitados += 1
+                continue
+            placa, _ = leer_candidatos(gray, [rect], estadisticas)
+            if placa:
+                self._votar(pista, placa, image)
+
+        # 2. Placas nuevas: sólo los mejores candidatos que no pertenecen a ninguna pista
+        placa, rect = leer_candidatos(gray, libres[:MAX_CANDIDATOS_OCR], estadisticas)
+        if placa:
+            pista = PistaPlaca(next(self._ids), rect, momento)
+            self._votar(pista, placa, image)
+            self.pistas.append(pista)
+            self.pistas_creadas += 1
+        sumar_estadisticas(estadisticas)
+
+        # 3. Eventos y limpieza de las pistas que ya no se ven
+        return self.expirar(momento)
+
+    def expirar(self, momento):
+        """
+        Devuelve las pistas que deben generar un evento (confirmadas o perdidas en
+        `momento`) y olvida las perdidas. Se llama con cada fotograma y también cuando
+        la cámara no entrega fotogramas (filtrados por movimiento), para que una pista
+        perdida no espere al próximo fotograma para generar su evento.
+        """
+        eventos = []
+        vigentes = []
+        for pista in self.pistas:
+            perdida = momento - pista.ultimo_visto > self.olvido
+            if not pista.emitida and (pista.confirmada or perdida):
+                pista.emitida = True
+                eventos.append(pista)
+            if not perdida:
+                vigentes.append(pista)
+        self.pistas = vigentes
+        return eventos
+
+    def hay_perdidas(self, momento):
+        return any(momento - pista.ultimo_visto > self.olvido for pista in self.pistas)
+
+    def ultima_lectura(self):
+        """
+        (placa, rect) de la pista vista más recientemente, para dibujarla; ("", None) si no hay.
+        """
+        if not self.pistas:
+            return "", None
+        pista = max(self.pistas, key=lambda p: p.ultimo_visto)
+        return pista.consenso()[0], pista.rect
+
+    def _emparejar(self, pista, rects):
+        prediccion = pista.prediccion()
+        mejor, mejor_iou = None, self.iou_minimo
+        for rect in rects:
+            iou = max(_iou(prediccion, rect), _iou(pista.rect, rect))
+            if iou >= mejor_iou:
+                mejor, mejor_iou = rect, iou
+        return mejor
+
+    def _votar(self, pista, placa, image):
+        pista.votar(placa, image)
+        _, apoyo = pista.consenso()
+        lecturas = len(pista.lecturas)
+        # Si tras el doble de lecturas aún no hay acuerdo, nos quedamos con el consenso
+        pista.confirmada = lecturas >= self.votos and (apoyo >= self.apoyo_minimo or lecturas >= 2 * self.votos)
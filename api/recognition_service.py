@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import numpy as np
+from django.conf import settings
+
+
+class ServicioSaturado(Exception):
+    """Se lanza cuando el servicio ya tiene su cola de trabajos llena."""
+
+
+class TiempoAgotado(Exception):
+    """Se lanza cuando un trabajo no terminó dentro del tiempo máximo."""
+
+
+def _inicializar_proceso():
+    """
+    Se ejecuta una vez al arrancar cada proceso del pool: configura Django y
+    carga las librerías pesadas (modelos de dlib, Tesseract) para que los
+    trabajos no paguen ese costo.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartcondo.settings')
+    import django
+    django.setup()
+    from . import face_recognition_logic, ocr_logic  # noqa: F401
+    from .ocr_backends import obtener_motor
+    obtener_motor().preparar()
+
+
+def _decodificar(contenido):
+    import cv2
+    return cv2.imdecode(np.frombuffer(contenido, np.uint8), cv2.IMREAD_COLOR)
+
+
+def detectar_rostros(contenidos):
+    """
+    Trabajo del pool: decodifica las imágenes y detecta y codifica sus caras.
+    Devuelve (detecciones, tiempos), con None en las imágenes que no se pudieron decodificar.
+    """
+    from .face_recognition_logic import detectar_y_codificar
+    inicio = time.perf_counter()
+    imagenes = [_decodificar(contenido) for contenido in contenidos]
+    tiempos = {"decodificacion": round((time.perf_counter() - inicio) * 1000, 2)}
+
+    validas = [image for image in imagenes if image is not None]
+    detecciones = iter(detectar_y_codificar(validas, tiempos) if validas else [])
+    return [next(detecciones) if image is not None else None for image in imagenes], tiempos
+
+
+def leer_placa(contenido):
+    """
+    Trabajo del pool: decodifica la imagen y lee la placa (sin consultar la base de datos).
+    Devuelve (placa, rect_placa), o None si la imagen no es válida.
+    """
+    from .ocr_logic import leer_placa as leer
+    image = _decodificar(contenido)
+    if image is None:
+        return None
+    return leer(image)
+
+
+class ServicioReconocimiento:
+    """
+    Ejecuta el trabajo pesado de reconocimiento (dlib/OpenCV/Tesseract) en un pool
+    de procesos separado de los hilos de Django, con una cola acotada: si hay más
+    trabajos pendientes que `procesos + cola` se rechaza el nuevo (ServicioSaturado),
+    y si un trabajo tarda más de `timeout` segundos se deja de esperar (TiempoAgotado).
+    Con procesos=0 los trabajos se ejecutan en el mismo hilo (útil en desarrollo).
+    """
+
+    def __init__(self, procesos=2, cola=8, timeout=10):
+        self.procesos = procesos
+        self.timeout = timeout
+        self._cupos = threading.BoundedSemaphore(max(1, procesos + cola))
+        self._pool = None
+        if procesos:
+            # 'spawn' evita heredar conexiones a la base de datos del proceso web
+            self._pool = ProcessPoolExecutor(
+                max_workers=procesos,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_proceso,
+            )
+
+    def ejecutar(self, funcion, *args):
+        """
+        Ejecuta funcion(*args) en el pool y espera su resultado.
+        """
+        if self._pool is None:
+            return funcion(*args)
+
+        if not self._cupos.acquire(blocking=False):
+            raise ServicioSaturado()
+        try:
+            futuro = self._pool.submit(funcion, *args)
+        except Exception:
+            self._cupos.release()
+            raise
+        # El cupo se libera cuando el trabajo termina, aunque ya no lo estemos esperando
+        futuro.add_done_callback(lambda _: self._cupos.release())
+
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            futuro.cancel()
+            raise TiempoAgotado()
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_servicio = None
+_servicio_lock = threading.Lock()
+
+
+def obtener_servicio():
+    """
+    Devuelve el servicio de reconocimiento del proceso, creándolo la primera vez.
+    """
+    global _servicio
+    if _servicio is None:
+        with _servicio_lock:
+            if _servicio is None:
+                _servicio = ServicioReconocimiento(
+                    procesos=getattr(settings, 'RECOGNITION_WORKERS', 2),
+                    cola=getattr(settings, 'RECOGNITION_QUEUE_SIZE', 8),
+                    timeout=getattr(settings, 'RECOGNITION_TIMEOUT', 10),
+                )
+    return _servicio
@@ -5,20 +5,38 @@ from .models import (
 )
 
 
-class UnidadHabitacionalSerializer(serializers.ModelSerializer):
+class CamposDinamicosMixin:
+    """
+    Permite pedir sólo algunos campos en las consultas GET con ?fields=id,numero,
+    para que los listados (por ejemplo, los del dashboard) no serialicen de más.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        campos = request.query_params.get('fields')
+        if campos:
+            pedidos = {campo.strip() for campo in campos.split(',')}
+            for nombre in set(self.fields) - pedidos:
+                self.fields.pop(nombre)
+
+
+class UnidadHabitacionalSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = UnidadHabitacional
         fields = '__all__'
         read_only_fields = ['saldo_deudor']
 
 
-class VehiculoSerializer(serializers.ModelSerializer):
+class VehiculoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Vehiculo
         fields = '__all__'
 
 
-class ResidenteSerializer(serializers.ModelSerializer):
+class ResidenteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Residente.
     """
@@ -41,7 +59,7 @@ class ResidenteSerializer(serializers.ModelSerializer):
         read_only_fields = ['unidad_numero', 'vehiculos']
 
 
-class VisitanteSerializer(serializers.ModelSerializer):
+class VisitanteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Visitante.
     """
@@ -50,10 +68,11 @@ class VisitanteSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Visitante
-        fields = '__all__'
+        # El encoding facial y el hash de la foto son de uso interno del reconocimiento
+        exclude = ['encoding_facial', 'foto_hash']
 
 
-class RegistroAccesoSerializer(serializers.ModelSerializer):
+class RegistroAccesoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo RegistroAcceso.
     """
@@ -66,24 +85,24 @@ class RegistroAccesoSerializer(serializers.ModelSerializer):
         read_only_fields = ['persona_nombre']
 
 
-class AreaComunSerializer(serializers.ModelSerializer):
+class AreaComunSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = AreaComun
         fields = '__all__'
 
 
-class ReservaAreaComunSerializer(serializers.ModelSerializer):
+class ReservaAreaComunSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = ReservaAreaComun
         fields = '__all__'
 
 
-class GastoSerializer(serializers.ModelSerializer):
+class GastoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Gasto
         fields = '__all__'
 
-class AvisoSerializer(serializers.ModelSerializer):
+class AvisoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Aviso
         fields = '__all__'
@@ -1,30 +1,64 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Gasto, UnidadHabitacional
-
-@receiver(pre_save, sender=Gasto)
-def registrar_estado_anterior_pago(sender, instance, **kwargs):
-    """
-    Antes de guardar, si el Gasto ya existe, guardamos su estado 'pagado' anterior.
-    Esto nos permite saber si el estado cambió de False a True.
-    """
-    if instance.pk:
-        try:
-            instance._estado_anterior_pagado = Gasto.objects.get(pk=instance.pk).pagado
-        except Gasto.DoesNotExist:
-            instance._estado_anterior_pagado = False
-
-@receiver(post_save, sender=Gasto)
-def actualizar_saldo_deudor_unidad(sender, instance, created, **kwargs):
-    """
-    Después de guardar un Gasto, actualiza el saldo deudor de la UnidadHabitacional.
-    """
-    unidad = instance.unidad
-    # Si el gasto se acaba de crear y no está pagado, sumamos al saldo deudor.
-    if created and not instance.pagado:
-        unidad.saldo_deudor += instance.monto
-    # Si el gasto se actualizó y cambió de 'no pagado' a 'pagado'.
-    elif not created and instance.pagado and not getattr(instance, '_estado_anterior_pagado', False):
-        unidad.saldo_deudor -= instance.monto
-    
-    unidad.save()
+from .models import Residente, Visitante, Vehiculo
+from .face_gallery import galeria
+from .plate_cache import cache_placas
+
+@receiver(pre_save, sender=Residente)
+@receiver(pre_save, sender=Visitante)
+def calcular_encoding_persona(sender, instance, **kwargs):
+    """
+    Antes de guardar un Residente o Visitante, calcula el encoding facial de su foto
+    sólo si la foto es nueva o cambió, para no re-procesarla en cada reconocimiento.
+    """
+    # Importación local para evitar conflictos de DLL en el arranque
+    from .face_recognition_logic import actualizar_encoding
+    actualizar_encoding(instance)
+
+
+@receiver(post_save, sender=Residente)
+@receiver(post_save, sender=Visitante)
+def actualizar_galeria_rostros(sender, instance, **kwargs):
+    """
+    Después de guardar, actualiza sólo la entrada de esta persona en la galería
+    en memoria (si ya está cargada), sin reconstruirla desde la base de datos.
+    """
+    if galeria.cargada:
+        galeria.actualizar(sender.__name__.lower(), instance.pk, instance.encoding_facial, instance.foto_hash)
+
+
+@receiver(post_delete, sender=Residente)
+@receiver(post_delete, sender=Visitante)
+def eliminar_de_galeria_rostros(sender, instance, **kwargs):
+    """
+    Quita a la persona eliminada de la galería en memoria.
+    """
+    if galeria.cargada:
+        galeria.eliminar(sender.__name__.lower(), instance.pk)
+
+
+@receiver(post_save, sender=Vehiculo)
+def actualizar_cache_placas(sender, instance, **kwargs):
+    """
+    Después de guardar un vehículo, actualiza su entrada en la caché de placas.
+    """
+    if cache_placas.cargada:
+        cache_placas.actualizar_vehiculo(instance.pk)
+
+
+@receiver(post_delete, sender=Vehiculo)
+def eliminar_de_cache_placas(sender, instance, **kwargs):
+    """
+    Quita de la caché de placas el vehículo eliminado.
+    """
+    if cache_placas.cargada:
+        cache_placas.eliminar_vehiculo(instance.pk)
+
+
+@receiver(post_save, sender=Residente)
+def actualizar_residente_cache_placas(sender, instance, created, **kwargs):
+    """
+    Si cambian los datos de un residente, refresca sus vehículos en la caché de placas.
+    """
+    if cache_placas.cargada and not created:
+        cache_placas.actualizar_residente(instance.pk)
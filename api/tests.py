@@ -1,3 +1,680 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from .access_log import EscritorAccesos
+from .access_partitions import archivar_mes
+from .balance_triggers import triggers_faltantes
+from .camera_pipeline import ProcesadorPlacas
+from .dashboard import sumar_accesos
+from .face_index import DIMENSION_ENCODING, IndiceExacto, IndiceIVF
+from .job_queue import ColaTrabajos
+from .models import (
+    UnidadHabitacional, Residente, Visitante, RegistroAcceso, Vehiculo,
+    AreaComun, ReservaAreaComun, Gasto, Aviso, ResumenAccesos,
+)
+from .plate_cache import cache_placas
+from .plate_index import DISTANCIA_MAXIMA, GRUPOS_CONFUSION, IndicePlacas, distancia_placas
+from .plate_tracking import PistaPlaca, SeguidorPlacas
+from .recognition_service import ServicioReconocimiento, ServicioSaturado, TiempoAgotado
+
+# Listados de la API (nombres de las rutas del router)
+LISTADOS = [
+    'unidadhabitacional-list', 'residente-list', 'visitante-list', 'registroacceso-list', 'vehiculo-list',
+    'areacomun-list', 'reservaareacomun-list', 'gasto-list', 'aviso-list',
+]
+
+
+class ConsultasListadosTests(APITestCase):
+    """
+    La cantidad de consultas de cada listado no debe crecer con la cantidad de filas
+    (sin consultas N+1 desde los serializers).
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@smartcondo.com', 'clave'))
+        self.creados = 0
+
+    def crear_datos(self, cantidad):
+        # bulk_create: sin señales (el cálculo de encodings no hace falta aquí)
+        inicio, self.creados = self.creados, self.creados + cantidad
+        rango = range(inicio, self.creados)
+        unidades = UnidadHabitacional.objects.bulk_create(
+            [UnidadHabitacional(numero=f'U{i}', propietario=f'Propietario {i}') for i in rango])
+        residentes = Residente.objects.bulk_create([
+            Residente(nombre=f'Nombre {i}', apellido=f'Apellido {i}', cedula=f'R{i}', email=f'r{i}@smartcondo.com',
+                      unidad=unidad)
+            for i, unidad in zip(rango, unidades)])
+        visitantes = Visitante.objects.bulk_create([
+            Visitante(nombre=f'Visita {i}', apellido='Apellido', cedula=f'V{i}', autorizado_por=residente,
+                      fecha_visita=date.today())
+            for i, residente in zip(rango, residentes)])
+        Vehiculo.objects.bulk_create([
+            Vehiculo(placa=f'{i:04d}{letras}', marca='Marca', modelo='Modelo', color='Rojo', residente_asociado=residente)
+            for i, residente in zip(rango, residentes) for letras in ('ABC', 'XYZ')])
+        RegistroAcceso.objects.bulk_create(
+            [RegistroAcceso(tipo='ENTRADA', residente=residente) for residente in residentes]
+            + [RegistroAcceso(tipo='ENTRADA', visitante=visitante) for visitante in visitantes])
+        areas = AreaComun.objects.bulk_create([AreaComun(nombre=f'Área {i}') for i in rango])
+        ReservaAreaComun.objects.bulk_create([
+            ReservaAreaComun(area_comun=area, residente=residente, fecha_reserva=date.today(),
+                             hora_inicio=time(10), hora_fin=time(12), costo_total=Decimal('50'))
+            for area, residente in zip(areas, residentes)])
+        Gasto.objects.bulk_create([
+            Gasto(unidad=unidad, monto=Decimal('100'), descripcion='Expensas', fecha_vencimiento=date.today())
+            for unidad in unidades])
+        Aviso.objects.bulk_create([Aviso(titulo=f'Aviso {i}', contenido='Contenido') for i in rango])
+
+    def contar_consultas(self):
+        consultas = {}
+        for nombre in LISTADOS:
+            with CaptureQueriesContext(connection) as contexto:
+                respuesta = self.client.get(reverse(f'api:{nombre}'))
+            self.assertEqual(respuesta.status_code, 200, nombre)
+            consultas[nombre] = len(contexto)
+        return consultas
+
+    def test_consultas_constantes_en_listados(self):
+        self.crear_datos(2)
+        pocas_filas = self.contar_consultas()
+        self.crear_datos(20)
+        muchas_filas = self.contar_consultas()
+        for nombre in LISTADOS:
+            with self.subTest(listado=nombre):
+                self.assertEqual(muchas_filas[nombre], pocas_filas[nombre])
+
+    def test_listado_de_residentes_sin_consultas_por_fila(self):
+        self.crear_datos(10)
+        # Residentes con su unidad + vehículos prefetch (más el COUNT de la paginación)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('api:residente-list'))
+
+
+class DashboardTests(APITestCase):
+    """
+    El resumen de accesos se mantiene al guardar los registros y el dashboard lo lee
+    sin recorrer los registros.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@smartcondo.com', 'clave'))
+
+    def registrar_accesos(self, cantidad, punto_acceso):
+        registros = RegistroAcceso.objects.bulk_create(
+            [RegistroAcceso(tipo='ENTRADA', punto_acceso=punto_acceso) for _ in range(cantidad)])
+        sumar_accesos(registros)
+
+    def test_accesos_por_punto_de_acceso(self):
+        self.registrar_accesos(3, 'porton')
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:dashboard-accesos'))
+        self.registrar_accesos(40, 'porton')
+        self.registrar_accesos(2, 'peatonal')
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(reverse('api:dashboard-accesos'))
+        totales = {fila['punto_acceso']: fila['cantidad'] for fila in respuesta.json()}
+        self.assertEqual(totales, {'porton': 43, 'peatonal': 2})
+
+
+class EscritorAccesosTests(TransactionTestCase):
+    """
+    El escritor de accesos escribe en su propio hilo (y conexión): los datos de la
+    prueba tienen que estar confirmados para que los vea.
+    """
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def escritor(self, **opciones):
+        return EscritorAccesos(intervalo=0.05, directorio=self.directorio, antiguedad_recuperacion=0, **opciones)
+
+    def escribir(self, escritor):
+        escritor.start()
+        self.assertTrue(escritor.vaciar())
+        escritor.detener()
+
+    def test_residente_borrado_antes_de_escribir(self):
+        # Un evento de una persona borrada antes de escribir el lote no bloquea al escritor
+        ana, luis = Residente.objects.bulk_create([
+            Residente(nombre='Ana', apellido='Pérez', cedula='R1', email='ana@smartcondo.com'),
+            Residente(nombre='Luis', apellido='Gómez', cedula='R2', email='luis@smartcondo.com'),
+        ])
+        escritor = self.escritor()
+        borrado = escritor.registrar(residente=ana)
+        vigente = escritor.registrar(residente=luis)
+        Residente.objects.filter(pk=ana.pk).delete()
+
+        self.escribir(escritor)
+        self.assertEqual(escritor.escritos, 2)
+        self.assertIsNone(RegistroAcceso.objects.get(pk=borrado).residente_id)
+        self.assertEqual(RegistroAcceso.objects.get(pk=vigente).residente_id, luis.pk)
+
+    def test_solo_se_recuperan_diarios_abandonados(self):
+        # Proceso vivo con eventos sin escribir (por ejemplo, esperando a la base de datos)
+        vivo = self.escritor()
+        vivo.registrar(punto_acceso='porton')
+        # Diario de un proceso que murió sin escribirlo
+        with open(os.path.join(self.directorio, 'accesos-1-abandonado.jsonl'), 'w', encoding='utf-8') as diario:
+            diario.write(json.dumps({
+                "id": str(uuid.uuid4()), "tipo": "ENTRADA", "punto_acceso": "peatonal", "residente_id": None,
+                "visitante_id": None, "timestamp": timezone.now().isoformat(), "descripcion": None,
+                "nombre_foto": None, "foto": None, "recorte": None}) + '\n')
+
+        otro = self.escritor()
+        self.escribir(otro)
+        self.assertEqual(otro.registrados, 1)
+        self.assertEqual(list(RegistroAcceso.objects.values_list('punto_acceso', flat=True)), ['peatonal'])
+
+        self.escribir(vivo)
+        self.assertEqual(RegistroAcceso.objects.count(), 2)
+        self.assertEqual(sum(ResumenAccesos.objects.values_list('cantidad', flat=True)), 2)
+        self.assertEqual(os.listdir(self.directorio), [])
+
+
+class ArchivoAccesosTests(APITestCase):
+    """
+    Archivar un mes no borra registros que no hayan quedado en el archivo.
+    """
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def registrar(self, dia, punto_acceso='porton'):
+        return RegistroAcceso.objects.create(
+            tipo='ENTRADA', punto_acceso=punto_acceso, timestamp=datetime(2024, 1, dia, 12, tzinfo=dt_timezone.utc))
+
+    def test_registros_que_llegan_mientras_se_archiva(self):
+        for dia in range(1, 4):
+            self.registrar(dia)
+        febrero = RegistroAcceso.objects.create(
+            tipo='ENTRADA', timestamp=datetime(2024, 2, 1, 12, tzinfo=dt_timezone.utc))
+
+        escribir = json.dumps
+        def escribir_y_registrar(*args, **kwargs):
+            # Un acceso del mes que llega en medio de la exportación
+            if not RegistroAcceso.objects.filter(punto_acceso='tarde').exists():
+                self.registrar(15, 'tarde')
+            return escribir(*args, **kwargs)
+
+        with mock.patch('api.access_partitions.json.dumps', side_effect=escribir_y_registrar):
+            ruta, cantidad = archivar_mes(2024, 1, self.directorio)
+        with gzip.open(ruta, 'rt', encoding='utf-8') as archivo:
+            archivados = {json.loads(linea)['id'] for linea in archivo}
+        restantes = {str(pk) for pk in RegistroAcceso.objects.values_list('pk', flat=True)}
+
+        self.assertEqual(cantidad, len(archivados))
+        self.assertEqual(len(archivados | restantes), 5)
+        self.assertFalse(archivados & restantes)
+        self.assertIn(str(febrero.pk), restantes)
+
+
+class IndiceFacialTests(APITestCase):
+    """
+    El índice IVF encuentra la misma persona que la búsqueda exacta.
+    """
+
+    def encodings(self, personas, fotos, semilla=3):
+        # Varias fotos por persona, cerca de su propio encoding, como en la galería real
+        rng = np.random.default_rng(semilla)
+        centros = rng.normal(0, 0.1, (personas, DIMENSION_ENCODING))
+        return [centro + rng.normal(0, 0.02, DIMENSION_ENCODING) for centro in centros for _ in range(fotos)]
+
+    def indices(self, vectores, **opciones):
+        exacto, ivf = IndiceExacto(), IndiceIVF(**opciones)
+        for clave, vector in enumerate(vectores):
+            exacto.agregar(clave, vector)
+            ivf.agregar(clave, vector)
+        return exacto, ivf
+
+    def test_misma_coincidencia_que_la_busqueda_exacta(self):
+        vectores = self.encodings(300, 5)
+        exacto, ivf = self.indices(vectores, nprobe=8, minimo_entrenamiento=1000)
+        self.assertIsNotNone(ivf.estado().get('centroides'))
+
+        rng = np.random.default_rng(4)
+        consultas = [vectores[i] + rng.normal(0, 0.01, DIMENSION_ENCODING) for i in rng.choice(len(vectores), 100)]
+        for consulta in consultas:
+            self.assertEqual(ivf.buscar(consulta)[0][0], exacto.buscar(consulta)[0][0])
+        self.assertEqual([resultado[0][0] for resultado in ivf.buscar_lote(consultas)],
+                         [resultado[0][0] for resultado in exacto.buscar_lote(np.array(consultas))])
+
+    def test_indice_vacio_y_con_menos_vectores_que_listas(self):
+        self.assertEqual(IndiceIVF().buscar(np.zeros(DIMENSION_ENCODING)), [])
+        self.assertEqual(IndiceIVF().buscar_lote([np.zeros(DIMENSION_ENCODING)]), [[]])
+
+        vectores = self.encodings(4, 2)
+        exacto, ivf = self.indices(vectores, nlist=50, minimo_entrenamiento=1)
+        self.assertLessEqual(len(ivf.estado()['centroides']), len(vectores))
+        for vector in vectores:
+            self.assertEqual(ivf.buscar(vector, k=3), exacto.buscar(vector, k=3))
+
+        for clave in range(len(vectores)):
+            ivf.eliminar(clave)
+        self.assertEqual(ivf.buscar(vectores[0]), [])
+
+
+class CachePlacasTests(APITestCase):
+    """
+    La caché de placas sigue las altas, cambios y bajas de vehículos: una entrada
+    desactualizada daría o negaría el acceso por error.
+    """
+
+    def setUp(self):
+        # La caché es del proceso: se recarga con la base de datos de la prueba
+        cache_placas.cargar()
+        self.residente = Residente.objects.bulk_create(
+            [Residente(nombre='Ana', apellido='Pérez', cedula='R1', email='ana@smartcondo.com')])[0]
+
+    def test_altas_cambios_y_bajas_de_vehiculos(self):
+        self.assertIsNone(cache_placas.buscar('ABC123'))
+        vehiculo = Vehiculo.objects.create(
+            placa='ABC123', marca='Toyota', modelo='Yaris', color='Rojo', residente_asociado=self.residente)
+        # La placa se había leído como no registrada: el alta la saca de la caché negativa
+        with self.assertNumQueries(0):
+            self.assertEqual(cache_placas.buscar('ABC123').pk, vehiculo.pk)
+
+        vehiculo.placa = 'XYZ789'
+        vehiculo.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(cache_placas.buscar('XYZ789').pk, vehiculo.pk)
+        self.assertEqual(cache_placas.buscar_aproximada('XYZ78B')[0].pk, vehiculo.pk)
+        self.assertIsNone(cache_placas.buscar('ABC123'))
+        self.assertEqual(cache_placas.buscar_aproximada('ABC12B'), (None, None))
+
+        vehiculo.delete()
+        self.assertIsNone(cache_placas.buscar('XYZ789'))
+        self.assertEqual(cache_placas.buscar_aproximada('XYZ78B'), (None, None))
+
+
+class IndicePlacasTests(APITestCase):
+    """
+    El índice de placas da el mismo resultado que comparar la lectura con todas las placas.
+    """
+
+    def buscar_recorriendo(self, placas, placa, max_distancia):
+        distancias = sorted((distancia_placas(placa, registrada), registrada) for registrada in placas)
+        dentro = [(distancia, registrada) for distancia, registrada in distancias if distancia <= max_distancia]
+        if not dentro or (len(dentro) > 1 and dentro[1][0] == dentro[0][0]):
+            return None, None
+        return dentro[0][1], dentro[0][0]
+
+    def test_igual_que_recorrer_todas_las_placas(self):
+        azar = random.Random(20)
+        caracteres = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        placas = {''.join(azar.choice(caracteres) for _ in range(azar.choice((6, 7)))) for _ in range(300)}
+        indice = IndicePlacas()
+        for placa in placas:
+            indice.agregar(placa)
+
+        lecturas = []
+        for placa in azar.sample(sorted(placas), 150):
+            lectura = list(placa)
+            for _ in range(azar.randint(1, 3)):
+                posicion = azar.randrange(len(lectura))
+                operacion = azar.choice(('confusion', 'cambio', 'borrado', 'insercion'))
+                if operacion == 'confusion':
+                    grupo = next((g for g in GRUPOS_CONFUSION if lectura[posicion] in g), lectura[posicion])
+                    lectura[posicion] = azar.choice(grupo)
+                elif operacion == 'cambio':
+                    lectura[posicion] = azar.choice(caracteres)
+                elif operacion == 'borrado' and len(lectura) > 1:
+                    del lectura[posicion]
+                else:
+                    lectura.insert(posicion, azar.choice(caracteres))
+            lecturas.append(''.join(lectura))
+
+        for max_distancia in (0.5, 1.0, DISTANCIA_MAXIMA):
+            for lectura in lecturas:
+                self.assertEqual(indice.buscar(lectura, max_distancia),
+                                 self.buscar_recorriendo(placas, lectura, max_distancia), (lectura, max_distancia))
+        with self.assertRaises(ValueError):
+            indice.buscar('ABC123', DISTANCIA_MAXIMA + 0.5)
+
+
+class SeguimientoPlacasTests(APITestCase):
+    """
+    Una placa que se deja de ver genera su acceso aunque no lleguen más fotogramas,
+    con el momento en que se vio por última vez.
+    """
+
+    def pista(self, ultimo_visto):
+        pista = PistaPlaca(1, (10, 10, 80, 20), ultimo_visto)
+        pista.votar('ABC123', np.zeros((60, 120, 3), dtype=np.uint8))
+        return pista
+
+    def test_pista_perdida_sin_fotogramas(self):
+        seguidor = SeguidorPlacas(olvido=1.5)
+        pista = self.pista(100.0)
+        seguidor.pistas.append(pista)
+        self.assertEqual(seguidor.expirar(101.0), [])
+        self.assertEqual(seguidor.expirar(500.0), [pista])
+        self.assertEqual(seguidor.pistas, [])
+        self.assertEqual(seguidor.expirar(501.0), [])
+
+    def test_procesador_registra_con_el_momento_de_la_pista(self):
+        escritor = mock.Mock()
+        procesador = ProcesadorPlacas(escritor, hilos=1)
+        # Crea el seguidor de la cámara con un fotograma sin placas
+        procesador.enviar('porton', np.zeros((60, 120, 3), dtype=np.uint8))
+        while procesador.ocupado('porton'):
+            pass
+        visto = timezone.now().timestamp() - 60
+        procesador.seguidor('porton').pistas.append(self.pista(visto))
+
+        vehiculo = mock.Mock(placa='ABC123')
+        with mock.patch('api.camera_pipeline.buscar_vehiculo', return_value=vehiculo):
+            procesador.expirar('porton')
+            procesador.detener()
+        self.assertEqual(escritor.registrar.call_count, 1)
+        self.assertEqual(escritor.registrar.call_args.kwargs['momento'], datetime.fromtimestamp(visto, tz=dt_timezone.utc))
+
+
+def esperar_liberacion(liberar):
+    # Trabajo del pool: termina cuando la prueba lo indica
+    liberar.wait(5)
+    return 'listo'
+
+
+class ServicioReconocimientoTests(APITestCase):
+    """
+    El servicio de reconocimiento rechaza trabajos cuando su cola está llena y deja de
+    esperar los que tardan demasiado. El pool de procesos se reemplaza por uno de hilos.
+    """
+
+    def servicio(self, **opciones):
+        pool = mock.patch('api.recognition_service.ProcessPoolExecutor',
+                          lambda max_workers, **_: ThreadPoolExecutor(max_workers))
+        with pool:
+            servicio = ServicioReconocimiento(**opciones)
+        self.addCleanup(servicio.cerrar)
+        return servicio
+
+    def test_saturado_hasta_que_termina_el_trabajo(self):
+        servicio = self.servicio(procesos=1, cola=0, timeout=0.05)
+        liberar = threading.Event()
+        self.addCleanup(liberar.set)
+        with self.assertRaises(TiempoAgotado):
+            servicio.ejecutar(esperar_liberacion, liberar)
+        # El trabajo que agotó el tiempo sigue en el proceso y ocupa el único cupo
+        with self.assertRaises(ServicioSaturado):
+            servicio.ejecutar(esperar_liberacion, liberar)
+
+        liberar.set()
+        for _ in range(100):
+            try:
+                self.assertEqual(servicio.ejecutar(esperar_liberacion, liberar), 'listo')
+                break
+            except ServicioSaturado:
+                threading.Event().wait(0.01)
+        else:
+            self.fail('El servicio no liberó el cupo')
+
+    def test_trabajo_en_cola_cancelado_libera_su_cupo(self):
+        servicio = self.servicio(procesos=1, cola=1, timeout=0.05)
+        liberar = threading.Event()
+        self.addCleanup(liberar.set)
+        # El primero ocupa el proceso; los siguientes esperan en la cola, agotan el
+        # tiempo y se cancelan, así que la cola nunca se llena
+        for _ in range(3):
+            with self.assertRaises(TiempoAgotado):
+                servicio.ejecutar(esperar_liberacion, liberar)
+
+    def test_respuestas_de_la_api(self):
+        imagen = SimpleUploadedFile('cara.jpg', b'jpeg', content_type='image/jpeg')
+        for error, codigo in ((TiempoAgotado(), 503), (ServicioSaturado(), 429)):
+            servicio = mock.Mock(**{'ejecutar.side_effect': error})
+            with mock.patch('api.views.obtener_servicio', return_value=servicio):
+                imagen.seek(0)
+                respuesta = self.client.post(reverse('api:reconocer-acceso'), {'image': imagen}, format='multipart')
+            self.assertEqual(respuesta.status_code, codigo)
+        self.assertEqual(respuesta['Retry-After'], '1')
+
+
+class ColaTrabajosTests(APITestCase):
+    """
+    El estado de los trabajos se guarda en la caché: cualquier proceso que la comparta
+    responde la consulta.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@smartcondo.com', 'clave'))
+
+    def test_resultado_visible_desde_otra_cola(self):
+        trabajo_id = ColaTrabajos(hilos=1).encolar(lambda: Response({'placa': 'ABC123'}, status=201))
+        trabajo = ColaTrabajos(hilos=0).obtener(trabajo_id, esperar=5)
+        self.assertEqual(trabajo['estado'], 'completado')
+        self.assertEqual(trabajo['codigo'], 201)
+        self.assertEqual(trabajo['resultado'], {'placa': 'ABC123'})
+
+    def test_esperar_debe_ser_finito(self):
+        url = reverse('api:trabajo-reconocimiento', args=[uuid.uuid4()])
+        for esperar in ('nan', 'inf', '-inf', 'pronto'):
+            respuesta = self.client.get(url, {'esperar': esperar})
+            self.assertEqual(respuesta.status_code, 400, esperar)
+
+
+class PaginacionGastosTests(APITestCase):
+    """
+    El cursor de los gastos recorre todas las expensas generadas el mismo día
+    (comparten fecha_emision).
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@smartcondo.com', 'clave'))
+
+    def test_cursor_recorre_todas_las_expensas_del_dia(self):
+        UnidadHabitacional.objects.bulk_create(
+            [UnidadHabitacional(numero=f'U{i}', propietario='Propietario') for i in range(1300)])
+        respuesta = self.client.post(
+            reverse('api:gasto-generar-expensas'),
+            {'monto': '100.50', 'descripcion': 'Expensas', 'dias_vencimiento': 10}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+
+        vistos, url, paginas = set(), reverse('api:gasto-list') + '?page_size=100', 0
+        while url and paginas < 20:
+            datos = self.client.get(url).json()
+            vistos.update(gasto['id'] for gasto in datos['results'])
+            url, paginas = datos['next'], paginas + 1
+        self.assertEqual(len(vistos), 1300)
+        self.assertIsNone(url)
+
+
+class SaldoDeudorTests(APITestCase):
+    """
+    El saldo deudor de las unidades lo mantienen triggers de la base de datos (ver balance_triggers.py).
+    """
+
+    def setUp(self):
+        self.unidad, self.otra = UnidadHabitacional.objects.bulk_create([
+            UnidadHabitacional(numero='A-101', propietario='Propietario'),
+            UnidadHabitacional(numero='A-102', propietario='Propietario'),
+        ])
+
+    def gasto(self, monto, unidad=None):
+        return Gasto.objects.create(
+            unidad=unidad or self.unidad, monto=Decimal(monto), descripcion='Expensas', fecha_vencimiento=date.today())
+
+    def assertSaldo(self, esperado, unidad=None):
+        unidad = unidad or self.unidad
+        unidad.refresh_from_db()
+        self.assertEqual(unidad.saldo_deudor, Decimal(esperado))
+
+    def test_migraciones_dejan_los_triggers(self):
+        # En SQLite, una migración que reconstruye la tabla de gastos borra sus triggers
+        self.assertEqual(triggers_faltantes(), [])
+
+    def test_saldo_al_crear_modificar_y_borrar(self):
+        gasto = self.gasto('100.50')
+        self.gasto('20.25')
+        self.assertSaldo('120.75')
+
+        gasto.monto = Decimal('80.10')
+        gasto.save()
+        self.assertSaldo('100.35')
+
+        gasto.pagado = True
+        gasto.save()
+        self.assertSaldo('20.25')
+        gasto.pagado = False
+        gasto.save()
+        self.assertSaldo('100.35')
+
+        gasto.unidad = self.otra
+        gasto.save()
+        self.assertSaldo('20.25')
+        self.assertSaldo('80.10', self.otra)
+
+        gasto.delete()
+        self.assertSaldo('0.00', self.otra)
+        # Borrar un gasto ya pagado no cambia el saldo
+        pagado = self.gasto('5.00')
+        Gasto.objects.filter(pk=pagado.pk).update(pagado=True)
+        pagado.delete()
+        self.assertSaldo('20.25')
+
+    def test_saldo_con_operaciones_por_lotes(self):
+        Gasto.objects.bulk_create(
+            [Gasto(unidad=unidad, monto=Decimal('10.10'), descripcion='Multa', fecha_vencimiento=date.today())
+             for unidad in (self.unidad, self.otra) for _ in range(3)])
+        self.assertSaldo('30.30')
+        self.assertSaldo('30.30', self.otra)
+
+        Gasto.objects.filter(unidad=self.unidad).update(monto=Decimal('1.01'))
+        self.assertSaldo('3.03')
+        Gasto.objects.filter(unidad=self.otra).update(pagado=True)
+        self.assertSaldo('0.00', self.otra)
+        Gasto.objects.filter(unidad=self.otra).update(pagado=False)
+        self.assertSaldo('30.30', self.otra)
+
+        Gasto.objects.filter(unidad=self.unidad).delete()
+        self.assertSaldo('0.00')
+
+
+class ExpensasTests(APITestCase):
+    """
+    generar-expensas rechaza parámetros que no se pueden guardar como gastos.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@smartcondo.com', 'clave'))
+        UnidadHabitacional.objects.create(numero='A-101', propietario='Propietario')
+
+    def generar(self, monto='100.50', dias_vencimiento=10):
+        return self.client.post(
+            reverse('api:gasto-generar-expensas'),
+            {'monto': monto, 'descripcion': 'Expensas', 'dias_vencimiento': dias_vencimiento}, format='json')
+
+    def test_expensas_con_parametros_no_validos(self):
+        for monto in ('NaN', 'Infinity', '-Infinity', '0', '-10', 'cien', '100000000000', '1.555'):
+            self.assertEqual(self.generar(monto=monto).status_code, 400, monto)
+        for dias in ('99999999', 'quince'):
+            self.assertEqual(self.generar(dias_vencimiento=dias).status_code, 400, dias)
+        self.assertEqual(Gasto.objects.count(), 0)
+
+    def test_devuelve_solo_los_gastos_generados(self):
+        anteriores = set(self.generar().json()['gastos'])
+        respuesta = self.generar(monto='99999999.99')
+        self.assertEqual(respuesta.status_code, 201)
+        generados = set(respuesta.json()['gastos'])
+        self.assertEqual(len(generados), 1)
+        self.assertFalse(generados & anteriores)
+        self.assertEqual(Gasto.objects.get(pk=generados.pop()).monto, Decimal('99999999.99'))
+
+
+class RegistroPagosTests(APITestCase):
+    """
+    registrar-pagos marca los gastos y los triggers descuentan el saldo. Los CSV
+    exportados desde planillas se leen aunque no estén en UTF-8 y con coma decimal
+    cuando las columnas se separan con ';'.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@smartcondo.com', 'clave'))
+        self.unidad = UnidadHabitacional.objects.create(numero='A-101', propietario='Propietario')
+        self.gasto = Gasto.objects.create(
+            unidad=self.unidad, monto=Decimal('1234.50'), descripcion='Expensas', fecha_vencimiento=date.today())
+
+    def assertSaldo(self, esperado):
+        self.unidad.refresh_from_db()
+        self.assertEqual(self.unidad.saldo_deudor, Decimal(esperado))
+
+    def test_json_con_y_sin_monto(self):
+        multa, agua = Gasto.objects.bulk_create([
+            Gasto(unidad=self.unidad, monto=Decimal('50.00'), descripcion='Multa', fecha_vencimiento=date.today()),
+            Gasto(unidad=self.unidad, monto=Decimal('30.25'), descripcion='Agua', fecha_vencimiento=date.today()),
+        ])
+        self.assertSaldo('1314.75')
+        respuesta = self.client.post(reverse('api:gasto-registrar-pagos'), [
+            {'id': str(self.gasto.pk), 'monto': 0},
+            {'id': str(multa.pk), 'monto': 50},
+            {'id': str(agua.pk)},
+        ], format='json').json()
+        self.assertEqual(respuesta['pagados'], 2)
+        self.assertEqual([distinto['id'] for distinto in respuesta['montos_distintos']], [str(self.gasto.pk)])
+        self.assertSaldo('1234.50')
+
+    def subir(self, contenido):
+        return self.client.post(
+            reverse('api:gasto-registrar-pagos'),
+            {'archivo': SimpleUploadedFile('pagos.csv', contenido, content_type='text/csv')}, format='multipart')
+
+    def test_csv_con_punto_y_coma_y_coma_decimal(self):
+        for codificacion in ('utf-16', 'cp1252'):
+            Gasto.objects.filter(pk=self.gasto.pk).update(pagado=False)
+            texto = f'id;monto;descripción\r\n{self.gasto.pk};1.234,50;Transferencia Muñoz\r\n'
+            respuesta = self.subir(texto.encode(codificacion))
+            self.assertEqual(respuesta.status_code, 200, codificacion)
+            self.assertEqual(respuesta.json()['pagados'], 1, codificacion)
+            self.assertSaldo('0.00')
+
+    def test_csv_ilegible(self):
+        respuesta = self.subir(b'\xff\xfe\x00')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class VisitantesTests(APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@smartcondo.com', 'clave'))
+
+    def test_listado_no_expone_el_encoding_facial(self):
+        residente = Residente.objects.bulk_create(
+            [Residente(nombre='Ana', apellido='Pérez', cedula='R1', email='ana@smartcondo.com')])[0]
+        Visitante.objects.bulk_create([
+            Visitante(nombre='Luis', apellido='Gómez', cedula='V1', autorizado_por=residente,
+                      fecha_visita=date.today(), encoding_facial=b'\x00' * 1024, foto_hash='abc')])
+        visitante = self.client.get(reverse('api:visitante-list')).json()['results'][0]
+        self.assertNotIn('encoding_facial', visitante)
+        self.assertNotIn('foto_hash', visitante)
+
+    def test_visita_vigente_solo_en_su_dia_y_horario(self):
+        # Importación local para evitar conflictos de DLL en el arranque
+        from .face_recognition_logic import visita_vigente
+        visitante = Visitante(fecha_visita=date(2025, 3, 10), hora_entrada_prevista=time(14), hora_salida_prevista=time(16))
+        momento = lambda hora, minuto=0: timezone.make_aware(datetime(2025, 3, 10, hora, minuto))
+        self.assertTrue(visita_vigente(visitante, momento(15)))
+        self.assertTrue(visita_vigente(visitante, momento(13, 45)))
+        self.assertFalse(visita_vigente(visitante, momento(10)))
+        self.assertFalse(visita_vigente(visitante, momento(18)))
+        self.assertFalse(visita_vigente(visitante, momento(15) + timedelta(days=1)))
@@ -18,9 +18,12 @@ router.register(r'areas-comunes', views.AreaComunViewSet)
 router.register(r'reservas', views.ReservaAreaComunViewSet)
 router.register(r'gastos', views.GastoViewSet)
 router.register(r'avisos', views.AvisoViewSet)
+router.register(r'dashboard', views.DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
     path('', include(router.urls)), # URLs del CRUD
     path('reconocer-acceso/', views.ReconocimientoFacialView.as_view(), name='reconocer-acceso'), # URL para la IA
+    path('reconocer-acceso/lote/', views.ReconocimientoFacialLoteView.as_view(), name='reconocer-acceso-lote'), # Varias imágenes/caras
     path('reconocer-vehiculo/', views.ReconocimientoVehiculoView.as_view(), name='reconocer-vehiculo'), # URL para OCR
+    path('trabajos/<uuid:trabajo_id>/', views.TrabajoReconocimientoView.as_view(), name='trabajo-reconocimiento'), # Resultado del modo asíncrono
 ]
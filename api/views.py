@@ -1,11 +1,23 @@
+import csv
+import io
+import math
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
-import numpy as np
-import cv2
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.urls import reverse
+from django.utils import timezone
 
 from .models import (
     UnidadHabitacional,
@@ -16,7 +28,10 @@ from .models import (
     AreaComun,
     ReservaAreaComun,
     Gasto,
-    Aviso
+    Aviso,
+    ResumenAccesos,
+    ResumenGastos,
+    ResumenReservas
 )
 from .serializers import (
     UnidadHabitacionalSerializer,
@@ -29,54 +44,138 @@ from .serializers import (
     GastoSerializer,
     AvisoSerializer
 )
+from .access_log import obtener_escritor_accesos
+from .filters import FiltroParametros
+from .pagination import PaginacionPorCursor
+from .job_queue import obtener_cola, ColaLlena
+from .recognition_service import (
+    obtener_servicio,
+    detectar_rostros,
+    leer_placa,
+    ServicioSaturado,
+    TiempoAgotado
+)
 
 
 class UnidadHabitacionalViewSet(viewsets.ModelViewSet):
-    queryset = UnidadHabitacional.objects.all()
+    queryset = UnidadHabitacional.objects.order_by('numero')
     serializer_class = UnidadHabitacionalSerializer
     permission_classes = [IsAuthenticated] # <-- Añadir esta línea
 
 
 class ResidenteViewSet(viewsets.ModelViewSet):
-    queryset = Residente.objects.all()
+    # unidad_numero y vehiculos se cargan junto con el listado (sin una consulta por residente)
+    queryset = (Residente.objects.select_related('unidad').prefetch_related('vehiculos')
+                .order_by('apellido', 'nombre', 'id'))
     serializer_class = ResidenteSerializer
     permission_classes = [IsAuthenticated] # <-- Añadir esta línea
+    filtros = {'unidad': 'unidad'}
 
 
 class VisitanteViewSet(viewsets.ModelViewSet):
-    queryset = Visitante.objects.all()
+    queryset = (Visitante.objects.select_related('autorizado_por')
+                .defer('encoding_facial', 'autorizado_por__encoding_facial').order_by('-fecha_visita', 'id'))
     serializer_class = VisitanteSerializer
     permission_classes = [IsAuthenticated] # <-- Añadir esta línea
+    filtros = {'residente': 'autorizado_por', 'unidad': 'autorizado_por__unidad'}
+    campo_fecha = 'fecha_visita'
 
 
 class VehiculoViewSet(viewsets.ModelViewSet):
-    queryset = Vehiculo.objects.all()
+    queryset = Vehiculo.objects.order_by('placa')
     serializer_class = VehiculoSerializer
     permission_classes = [IsAuthenticated] # <-- Añadir esta línea
+    filtros = {'residente': 'residente_asociado', 'unidad': 'residente_asociado__unidad'}
 
 
 class RegistroAccesoViewSet(viewsets.ModelViewSet):
-    queryset = RegistroAcceso.objects.all()
+    # persona_nombre usa residente, visitante y quién autorizó al visitante; no hace falta
+    # traer los encodings faciales de esas personas
+    queryset = RegistroAcceso.objects.select_related('residente', 'visitante__autorizado_por').defer(
+        'residente__encoding_facial', 'visitante__encoding_facial', 'visitante__autorizado_por__encoding_facial')
     serializer_class = RegistroAccesoSerializer
     permission_classes = [IsAuthenticated] # <-- Añadir esta línea
+    # La tabla crece sin parar: paginación por cursor sobre el índice de timestamp
+    pagination_class = PaginacionPorCursor
+    orden_cursor = '-timestamp'
+    filtros = {'tipo': 'tipo', 'residente': 'residente', 'visitante': 'visitante', 'unidad': 'residente__unidad'}
+    campo_fecha = 'timestamp'
 
 
 class AreaComunViewSet(viewsets.ModelViewSet):
-    queryset = AreaComun.objects.all()
+    queryset = AreaComun.objects.order_by('nombre')
     serializer_class = AreaComunSerializer
     permission_classes = [IsAuthenticated]
+    filtros = {'disponible': 'disponible'}
 
 
 class ReservaAreaComunViewSet(viewsets.ModelViewSet):
     queryset = ReservaAreaComun.objects.all()
     serializer_class = ReservaAreaComunSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionPorCursor
+    orden_cursor = '-fecha_creacion'
+    filtros = {'area': 'area_comun', 'residente': 'residente', 'unidad': 'residente__unidad', 'pagado': 'pagado'}
+    campo_fecha = 'fecha_reserva'
+
+
+def leer_pagos(request):
+    """
+    Lee los pagos enviados a GastoViewSet.registrar_pagos: un JSON con una lista de
+    {"id": ..., "monto": ...} (directamente o en "pagos") o un archivo CSV en "archivo"
+    con las columnas id y, opcionalmente, monto. Devuelve una lista de (id, monto),
+    con monto None si no se indicó.
+    """
+    archivo = request.FILES.get('archivo')
+    coma_decimal = False
+    if archivo is not None:
+        texto = decodificar_csv(archivo.read())
+        try:
+            dialecto = csv.Sniffer().sniff(texto.splitlines()[0] if texto else '', delimiters=',;')
+        except csv.Error:
+            dialecto = csv.excel
+        # Las planillas que separan columnas con ';' usan coma decimal (100,50 o 1.234,50)
+        coma_decimal = dialecto.delimiter == ';'
+        filas = list(csv.DictReader(io.StringIO(texto), dialect=dialecto))
+    else:
+        filas = request.data.get('pagos') if isinstance(request.data, dict) else request.data
+        if not isinstance(filas, list):
+            raise ValidationError({"pagos": "Se espera una lista de pagos o un archivo CSV en 'archivo'."})
+    pagos = []
+    for fila in filas:
+        if not isinstance(fila, dict):
+            fila = {'id': fila}
+        # Un monto 0 es un monto (que no coincidirá con el del gasto), no la falta de monto
+        monto = fila.get('monto')
+        monto = str(monto).strip() if monto is not None else ''
+        if coma_decimal and ',' in monto:
+            monto = monto.replace('.', '').replace(',', '.')
+        pagos.append((str(fila.get('id') or '').strip(), monto or None))
+    return pagos
+
+
+def decodificar_csv(contenido):
+    """
+    Decodifica un CSV subido: UTF-16 si trae su BOM (Excel "Texto Unicode"), si no
+    UTF-8 y, si no lo es, Windows-1252 (CSV de Excel en Windows).
+    """
+    codificaciones = ['utf-16'] if contenido.startswith((b'\xff\xfe', b'\xfe\xff')) else ['utf-8-sig', 'cp1252']
+    for codificacion in codificaciones:
+        try:
+            return contenido.decode(codificacion)
+        except UnicodeDecodeError:
+            pass
+    raise ValidationError({"archivo": "No se pudo leer el archivo: debe ser un CSV en UTF-8, UTF-16 o Windows-1252."})
 
 
 class GastoViewSet(viewsets.ModelViewSet):
     queryset = Gasto.objects.all()
     serializer_class = GastoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionPorCursor
+    orden_cursor = '-fecha_creacion'
+    filtros = {'unidad': 'unidad', 'pagado': 'pagado', 'descripcion': 'descripcion'}
+    campo_fecha = 'fecha_vencimiento'
 
     @action(detail=False, methods=['post'], url_path='generar-expensas')
     def generar_expensas(self, request):
@@ -84,9 +183,8 @@ class GastoViewSet(viewsets.ModelViewSet):
         Genera los gastos de expensas mensuales para todas las unidades habitacionales.
         Espera un JSON con 'monto', 'descripcion' y 'dias_vencimiento'.
         Ej: {"monto": 100.50, "descripcion": "Expensas Mes de Julio", "dias_vencimiento": 15}
+        Devuelve un resumen y los ids de los gastos generados.
         """
-        from datetime import date, timedelta
-
         monto = request.data.get('monto')
         descripcion = request.data.get('descripcion')
         dias_vencimiento = request.data.get('dias_vencimiento')
@@ -97,35 +195,316 @@ class GastoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        unidades = UnidadHabitacional.objects.all()
-        fecha_emision = date.today()
-        fecha_vencimiento = fecha_emision + timedelta(days=int(dias_vencimiento))
-        
-        gastos_creados = []
-        for unidad in unidades:
-            gasto = Gasto.objects.create(
-                unidad=unidad,
-                monto=monto,
-                descripcion=descripcion,
-                fecha_vencimiento=fecha_vencimiento
+        # El monto se valida con las reglas de la columna (número finito, max_digits y
+        # decimal_places): lo que no cumpla la base de datos lo rechazaría al insertar
+        campo_monto = Gasto._meta.get_field('monto')
+        try:
+            monto = campo_monto.clean(str(monto), None)
+        except DjangoValidationError:
+            monto = None
+        if monto is None or monto <= 0:
+            return Response(
+                {"error": f"'monto' debe ser un número mayor que cero, de hasta {campo_monto.max_digits} dígitos "
+                          f"y {campo_monto.decimal_places} decimales."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            fecha_vencimiento = date.today() + timedelta(days=int(dias_vencimiento))
+        except (ValueError, TypeError, OverflowError):
+            return Response(
+                {"error": "'dias_vencimiento' debe ser un entero que dé una fecha válida."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Todo en una transacción: los gastos se insertan por lotes y los triggers de la
+        # base de datos suman cada monto al saldo de su unidad (ver balance_triggers.py)
+        with transaction.atomic():
+            unidades = list(UnidadHabitacional.objects.values_list('pk', flat=True))
+            gastos = Gasto.objects.bulk_create(
+                [Gasto(unidad_id=unidad, monto=monto, descripcion=descripcion, fecha_vencimiento=fecha_vencimiento)
+                 for unidad in unidades],
+                batch_size=1000,
             )
-            gastos_creados.append(self.get_serializer(gasto).data)
 
         return Response(
-            {"mensaje": f"Se generaron {len(gastos_creados)} gastos de expensas.", "gastos": gastos_creados},
+            {
+                "mensaje": f"Se generaron {len(unidades)} gastos de expensas.",
+                "cantidad": len(unidades),
+                "monto_total": str(monto * len(unidades)),
+                "fecha_vencimiento": fecha_vencimiento,
+                # Sólo los de esta generación (otra con la misma descripción y vencimiento no se mezcla)
+                "gastos": [str(gasto.pk) for gasto in gastos],
+            },
             status=status.HTTP_201_CREATED
         )
 
 
+    @action(detail=False, methods=['post'], url_path='registrar-pagos',
+            parser_classes=(JSONParser, MultiPartParser, FormParser))
+    def registrar_pagos(self, request):
+        """
+        Marca como pagados varios gastos a la vez (conciliación de transferencias).
+        Acepta un JSON [{"id": "...", "monto": 100.50}, ...] o un CSV en 'archivo' (ver leer_pagos).
+        Si se indica el monto y no coincide con el del gasto, ese gasto no se marca y
+        se informa. Se hace una sola consulta y un solo UPDATE, sea cual sea la cantidad
+        de pagos; los saldos de las unidades los ajustan los triggers de la base de datos.
+        """
+        invalidos, repetidos, recibidos = [], [], {}
+        for identificador, monto in leer_pagos(request):
+            try:
+                identificador = uuid.UUID(identificador)
+                monto = Decimal(monto) if monto is not None else None
+            except (ValueError, InvalidOperation):
+                invalidos.append({"id": identificador, "monto": monto})
+                continue
+            if identificador in recibidos:
+                repetidos.append(str(identificador))
+                continue
+            recibidos[identificador] = monto
+
+        no_encontrados, ya_pagados, montos_distintos, a_pagar = [], [], [], []
+        with transaction.atomic():
+            gastos = {
+                gasto['id']: gasto
+                for gasto in Gasto.objects.select_for_update().filter(pk__in=list(recibidos))
+                .values('id', 'monto', 'pagado')
+            }
+            for identificador, monto in recibidos.items():
+                gasto = gastos.get(identificador)
+                if gasto is None:
+                    no_encontrados.append(str(identificador))
+                elif gasto['pagado']:
+                    ya_pagados.append(str(identificador))
+                elif monto is not None and monto != gasto['monto']:
+                    montos_distintos.append(
+                        {"id": str(identificador), "monto_gasto": str(gasto['monto']), "monto_pagado": str(monto)})
+                else:
+                    a_pagar.append(identificador)
+            pagados = Gasto.objects.filter(pk__in=a_pagar, pagado=False).update(pagado=True)
+
+        return Response({
+            "mensaje": f"Se registraron {pagados} pagos.",
+            "pagados": pagados,
+            "monto_total": str(sum((gastos[identificador]['monto'] for identificador in a_pagar), Decimal('0'))),
+            "no_encontrados": no_encontrados,
+            "ya_pagados": ya_pagados,
+            "montos_distintos": montos_distintos,
+            "repetidos": repetidos,
+            "invalidos": invalidos,
+        })
+
 class AvisoViewSet(viewsets.ModelViewSet):
     queryset = Aviso.objects.all()
     serializer_class = AvisoSerializer
     permission_classes = [IsAuthenticated] # <-- Añadir esta línea
+    pagination_class = PaginacionPorCursor
+    orden_cursor = '-fecha_publicacion'
+    campo_fecha = 'fecha_publicacion'
+
+
+class DashboardViewSet(viewsets.ViewSet):
+    """
+    Resúmenes para el dashboard. Se leen de las tablas de resumen (ver dashboard.py),
+    así su costo depende de la cantidad de unidades, horas o meses mostrados y no de
+    la cantidad de gastos y registros de acceso.
+    """
+    permission_classes = [IsAuthenticated]
+    # Filtros del resumen de accesos (ver FiltroParametros)
+    filtros = {'punto_acceso': 'punto_acceso', 'tipo': 'tipo'}
+    campo_fecha = 'hora'
+
+    @action(detail=False, methods=['get'])
+    def deuda(self, request):
+        """
+        Unidades con saldo deudor, de mayor a menor, y la deuda total.
+        """
+        unidades = UnidadHabitacional.objects.filter(saldo_deudor__gt=0).order_by('-saldo_deudor', 'numero')
+        total = unidades.aggregate(total=Coalesce(Sum('saldo_deudor'), Value(Decimal('0'))))['total']
+        return Response({
+            "total": total,
+            "unidades": list(unidades.values('id', 'numero', 'propietario', 'saldo_deudor')),
+        })
+
+    @action(detail=False, methods=['get'])
+    def vencidos(self, request):
+        """
+        Total no pagado y total vencido por mes de vencimiento.
+        """
+        return Response(list(ResumenGastos.objects.order_by('mes').values(
+            'mes', 'pendiente', 'vencido', 'cantidad_vencidos', 'actualizado')))
+
+    @action(detail=False, methods=['get'])
+    def accesos(self, request):
+        """
+        Accesos por punto de acceso y día (?agrupar=dia, por defecto) u hora (?agrupar=hora).
+        Acepta ?desde=, ?hasta=, ?punto_acceso= y ?tipo=; sin ?desde= muestra los últimos 7 días.
+        """
+        agrupar = request.query_params.get('agrupar', 'dia')
+        if agrupar not in ('dia', 'hora'):
+            return Response({"error": "'agrupar' debe ser 'dia' u 'hora'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        resumenes = FiltroParametros().filter_queryset(request, ResumenAccesos.objects.all(), self)
+        if not request.query_params.get('desde'):
+            resumenes = resumenes.filter(hora__gte=timezone.now() - timedelta(days=7))
+        periodo = TruncDate('hora') if agrupar == 'dia' else F('hora')
+        return Response(list(
+            resumenes.annotate(periodo=periodo).values('periodo', 'punto_acceso')
+            .annotate(cantidad=Sum('cantidad')).order_by('periodo', 'punto_acceso')))
+
+    @action(detail=False, methods=['get'])
+    def reservas(self, request):
+        """
+        Ingresos (cobrados y por cobrar) de cada área común por mes de la reserva.
+        """
+        return Response(list(ResumenReservas.objects.order_by('mes', 'area_comun__nombre').values(
+            'mes', 'area_comun', 'ingresos', 'por_cobrar', 'cantidad', 'actualizado',
+            area_nombre=F('area_comun__nombre'))))
+
+
+# Segundos máximos que una consulta de trabajo puede quedar esperando el resultado
+MAXIMA_ESPERA_TRABAJO = 30
+
+
+def respuesta_servicio_no_disponible(error):
+    """
+    Respuesta para cuando el servicio de reconocimiento no puede atender la petición:
+    429 si su cola está llena (la cámara debe reintentar más tarde) o 503 si el
+    procesamiento superó el tiempo máximo.
+    """
+    if isinstance(error, ServicioSaturado):
+        return Response(
+            {"error": "El servicio de reconocimiento está saturado, intente nuevamente."},
+            status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": "1"})
+    return Response(
+        {"error": "El reconocimiento tardó demasiado, intente nuevamente."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+def es_asincrono(request):
+    """
+    Indica si la cámara pidió el modo asíncrono (modo=async en la URL o en el form-data).
+    """
+    return request.query_params.get('modo') == 'async' or request.data.get('modo') == 'async'
+
+
+def encolar_reconocimiento(request, funcion, file_obj, punto_acceso=''):
+    """
+    Encola el reconocimiento de la imagen y responde de inmediato (202) con el id del
+    trabajo y la URL donde consultar el resultado.
+    """
+    try:
+        trabajo_id = obtener_cola().encolar(funcion, file_obj.read(), file_obj.name, punto_acceso)
+    except ColaLlena:
+        return Response(
+            {"error": "La cola de reconocimiento está llena, intente nuevamente."},
+            status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": "1"})
+    return Response({
+        "trabajo_id": trabajo_id,
+        "estado": "pendiente",
+        "resultado_url": request.build_absolute_uri(reverse('api:trabajo-reconocimiento', args=[trabajo_id]))
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def procesar_reconocimiento_facial(contenido, nombre_archivo, punto_acceso=''):
+    """
+    Reconoce la cara de la imagen y registra el acceso. Devuelve el Response para la cámara;
+    se usa tanto en el modo síncrono como desde la cola de trabajos.
+    """
+    # La decodificación, detección y codificación se hacen en el servicio de reconocimiento
+    try:
+        detecciones, tiempos = obtener_servicio().ejecutar(detectar_rostros, [contenido])
+    except (ServicioSaturado, TiempoAgotado) as e:
+        return respuesta_servicio_no_disponible(e)
+
+    if detecciones[0] is None:
+        return Response({"error": "El archivo proporcionado no es una imagen válida."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Importación local para evitar conflictos de DLL en el arranque
+    from .face_recognition_logic import identificar_rostro, indice_cara_principal, rect_ubicacion, visita_vigente
+    try:
+        persona_encontrada, candidatos = identificar_rostro(*detecciones[0], tiempos=tiempos)
+    except IndexError:
+        return Response({"error": "No se detectó ninguna cara en la imagen enviada.", "tiempos_ms": tiempos}, status=status.HTTP_400_BAD_REQUEST)
+    ubicaciones = detecciones[0][0]
+    recorte = rect_ubicacion(ubicaciones[indice_cara_principal(ubicaciones)])
+
+    if isinstance(persona_encontrada, Visitante) and not visita_vigente(persona_encontrada):
+        return Response({
+            "status": "Acceso denegado",
+            "error": "El visitante no tiene una visita autorizada para este horario.",
+            "candidatos": candidatos,
+            "tiempos_ms": tiempos
+        }, status=status.HTTP_403_FORBIDDEN)
+    elif isinstance(persona_encontrada, Visitante):
+        obtener_escritor_accesos().registrar(
+            visitante=persona_encontrada, tipo='ENTRADA', foto=contenido, nombre_foto=nombre_archivo, recorte=recorte,
+            punto_acceso=punto_acceso)
+        return Response({
+            "status": "Acceso concedido",
+            "visitante": VisitanteSerializer(persona_encontrada).data,
+            "distancia": candidatos[0]["distancia"],
+            "confianza": candidatos[0]["confianza"],
+            "candidatos": candidatos,
+            "tiempos_ms": tiempos
+        }, status=status.HTTP_200_OK)
+    elif persona_encontrada:
+        # Usamos el serializer para una respuesta más rica
+        serializer = ResidenteSerializer(persona_encontrada)
+        # Si se encuentra, creamos un registro de acceso
+        obtener_escritor_accesos().registrar(
+            residente=persona_encontrada, tipo='ENTRADA', foto=contenido, nombre_foto=nombre_archivo, recorte=recorte,
+            punto_acceso=punto_acceso)
+        return Response({
+            "status": "Acceso concedido",
+            "residente": serializer.data,
+            "distancia": candidatos[0]["distancia"],
+            "confianza": candidatos[0]["confianza"],
+            "candidatos": candidatos,
+            "tiempos_ms": tiempos
+        }, status=status.HTTP_200_OK)
+    else:
+        return Response({"status": "Acceso denegado", "error": "Residente no reconocido.", "candidatos": candidatos, "tiempos_ms": tiempos}, status=status.HTTP_403_FORBIDDEN)
+
+
+def procesar_reconocimiento_vehiculo(contenido, nombre_archivo, punto_acceso=''):
+    """
+    Lee la placa de la imagen y registra el acceso del residente dueño del vehículo.
+    Devuelve el Response para la cámara; se usa tanto en el modo síncrono como desde la cola.
+    """
+    # La decodificación y el OCR se hacen en el servicio de reconocimiento
+    try:
+        lectura = obtener_servicio().ejecutar(leer_placa, contenido)
+    except (ServicioSaturado, TiempoAgotado) as e:
+        return respuesta_servicio_no_disponible(e)
+
+    if lectura is None:
+        return Response({"error": "El archivo proporcionado no es una imagen válida."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Importación local para evitar conflictos de DLL en el arranque
+    from .ocr_logic import buscar_vehiculo_aproximado
+    placa_detectada, rect_placa = lectura
+    vehiculo_encontrado, distancia = buscar_vehiculo_aproximado(placa_detectada)
+
+    if vehiculo_encontrado:
+        # Si se encuentra, creamos un registro de acceso para el residente asociado
+        obtener_escritor_accesos().registrar(
+            residente=vehiculo_encontrado.residente_asociado, tipo='ENTRADA', foto=contenido, nombre_foto=nombre_archivo,
+            recorte=rect_placa, punto_acceso=punto_acceso)
+        serializer = VehiculoSerializer(vehiculo_encontrado)
+        return Response({
+            "status": "Acceso de vehículo concedido",
+            "placa_detectada": placa_detectada,
+            "distancia": distancia,
+            "vehiculo": serializer.data
+        }, status=status.HTTP_200_OK)
+    else:
+        return Response({"status": "Acceso de vehículo denegado", "placa_detectada": placa_detectada, "error": "Vehículo no registrado."}, status=status.HTTP_403_FORBIDDEN)
 
 
 class ReconocimientoFacialView(APIView):
     """
     Endpoint para recibir una imagen y realizar reconocimiento facial.
+    Con modo=async responde de inmediato con un trabajo_id (ver TrabajoReconocimientoView).
     """
     # Dejamos estos endpoints públicos por ahora, ya que serían usados por cámaras
     parser_classes = (MultiPartParser, FormParser)
@@ -133,70 +512,133 @@ class ReconocimientoFacialView(APIView):
     def post(self, request, *args, **kwargs):
         # El archivo de imagen se espera en el campo 'image' del form-data
         file_obj = request.data.get('image')
+        # Cámara o puerta que envía la imagen, para las estadísticas del dashboard
+        punto_acceso = request.data.get('punto_acceso', '')
 
         if not file_obj:
             return Response({"error": "No se proporcionó ninguna imagen."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Convertir el archivo en un array de numpy que cv2/face_recognition pueda leer
-        nparr = np.frombuffer(file_obj.read(), np.uint8)
-        image_to_check = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if es_asincrono(request):
+            return encolar_reconocimiento(request, procesar_reconocimiento_facial, file_obj, punto_acceso)
+        return procesar_reconocimiento_facial(file_obj.read(), file_obj.name, punto_acceso)
 
-        if image_to_check is None:
-            return Response({"error": "El archivo proporcionado no es una imagen válida."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Importación local para evitar conflictos de DLL en el arranque
-        from .face_recognition_logic import reconocer_rostro
+class ReconocimientoFacialLoteView(APIView):
+    """
+    Endpoint para reconocer varias imágenes a la vez (ráfagas de fotogramas o
+    ingresos en grupo). Reconoce todas las caras de cada imagen.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, *args, **kwargs):
+        # Las imágenes se esperan en el campo 'images' (repetido) del form-data
+        archivos = request.FILES.getlist('images')
+        punto_acceso = request.data.get('punto_acceso', '')
+
+        if not archivos:
+            return Response({"error": "No se proporcionó ninguna imagen."}, status=status.HTTP_400_BAD_REQUEST)
+
+        maximo = getattr(settings, 'FACE_BATCH_MAX_IMAGES', 16)
+        if len(archivos) > maximo:
+            return Response({"error": f"Se aceptan como máximo {maximo} imágenes por lote."}, status=status.HTTP_400_BAD_REQUEST)
+
+        contenidos = [file_obj.read() for file_obj in archivos]
         try:
-            residente_encontrado = reconocer_rostro(image_to_check)
-        except IndexError:
-            return Response({"error": "No se detectó ninguna cara en la imagen enviada."}, status=status.HTTP_400_BAD_REQUEST)
-
-        if residente_encontrado:
-            # Usamos el serializer para una respuesta más rica
-            serializer = ResidenteSerializer(residente_encontrado)
-            # Si se encuentra, creamos un registro de acceso
-            RegistroAcceso.objects.create(
-                residente=residente_encontrado, tipo='ENTRADA', foto_capturada=file_obj)
-            return Response({
-                "status": "Acceso concedido",
-                "residente": serializer.data
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response({"status": "Acceso denegado", "error": "Residente no reconocido."}, status=status.HTTP_403_FORBIDDEN)
+            detecciones, tiempos = obtener_servicio().ejecutar(detectar_rostros, contenidos)
+        except (ServicioSaturado, TiempoAgotado) as e:
+            return respuesta_servicio_no_disponible(e)
+
+        # Importación local para evitar conflictos de DLL en el arranque
+        from .face_recognition_logic import identificar_rostros_lote, rect_ubicacion, visita_vigente
+        validas = [deteccion for deteccion in detecciones if deteccion is not None]
+        resultados_validos = iter(identificar_rostros_lote(validas, tiempos))
+
+        resultados = []
+        escritor = obtener_escritor_accesos()
+        registros_creados = 0
+        ya_registradas = set()
+        for indice, (contenido, file_obj, deteccion) in enumerate(zip(contenidos, archivos, detecciones)):
+            if deteccion is None:
+                resultados.append({"imagen": indice, "error": "El archivo proporcionado no es una imagen válida."})
+                continue
+
+            caras = []
+            for ubicacion, persona, candidatos in next(resultados_validos):
+                cara = {"ubicacion": ubicacion, "candidatos": candidatos}
+                if isinstance(persona, Visitante) and not visita_vigente(persona):
+                    cara.update({"status": "Acceso denegado",
+                                 "error": "El visitante no tiene una visita autorizada para este horario."})
+                    persona = None
+                elif isinstance(persona, Visitante):
+                    cara.update({"status": "Acceso concedido", "visitante": VisitanteSerializer(persona).data})
+                elif persona:
+                    cara.update({"status": "Acceso concedido", "residente": ResidenteSerializer(persona).data})
+                else:
+                    cara.update({"status": "Acceso denegado", "error": "Persona no reconocida."})
+                caras.append(cara)
+
+                # Una misma persona en varios fotogramas de la ráfaga genera un solo registro
+                if persona and persona.pk not in ya_registradas:
+                    ya_registradas.add(persona.pk)
+                    campo = 'visitante' if isinstance(persona, Visitante) else 'residente'
+                    escritor.registrar(tipo='ENTRADA', foto=contenido, nombre_foto=file_obj.name,
+                                       recorte=rect_ubicacion(ubicacion), punto_acceso=punto_acceso,
+                                       **{campo: persona})
+                    registros_creados += 1
+
+            resultados.append({"imagen": indice, "caras": caras})
+
+        return Response({
+            "registros_creados": registros_creados,
+            "resultados": resultados,
+            "tiempos_ms": tiempos
+        }, status=status.HTTP_200_OK)
 
 
 class ReconocimientoVehiculoView(APIView):
     """
     Endpoint para recibir una imagen de un vehículo y reconocer su placa.
+    Con modo=async responde de inmediato con un trabajo_id (ver TrabajoReconocimientoView).
     """
     # Dejamos estos endpoints públicos por ahora, ya que serían usados por cámaras
     parser_classes = (MultiPartParser, FormParser)
 
     def post(self, request, *args, **kwargs):
         file_obj = request.data.get('image')
+        # Cámara o puerta que envía la imagen, para las estadísticas del dashboard
+        punto_acceso = request.data.get('punto_acceso', '')
 
         if not file_obj:
             return Response({"error": "No se proporcionó ninguna imagen."}, status=status.HTTP_400_BAD_REQUEST)
 
-        nparr = np.frombuffer(file_obj.read(), np.uint8)
-        image_to_check = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if es_asincrono(request):
+            return encolar_reconocimiento(request, procesar_reconocimiento_vehiculo, file_obj, punto_acceso)
+        return procesar_reconocimiento_vehiculo(file_obj.read(), file_obj.name, punto_acceso)
 
-        if image_to_check is None:
-            return Response({"error": "El archivo proporcionado no es una imagen válida."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Importación local para evitar conflictos de DLL en el arranque
-        from .ocr_logic import reconocer_placa
-        vehiculo_encontrado, placa_detectada = reconocer_placa(image_to_check)
-
-        if vehiculo_encontrado:
-            # Si se encuentra, creamos un registro de acceso para el residente asociado
-            RegistroAcceso.objects.create(
-                residente=vehiculo_encontrado.residente_asociado, tipo='ENTRADA', foto_capturada=file_obj)
-            serializer = VehiculoSerializer(vehiculo_encontrado)
-            return Response({
-                "status": "Acceso de vehículo concedido",
-                "placa_detectada": placa_detectada,
-                "vehiculo": serializer.data
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response({"status": "Acceso de vehículo denegado", "placa_detectada": placa_detectada, "error": "Vehículo no registrado."}, status=status.HTTP_403_FORBIDDEN)
+class TrabajoReconocimientoView(APIView):
+    """
+    Endpoint para consultar el resultado de un reconocimiento encolado en modo asíncrono.
+    Con ?esperar=N (segundos) la respuesta se retiene hasta que el trabajo termine (long-poll).
+    """
+
+    def get(self, request, trabajo_id, *args, **kwargs):
+        try:
+            esperar = float(request.query_params.get('esperar', 0))
+        except ValueError:
+            esperar = math.nan
+        # nan o inf dejarían al long-poll sin límite
+        if not math.isfinite(esperar):
+            return Response({"error": "El parámetro 'esperar' debe ser un número."}, status=status.HTTP_400_BAD_REQUEST)
+        esperar = min(esperar, MAXIMA_ESPERA_TRABAJO)
+
+        trabajo = obtener_cola().obtener(trabajo_id, esperar=max(esperar, 0))
+        if trabajo is None:
+            return Response({"error": "Trabajo no encontrado o vencido."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "trabajo_id": trabajo["id"],
+            "estado": trabajo["estado"],
+            "codigo": trabajo.get("codigo"),
+            "resultado": trabajo.get("resultado")
+        }, status=status.HTTP_200_OK)
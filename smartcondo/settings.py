@@ -48,6 +48,11 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    # Todos los listados van paginados; los ordenados por fecha usan cursor (ver api/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.PaginacionNumerada',
+    'PAGE_SIZE': 50,
+    # Filtros ?desde=/?hasta= y los declarados en cada vista con `filtros`
+    'DEFAULT_FILTER_BACKENDS': ['api.filters.FiltroParametros'],
 }
 
 MIDDLEWARE = [
@@ -141,3 +146,138 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_ROOT = BASE_DIR / 'media'
 # URL pública para acceder a esos archivos
 MEDIA_URL = '/media/'
+
+# Reconocimiento facial
+# Distancia máxima entre encodings para aceptar una coincidencia (menor = más estricto)
+FACE_MATCH_TOLERANCE = 0.6
+# Cantidad de candidatos más cercanos incluidos en la respuesta de reconocer-acceso/
+FACE_MATCH_TOP_K = 3
+# Detector de caras: 'hog' (CPU) o 'cnn' (más preciso, recomendado sólo con GPU)
+FACE_DETECTION_MODEL = 'hog'
+# Veces que se agranda la imagen al detectar; subirlo ayuda con caras lejanas pero es más lento
+FACE_DETECTION_UPSAMPLE = 1
+# Lado mayor (px) al que se reducen las imágenes para detectar caras; 0 para no reducir
+FACE_DETECTION_MAX_SIDE = 640
+# Máximo de imágenes aceptadas por petición en reconocer-acceso/lote/
+FACE_BATCH_MAX_IMAGES = 16
+# Minutos de tolerancia antes de la hora de entrada y después de la hora de salida previstas de un visitante
+VISIT_WINDOW_MARGIN_MINUTES = 30
+# Índice para buscar rostros: 'exacto' (búsqueda lineal con NumPy) o 'ivf' (aproximado,
+# para galerías de decenas de miles de rostros)
+FACE_INDEX_BACKEND = 'exacto'
+# Opciones del índice 'ivf': nprobe = listas revisadas por búsqueda (más recall, más latencia)
+FACE_INDEX_OPTIONS = {}
+# Snapshot en disco de la galería para que los workers arranquen sin recalcular el índice
+FACE_INDEX_SNAPSHOT = BASE_DIR / 'cache' / 'galeria_rostros.npz'
+# Cada cuántos segundos la galería trae los cambios hechos desde otros procesos (0 para desactivar)
+FACE_GALLERY_REFRESH = 60
+
+# Servicio de reconocimiento (rostros y placas) en procesos separados de los de Django
+# Procesos del pool por cada proceso web; 0 ejecuta el reconocimiento en el mismo hilo
+RECOGNITION_WORKERS = 2
+# Trabajos que pueden esperar en cola además de los que se están procesando (luego responde 429)
+RECOGNITION_QUEUE_SIZE = 8
+# Segundos máximos de espera por un reconocimiento (luego responde 503)
+RECOGNITION_TIMEOUT = 10
+
+# Modo asíncrono de reconocer-acceso/ y reconocer-vehiculo/ (modo=async)
+# Hilos que procesan la cola; conviene no superar RECOGNITION_WORKERS + RECOGNITION_QUEUE_SIZE
+JOB_QUEUE_THREADS = 2
+# Trabajos pendientes admitidos antes de responder 429
+JOB_QUEUE_SIZE = 100
+# Segundos que se conserva el estado de un trabajo (y su resultado al terminar)
+JOB_RESULT_TTL = 600
+# Caché (de CACHES) donde se guarda el estado de los trabajos: debe ser compartida por
+# todos los procesos web para que cualquiera responda trabajos/<id>/ (en varios nodos, Redis o Memcached)
+JOB_CACHE = 'trabajos'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Estado y resultado de los trabajos del modo asíncrono, compartido entre los procesos del nodo
+    'trabajos': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'trabajos',
+    },
+}
+
+# OCR de placas
+# Motor OCR: 'tesserocr' (Tesseract dentro del proceso, reutilizado), 'pytesseract'
+# (un proceso tesseract por imagen) o 'auto' (tesserocr si está instalado)
+OCR_BACKEND = 'auto'
+# Candidatos a placa (los mejor puntuados) que pasan al OCR por fotograma
+OCR_MAX_CANDIDATES = 5
+# Ejecutable de Tesseract usado por pytesseract
+TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Carpeta tessdata usada por tesserocr (None para la ubicación por defecto)
+TESSDATA_PREFIX = None
+
+# Cámaras analizadas por el comando run_camera_analysis: nombre -> fuente
+# (índice de cámara, archivo o URL rtsp://). Ej: {'porton': 'rtsp://10.0.0.5/stream'}
+CAMERA_SOURCES = {}
+
+# Filtro previo al OCR en run_camera_analysis: sólo se leen placas en fotogramas con movimiento.
+# FPS: fotogramas por segundo que se analizan como máximo (0 = todos).
+# MOVIMIENTO: 'mog2' (sustracción de fondo), 'diferencia' (entre fotogramas) o None (sin filtro).
+# ROI: región (x0, y0, x1, y1) en fracciones del fotograma donde se busca movimiento; None = todo.
+# AREA_MINIMA: fracción de la ROI que debe cambiar; MANTENER: segundos que se sigue leyendo tras el movimiento.
+CAMERA_GATING = {
+    'FPS': 5,
+    'MOVIMIENTO': 'mog2',
+    'ROI': None,
+    'AREA_MINIMA': 0.01,
+    'MANTENER': 2.0,
+}
+
+# Seguimiento de placas entre fotogramas en run_camera_analysis.
+# IOU_MINIMO: solapamiento mínimo para considerar que un rectángulo es la misma placa.
+# VOTOS / APOYO_MINIMO: lecturas de OCR y acuerdo por carácter necesarios para confirmar la placa.
+# OLVIDO: segundos sin ver una pista antes de cerrarla.
+PLATE_TRACKING = {
+    'IOU_MINIMO': 0.3,
+    'VOTOS': 3,
+    'APOYO_MINIMO': 0.6,
+    'OLVIDO': 1.5,
+}
+
+# Captura de video en run_camera_analysis.
+# BACKEND: 'auto', 'ffmpeg' o 'gstreamer'. ACELERACION: decodificación por hardware si está disponible.
+# RTSP_TRANSPORT / LATENCIA_MS / BUFFER: opciones de las cámaras RTSP (menos buffer = menos latencia).
+# DECODIFICADOR: decodificador H.264 de GStreamer (ej. 'nvh264dec'); None usa decodebin.
+CAMERA_CAPTURE = {
+    'BACKEND': 'auto',
+    'ACELERACION': True,
+    'RTSP_TRANSPORT': 'tcp',
+    'LATENCIA_MS': 100,
+    'BUFFER': 1,
+    'DECODIFICADOR': None,
+    'TIMEOUT_MS': 5000,
+}
+
+# Caché de placas en memoria (ver api/plate_cache.py).
+# Segundos que una placa leída pero no registrada se recuerda como tal.
+PLATE_NEGATIVE_TTL = 30
+# Cada cuántos segundos se recarga completa (para ver cambios hechos desde otros procesos).
+PLATE_CACHE_REFRESH = 300
+# Distancia máxima (edición ponderada, ver api/plate_index.py) para aceptar una placa
+# registrada parecida a la leída; 0 exige coincidencia exacta. Como máximo 1.5: el índice
+# encuentra confusiones (0.5 cada una) más a lo sumo una edición de otro tipo (1).
+PLATE_FUZZY_MAX_DISTANCE = 1.0
+
+# Escritura de registros de acceso en segundo plano (ver api/access_log.py).
+# Se insertan con bulk_create al juntar ACCESS_LOG_BATCH_SIZE eventos o cada ACCESS_LOG_FLUSH_SECONDS.
+ACCESS_LOG_BATCH_SIZE = 50
+ACCESS_LOG_FLUSH_SECONDS = 1.0
+# Diario local de los eventos aún no escritos, para recuperarlos si el proceso se cae
+ACCESS_LOG_SPILL_DIR = BASE_DIR / 'cache' / 'accesos'
+
+# Fotos de los registros de acceso (ver api/capture_storage.py): se guardan re-codificadas
+# en JPEG con esta calidad y reducidas a este lado mayor, junto a un recorte y una miniatura.
+CAPTURE_JPEG_QUALITY = 80
+CAPTURE_MAX_SIDE = 1280
+CAPTURE_THUMBNAIL_SIDE = 160
+
+# Retención de los registros de acceso (comando archivar_accesos): meses completos que se
+# conservan en la base de datos; los anteriores se guardan comprimidos en ACCESS_LOG_ARCHIVE_DIR.
+ACCESS_LOG_RETENTION_MONTHS = 12
+ACCESS_LOG_ARCHIVE_DIR = BASE_DIR / 'archivo' / 'registros_acceso'